@@ -115,8 +115,8 @@ def require_auth(permissions=None, user_types=None, optional=False):
                     }), 403
                 
                 # Проверяем разрешения
+                user_permissions = auth_info.get('permissions', [])
                 if permissions:
-                    user_permissions = auth_info.get('permissions', [])
                     if auth_info.get('auth_method') == 'api_key':
                         # Для API ключей проверяем разрешения ключа
                         user_permissions = auth_info.get('permissions', [])
@@ -143,8 +143,6 @@ def require_auth(permissions=None, user_types=None, optional=False):
                     'permissions': user_permissions
                 }
                 
-                return f(*args, **kwargs)
-                
             except Exception as e:
                 logger.error(f"Ошибка в auth middleware: {str(e)}")
                 if optional:
@@ -156,6 +154,10 @@ def require_auth(permissions=None, user_types=None, optional=False):
                         'error': 'Authentication error',
                         'message': 'Ошибка аутентификации'
                     }), 500
+            
+            # Вызов view вне try: его исключения обрабатывает errorhandler blueprint'а,
+            # а не маскируются под ошибку аутентификации
+            return f(*args, **kwargs)
         
         return decorated_function
     return decorator
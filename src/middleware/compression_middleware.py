@@ -0,0 +1,60 @@
+from flask import request
+import gzip
+import zlib
+import logging
+
+from .etag_middleware import gzip_etag
+
+logger = logging.getLogger(__name__)
+
+# Ответы меньше этого размера сжимать невыгодно
+GZIP_MIN_SIZE = 1024
+GZIP_COMPRESS_LEVEL = 4
+
+def _gzip_stream(chunks):
+    """Потоковое gzip-сжатие фрагментов ответа"""
+    compressor = zlib.compressobj(GZIP_COMPRESS_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+    finally:
+        # Закрываем исходный генератор, чтобы он освободил свои ресурсы
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+def gzip_response(response):
+    """
+    Сжатие JSON-ответов через gzip, если клиент его поддерживает
+
+    Регистрируется как after_request обработчик blueprint'а.
+    """
+    if not 200 <= response.status_code < 300 or response.direct_passthrough:
+        return response
+
+    if 'Content-Encoding' in response.headers or response.mimetype != 'application/json':
+        return response
+
+    response.vary.add('Accept-Encoding')
+
+    if 'gzip' not in request.headers.get('Accept-Encoding', '').lower():
+        return response
+
+    if response.is_streamed:
+        response.response = _gzip_stream(response.response)
+        response.headers.pop('Content-Length', None)
+    else:
+        if response.content_length is None or response.content_length < GZIP_MIN_SIZE:
+            return response
+        response.set_data(gzip.compress(response.get_data(), compresslevel=GZIP_COMPRESS_LEVEL))
+
+    # Сильный ETag несжатого тела к сжатому не относится: помечаем его суффиксом
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(gzip_etag(etag))
+
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
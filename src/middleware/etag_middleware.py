@@ -0,0 +1,54 @@
+from functools import wraps
+from flask import request, make_response, Response
+from typing import Optional
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Сжатое и несжатое представления одного тела должны иметь разные сильные валидаторы
+# (RFC 9110, 8.8.3), поэтому gzip_response добавляет к ETag этот суффикс
+GZIP_ETAG_SUFFIX = '-gzip'
+
+def compute_etag(body: bytes) -> str:
+    """Вычисление ETag по содержимому тела ответа"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def gzip_etag(etag: str) -> str:
+    """ETag gzip-представления ответа"""
+    return etag + GZIP_ETAG_SUFFIX
+
+def matched_etag(etag: str) -> Optional[str]:
+    """Форма ETag (несжатая или gzip), указанная клиентом в If-None-Match, или None"""
+    for candidate in (etag, gzip_etag(etag)):
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
+
+def etag_cached(f):
+    """
+    Декоратор для поддержки ETag / If-None-Match на GET endpoint'ах
+
+    Хэширует тело успешного ответа и возвращает пустой 304 Not Modified,
+    если клиент уже имеет актуальную версию.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        response = make_response(f(*args, **kwargs))
+
+        # Условные ответы имеют смысл только для успешных буферизованных ответов
+        if response.status_code != 200 or response.is_streamed:
+            return response
+
+        etag = compute_etag(response.get_data())
+
+        matched = matched_etag(etag)
+        if matched:
+            not_modified = Response(status=304)
+            not_modified.set_etag(matched)
+            return not_modified
+
+        response.set_etag(etag)
+        return response
+
+    return decorated_function
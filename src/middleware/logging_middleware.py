@@ -38,6 +38,9 @@ def get_response_size(response):
     try:
         if hasattr(response, 'content_length') and response.content_length:
             return response.content_length
+        elif getattr(response, 'is_streamed', False):
+            # Чтение data у потокового ответа буферизовало бы его целиком
+            return 0
         elif hasattr(response, 'data'):
             return len(response.data)
         else:
@@ -11,7 +11,7 @@ try:
     from services.auth_service import AuthService
     from middleware.auth_middleware import (
         require_auth, require_admin, optional_auth, 
-        get_current_user, get_auth_info, get_client_info
+        get_current_user, get_auth_info, get_client_info, extract_auth_token
     )
 except ImportError:
     AuthService = None
@@ -21,6 +21,7 @@ except ImportError:
     get_current_user = lambda: None
     get_auth_info = lambda: None
     get_client_info = lambda: {}
+    extract_auth_token = lambda: (None, None)
 
 logger = logging.getLogger(__name__)
 
@@ -152,6 +153,43 @@ def login():
             'error': 'Внутренняя ошибка сервера'
         }), 500
 
+@auth_management_bp.route('/logout', methods=['POST'])
+def logout():
+    """Выход пользователя (отзыв JWT токена)"""
+    if not auth_service:
+        return jsonify({
+            'error': 'Authentication service unavailable'
+        }), 503
+    
+    try:
+        auth_type, token = extract_auth_token()
+        if auth_type != 'jwt':
+            return jsonify({
+                'error': 'Необходимо передать JWT токен в заголовке Authorization'
+            }), 400
+        
+        client_info = get_client_info()
+        success, result = auth_service.revoke_token(
+            token,
+            client_info.get('ip_address'),
+            client_info.get('user_agent')
+        )
+        
+        if success:
+            return jsonify({
+                'message': 'Успешный выход'
+            })
+        else:
+            return jsonify({
+                'error': result.get('error', 'Неверный токен')
+            }), 401
+            
+    except Exception as e:
+        logger.error(f"Ошибка выхода: {str(e)}")
+        return jsonify({
+            'error': 'Внутренняя ошибка сервера'
+        }), 500
+
 @auth_management_bp.route('/profile', methods=['GET'])
 @require_auth()
 def get_profile():
@@ -99,12 +99,7 @@ def clear_all_cache():
     try:
         # В будущем здесь должна быть проверка прав администратора
         
-        import sqlite3
-        with sqlite3.connect(db_service.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM search_cache')
-            deleted_count = cursor.rowcount
-            conn.commit()
+        deleted_count = db_service.clear_cache()
         
         return jsonify({
             'deleted_entries': deleted_count,
@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response, stream_with_context
 from flask_cors import CORS
 import re
 import time
@@ -6,8 +6,28 @@ import logging
 from datetime import datetime
 import sys
 import os
-import sqlite3
 import json
+import base64
+import binascii
+import threading
+import itertools
+
+# orjson заметно быстрее стандартного json при разборе сохраненных результатов
+try:
+    import orjson
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    orjson = None
+    _loads = json.loads
+    
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+try:
+    from cachetools import TTLCache
+except ImportError:
+    TTLCache = None
 
 # Добавляем путь к services и middleware
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
@@ -18,9 +38,10 @@ except ImportError:
     SearchEngineService = None
 
 try:
-    from services.database import DatabaseService
+    from services.database import DatabaseService, unpack_search_results
 except ImportError:
     DatabaseService = None
+    unpack_search_results = None
 
 try:
     from services.enhanced_parser_verifier import EnhancedParserVerifier
@@ -65,6 +86,17 @@ except ImportError:
     def mark_cache_hit():
         pass
 
+try:
+    from middleware.etag_middleware import etag_cached
+except ImportError:
+    def etag_cached(f):
+        return f
+
+try:
+    from middleware.compression_middleware import gzip_response
+except ImportError:
+    gzip_response = None
+
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -72,12 +104,73 @@ logger = logging.getLogger(__name__)
 email_search_bp = Blueprint('email_search', __name__)
 CORS(email_search_bp)
 
+# Сжатие больших ответов (история поиска и т.п.)
+if gzip_response:
+    email_search_bp.after_request(gzip_response)
+
 # Инициализация сервисов
 search_service = SearchEngineService() if SearchEngineService else None
 db_service = DatabaseService() if DatabaseService else None
 enhanced_verifier = EnhancedParserVerifier() if EnhancedParserVerifier else None
 enhanced_nlp = EnhancedNLPAnalyzer() if EnhancedNLPAnalyzer else None
 
+# Устаревшие записи удаляются в фоне, чтобы запросы истории сканировали только живые строки
+if db_service:
+    db_service.start_cache_cleanup()
+
+# SQL-запросы истории поиска (одинаковый текст позволяет переиспользовать кэш выражений).
+# Список возвращает только метаданные, сами результаты отдаются по отдельному запросу
+SQL_COUNT_LIVE = '''
+    SELECT COUNT(*) FROM search_cache 
+    WHERE expires_at > CAST(strftime('%s', 'now') AS INTEGER)
+'''
+
+SQL_HISTORY_FIRST_PAGE = '''
+    SELECT 
+        email,
+        length(search_results) AS size,
+        created_at,
+        updated_at,
+        hit_count,
+        search_method
+    FROM search_cache 
+    WHERE expires_at > CAST(strftime('%s', 'now') AS INTEGER)
+    ORDER BY updated_at DESC, email DESC
+    LIMIT ?
+'''
+
+SQL_HISTORY_PAGE = '''
+    SELECT 
+        email,
+        length(search_results) AS size,
+        created_at,
+        updated_at,
+        hit_count,
+        search_method
+    FROM search_cache 
+    WHERE expires_at > CAST(strftime('%s', 'now') AS INTEGER)
+      AND (updated_at, email) < (?, ?)
+    ORDER BY updated_at DESC, email DESC
+    LIMIT ?
+'''
+
+SQL_HISTORY_ENTRY = '''
+    SELECT search_results FROM search_cache 
+    WHERE email_hash = ? AND expires_at > CAST(strftime('%s', 'now') AS INTEGER)
+'''
+
+# Кэш количества актуальных записей истории (пересчитывается не чаще раза в TTL)
+HISTORY_COUNT_TTL_SECONDS = 5
+_count_cache = {'ts': 0.0, 'value': 0}
+_count_cache_lock = threading.Lock()
+
+# Кэш ответов аналитики по количеству дней: {days: (generated_at, payload)}.
+# Период запроса ограничен, поэтому и число ключей в кэше конечно
+ANALYTICS_CACHE_TTL_SECONDS = 30
+ANALYTICS_MAX_DAYS = 365
+_analytics_cache = TTLCache(maxsize=ANALYTICS_MAX_DAYS, ttl=ANALYTICS_CACHE_TTL_SECONDS) if TTLCache else None
+_analytics_cache_lock = threading.Lock()
+
 # Логируем доступность enhanced компонентов
 if enhanced_verifier:
     logger.info("Enhanced Parser Verifier инициализирован")
@@ -716,69 +809,103 @@ def test_search_apis():
             'error': 'Ошибка при тестировании API'
         }), 500
 
+def _get_live_cache_count(cursor):
+    """Количество актуальных записей кэша с коротким TTL в памяти процесса"""
+    with _count_cache_lock:
+        if time.monotonic() - _count_cache['ts'] < HISTORY_COUNT_TTL_SECONDS:
+            return _count_cache['value']
+        
+        cursor.execute(SQL_COUNT_LIVE)
+        _count_cache['value'] = cursor.fetchone()[0]
+        _count_cache['ts'] = time.monotonic()
+        return _count_cache['value']
+
+def _encode_history_cursor(updated_at, email):
+    """Кодирование курсора пагинации истории (updated_at||email)"""
+    raw = f"{updated_at}||{email}".encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+def _decode_history_cursor(cursor_token):
+    """Декодирование курсора пагинации истории в пару (updated_at, email)"""
+    raw = base64.urlsafe_b64decode(cursor_token.encode('ascii')).decode('utf-8')
+    updated_at, separator, email = raw.partition('||')
+    if not separator:
+        raise ValueError('Некорректный курсор')
+    return updated_at, email
+
 @email_search_bp.route('/history', methods=['GET'])
 @log_request
 def get_search_history():
-    """Получение истории всех поисковых запросов с сохраненными данными"""
+    """Получение списка сохраненных поисковых запросов (только метаданные)"""
     if not db_service:
         return jsonify({
             'error': 'Сервис базы данных недоступен'
         }), 503
     
+    # Параметры пагинации: курсор указывает на последнюю запись предыдущей страницы
+    cursor_token = request.args.get('cursor')
     try:
-        # Параметры пагинации
-        page = int(request.args.get('page', 1))
         limit = min(int(request.args.get('limit', 20)), 100)  # Максимум 100 записей за раз
-        offset = (page - 1) * limit
-        
-        with sqlite3.connect(db_service.db_path) as conn:
+        cursor_position = _decode_history_cursor(cursor_token) if cursor_token else None
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        return jsonify({
+            'error': 'Некорректные параметры пагинации'
+        }), 400
+    
+    def generate():
+        # Соединение возвращается в пул только после отправки последней строки
+        with db_service.borrow_read() as conn:
             cursor = conn.cursor()
             
-            # Получаем общее количество записей
-            cursor.execute('''
-                SELECT COUNT(*) FROM search_cache 
-                WHERE expires_at > CURRENT_TIMESTAMP
-            ''')
-            total_count = cursor.fetchone()[0]
+            envelope = {'limit': limit}
             
-            # Получаем записи с пагинацией
-            cursor.execute('''
-                SELECT 
-                    email,
-                    search_results,
-                    created_at,
-                    updated_at,
-                    hit_count,
-                    search_method
-                FROM search_cache 
-                WHERE expires_at > CURRENT_TIMESTAMP
-                ORDER BY updated_at DESC
-                LIMIT ? OFFSET ?
-            ''', (limit, offset))
+            if cursor_position is None:
+                # Общее количество считаем только для первой страницы
+                total_count = _get_live_cache_count(cursor)
+                envelope['total_count'] = total_count
+                envelope['total_pages'] = (total_count + limit - 1) // limit
+                
+                cursor.execute(SQL_HISTORY_FIRST_PAGE, (limit,))
+            else:
+                # Keyset-пагинация: продолжаем сразу после последней записи
+                cursor.execute(SQL_HISTORY_PAGE, (cursor_position[0], cursor_position[1], limit))
             
-            results = []
-            for row in cursor.fetchall():
-                try:
-                    search_data = json.loads(row[1])
-                    results.append({
-                        'email': row[0],
-                        'data': search_data,
-                        'created_at': row[2],
-                        'updated_at': row[3],
-                        'hit_count': row[4],
-                        'search_method': row[5]
-                    })
-                except json.JSONDecodeError as e:
-                    logger.error(f"Ошибка парсинга JSON для email {row[0]}: {str(e)}")
-                    continue
+            # Открываем объект ответа и массив результатов
+            yield _dumps(envelope)[:-1] + b',"results":['
             
-            return jsonify({
-                'total_count': total_count,
-                'page': page,
-                'limit': limit,
-                'total_pages': (total_count + limit - 1) // limit,
-                'results': results
-            })
+            rows_read = 0
+            last_row = None
+            first = True
+            for row in cursor:
+                rows_read += 1
+                last_row = row
+                
+                item = _dumps({
+                    'email': row[0],
+                    'size': row[1],
+                    'created_at': row[2],
+                    'updated_at': row[3],
+                    'hit_count': row[4],
+                    'search_method': row[5]
+                })
+                yield item if first else b',' + item
+                first = False
+            
+            # Курсор следующей страницы строится по последней прочитанной строке
+            next_cursor = None
+            if rows_read == limit:
+                next_cursor = _encode_history_cursor(last_row[3], last_row[0])
+            
+            yield b'],"next_cursor":' + _dumps(next_cursor) + b'}'
+    
+    try:
+        # Первый фрагмент формируем сразу, чтобы ошибки запроса вернулись как 500
+        body = generate()
+        head = next(body)
+        return Response(
+            stream_with_context(itertools.chain((head,), body)),
+            mimetype='application/json'
+        )
             
     except Exception as e:
         logger.error(f"Ошибка получения истории поиска: {str(e)}")
@@ -786,8 +913,44 @@ def get_search_history():
             'error': 'Ошибка при получении истории поиска'
         }), 500
 
+@email_search_bp.route('/history/<path:email>', methods=['GET'])
+@log_request
+@etag_cached
+def get_search_history_entry(email):
+    """Получение сохраненных результатов поиска для одного email"""
+    if not db_service:
+        return jsonify({
+            'error': 'Сервис базы данных недоступен'
+        }), 503
+    
+    try:
+        with db_service.borrow_read() as conn:
+            row = conn.execute(SQL_HISTORY_ENTRY, (db_service._hash_email(email),)).fetchone()
+        
+        if not row:
+            return jsonify({
+                'error': 'Сохраненные данные не найдены'
+            }), 404
+        
+        # Сохраненный JSON вставляем в ответ как есть, без разбора и повторной сериализации
+        data_bytes = unpack_search_results(row[0])
+        if data_bytes[:1] not in (b'{', b'['):
+            data_bytes = _dumps(_loads(data_bytes))
+        
+        return Response(
+            b'{"email":' + _dumps(email) + b',"data":' + data_bytes + b'}',
+            mimetype='application/json'
+        )
+        
+    except Exception as e:
+        logger.error(f"Ошибка получения сохраненных данных для {email}: {str(e)}")
+        return jsonify({
+            'error': 'Ошибка при получении сохраненных данных'
+        }), 500
+
 @email_search_bp.route('/analytics', methods=['GET'])
 @log_request
+@etag_cached
 def get_search_analytics():
     """Получение аналитики по поисковым запросам"""
     if not db_service:
@@ -797,14 +960,33 @@ def get_search_analytics():
     
     try:
         days = int(request.args.get('days', 7))
-        analytics = db_service.get_search_analytics(days)
-        cache_stats = db_service.get_cache_stats()
-        
+    except ValueError:
         return jsonify({
-            'analytics': analytics,
-            'cache_stats': cache_stats,
-            'timestamp': time.time()
-        })
+            'error': 'Параметр days должен быть целым числом'
+        }), 400
+    days = min(max(days, 1), ANALYTICS_MAX_DAYS)
+    
+    try:
+        # Повторные опросы в пределах TTL не обращаются к SQLite
+        cached = None
+        if _analytics_cache is not None:
+            with _analytics_cache_lock:
+                cached = _analytics_cache.get(days)
+        if not cached:
+            payload = {
+                'analytics': db_service.get_search_analytics(days),
+                'cache_stats': db_service.get_cache_stats()
+            }
+            cached = (time.time(), payload)
+            if _analytics_cache is not None:
+                with _analytics_cache_lock:
+                    _analytics_cache[days] = cached
+        
+        # Время генерации передается заголовком, чтобы тело (и ETag) не менялось
+        # между запросами при неизменных данных
+        response = jsonify(cached[1])
+        response.headers['X-Generated-At'] = str(cached[0])
+        return response
         
     except Exception as e:
         logger.error(f"Ошибка получения аналитики: {str(e)}")
@@ -1,352 +1,445 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from typing import Dict, Any
+from concurrent.futures import ThreadPoolExecutor, wait
+from cachetools import TTLCache
+from werkzeug.exceptions import HTTPException
+import hashlib
+import json
 import logging
+import threading
+import requests
 from src.services.scopus_service import ScopusService
 from src.services.orcid_service import ORCIDService
 from src.services.elibrary_service import ElibraryService
 from src.middleware.auth_middleware import token_required
+from src.middleware.etag_middleware import compute_etag, matched_etag
+from src.middleware.compression_middleware import gzip_response
+
+try:
+    import orjson
+    _dumps = orjson.dumps
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
 
 logger = logging.getLogger(__name__)
 
 scientific_api_bp = Blueprint('scientific_api', __name__)
 
+# Сжатие больших ответов (комбинированный поиск, списки публикаций)
+scientific_api_bp.after_request(gzip_response)
+
 # Инициализация сервисов
 scopus_service = ScopusService()
 orcid_service = ORCIDService()
 elibrary_service = ElibraryService(demo_mode=True)  # Включаем демо-режим для тестирования
 
+# Общий пул потоков для параллельных запросов к внешним API
+_io_pool = ThreadPoolExecutor(max_workers=8)
+
+# Кэш комбинированного поиска: хэш email -> (scopus_data, orcid_data, combined_analysis)
+_combined_cache = TTLCache(maxsize=4096, ttl=600)
+_combined_cache_lock = threading.Lock()
+
+# Кэши поиска по email: отрицательные результаты живут дольше положительных
+_scopus_negative_cache = TTLCache(maxsize=10000, ttl=3600)
+_orcid_negative_cache = TTLCache(maxsize=10000, ttl=3600)
+_scopus_positive_cache = TTLCache(maxsize=10000, ttl=300)
+_orcid_positive_cache = TTLCache(maxsize=10000, ttl=300)
+_lookup_cache_lock = threading.Lock()
+
+# Статус API не меняется за время жизни процесса, поэтому ответ формируется один раз
+_API_STATUS_BODY = json.dumps({
+    'message': 'Статус API получен',
+    'api_status': {
+        'scopus': {
+            'available': bool(scopus_service.api_key),
+            'base_url': scopus_service.base_url
+        },
+        'orcid': {
+            'available': bool(orcid_service.client_id),
+            'base_url': orcid_service.base_url
+        },
+        'elibrary': {
+            'available': True,
+            'base_url': elibrary_service.base_url
+        }
+    },
+    'status': 'success'
+}, ensure_ascii=False).encode('utf-8')
+_API_STATUS_ETAG = compute_etag(_API_STATUS_BODY)
+
+def _err(message: str, status_code: int) -> Response:
+    """Быстрое формирование JSON-ответа с ошибкой без jsonify"""
+    return Response(_dumps({'error': message, 'status': 'error'}),
+                    status=status_code, mimetype='application/json')
+
+@scientific_api_bp.errorhandler(Exception)
+def _handle_unexpected_error(e):
+    """Единая обработка непредвиденных ошибок endpoint'ов научных API"""
+    if isinstance(e, HTTPException):
+        return _err(e.description, e.code)
+    if isinstance(e, requests.RequestException):
+        logger.error(f"Внешний API недоступен в {request.endpoint}: {str(e)}")
+        return _err(f'Внешний API недоступен: {str(e)}', 502)
+    logger.error(f"Ошибка в {request.endpoint}: {str(e)}")
+    return _err(f'Ошибка сервера: {str(e)}', 500)
+
+# Разделы ответа комбинированного поиска, которые можно запросить через ?include=
+COMBINED_SECTIONS = {
+    'scopus': 'scopus_data',
+    'orcid': 'orcid_data',
+    'analysis': 'combined_analysis'
+}
+
+def _lookup_by_email(email: str, fetch, positive_cache: TTLCache,
+                     negative_cache: TTLCache, empty_value):
+    """
+    Поиск во внешнем API по email с кэшированием найденных и ненайденных результатов
+    
+    fetch вызывается с raise_errors=True: сбой API пробрасывается вызывающему коду и не
+    кэшируется, в отрицательный кэш попадает только ответ "не найдено"
+    """
+    key = email.strip().lower()
+    with _lookup_cache_lock:
+        if key in negative_cache:
+            return empty_value
+        if key in positive_cache:
+            return positive_cache[key]
+    
+    value = fetch(email, raise_errors=True)
+    
+    with _lookup_cache_lock:
+        if value:
+            positive_cache[key] = value
+        else:
+            negative_cache[key] = True
+    return value
+
+def _find_scopus_author(email: str):
+    """Поиск автора Scopus по email через кэш"""
+    return _lookup_by_email(email, scopus_service.search_author_by_email,
+                            _scopus_positive_cache, _scopus_negative_cache, None)
+
+def _find_orcid_researchers(email: str):
+    """Поиск исследователей ORCID по email через кэш"""
+    return _lookup_by_email(email, orcid_service.search_by_email,
+                            _orcid_positive_cache, _orcid_negative_cache, [])
+
+def _count_only_requested() -> bool:
+    """Запрошено ли только количество результатов (?count_only=1)"""
+    return request.args.get('count_only', '').lower() in ('1', 'true', 'yes')
+
 @scientific_api_bp.route('/scopus/search-by-email', methods=['POST'])
 @token_required
 def scopus_search_by_email():
     """Поиск публикаций в Scopus по email автора"""
-    try:
-        data = request.get_json()
-        if not data or 'email' not in data:
-            return jsonify({
-                'error': 'Email не указан',
-                'status': 'error'
-            }), 400
-        
-        email = data['email']
-        logger.info(f"Поиск в Scopus по email: {email}")
-        
-        # Поиск автора по email
-        author_info = scopus_service.search_author_by_email(email)
-        if not author_info:
-            return jsonify({
-                'message': 'Автор не найден в Scopus',
-                'author_info': None,
-                'publications': [],
-                'status': 'not_found'
-            })
-        
-        # Получение публикаций автора
-        publications = scopus_service.get_author_publications(author_info['author_id'])
-        
+    data = request.get_json()
+    if not data or 'email' not in data:
+        return _err('Email не указан', 400)
+    
+    email = data['email']
+    logger.info(f"Поиск в Scopus по email: {email}")
+    
+    # Поиск автора по email
+    author_info = _find_scopus_author(email)
+    if not author_info:
         return jsonify({
-            'message': 'Данные успешно получены из Scopus',
-            'author_info': author_info,
-            'publications': publications,
-            'total_publications': len(publications),
-            'status': 'success'
+            'message': 'Автор не найден в Scopus',
+            'author_info': None,
+            'publications': [],
+            'status': 'not_found'
         })
-        
-    except Exception as e:
-        logger.error(f"Ошибка при поиске в Scopus: {str(e)}")
-        return jsonify({
-            'error': f'Ошибка сервера: {str(e)}',
-            'status': 'error'
-        }), 500
+    
+    # Получение публикаций автора
+    publications = scopus_service.get_author_publications(author_info['author_id'])
+    
+    return jsonify({
+        'message': 'Данные успешно получены из Scopus',
+        'author_info': author_info,
+        'publications': publications,
+        'total_publications': len(publications),
+        'status': 'success'
+    })
 
 @scientific_api_bp.route('/scopus/search-publications', methods=['POST'])
 @token_required
 def scopus_search_publications():
     """Поиск публикаций в Scopus по запросу"""
-    try:
-        data = request.get_json()
-        if not data or 'query' not in data:
-            return jsonify({
-                'error': 'Поисковый запрос не указан',
-                'status': 'error'
-            }), 400
-        
-        query = data['query']
-        limit = data.get('limit', 20)
-        
-        logger.info(f"Поиск публикаций в Scopus по запросу: {query}")
-        
-        publications = scopus_service.search_publications_by_query(query, limit)
-        
+    data = request.get_json()
+    if not data or 'query' not in data:
+        return _err('Поисковый запрос не указан', 400)
+    
+    query = data['query']
+    limit = data.get('limit', 20)
+    
+    logger.info(f"Поиск публикаций в Scopus по запросу: {query}")
+    
+    publications = scopus_service.search_publications_by_query(query, limit)
+    
+    if _count_only_requested():
         return jsonify({
-            'message': 'Поиск выполнен успешно',
-            'publications': publications,
             'total_results': len(publications),
-            'query': query,
             'status': 'success'
         })
-        
-    except Exception as e:
-        logger.error(f"Ошибка при поиске публикаций в Scopus: {str(e)}")
-        return jsonify({
-            'error': f'Ошибка сервера: {str(e)}',
-            'status': 'error'
-        }), 500
+    
+    return jsonify({
+        'message': 'Поиск выполнен успешно',
+        'publications': publications,
+        'total_results': len(publications),
+        'query': query,
+        'status': 'success'
+    })
 
 @scientific_api_bp.route('/scopus/publication/<scopus_id>', methods=['GET'])
 @token_required
 def get_scopus_publication_details(scopus_id: str):
     """Получение детальной информации о публикации из Scopus"""
-    try:
-        logger.info(f"Получение деталей публикации Scopus ID: {scopus_id}")
-        
-        publication_details = scopus_service.get_publication_details(scopus_id)
-        
-        if not publication_details:
-            return jsonify({
-                'message': 'Публикация не найдена',
-                'status': 'not_found'
-            }), 404
-        
-        return jsonify({
-            'message': 'Детали публикации получены',
-            'publication': publication_details,
-            'status': 'success'
-        })
-        
-    except Exception as e:
-        logger.error(f"Ошибка при получении деталей публикации: {str(e)}")
+    logger.info(f"Получение деталей публикации Scopus ID: {scopus_id}")
+    
+    publication_details = scopus_service.get_publication_details(scopus_id)
+    
+    if not publication_details:
         return jsonify({
-            'error': f'Ошибка сервера: {str(e)}',
-            'status': 'error'
-        }), 500
+            'message': 'Публикация не найдена',
+            'status': 'not_found'
+        }), 404
+    
+    return jsonify({
+        'message': 'Детали публикации получены',
+        'publication': publication_details,
+        'status': 'success'
+    })
 
 @scientific_api_bp.route('/scopus/author-metrics/<author_id>', methods=['GET'])
 @token_required
 def get_scopus_author_metrics(author_id: str):
     """Получение метрик автора из Scopus"""
-    try:
-        logger.info(f"Получение метрик автора Scopus ID: {author_id}")
-        
-        metrics = scopus_service.get_author_metrics(author_id)
-        
-        if not metrics:
-            return jsonify({
-                'message': 'Автор не найден',
-                'status': 'not_found'
-            }), 404
-        
-        return jsonify({
-            'message': 'Метрики автора получены',
-            'metrics': metrics,
-            'status': 'success'
-        })
-        
-    except Exception as e:
-        logger.error(f"Ошибка при получении метрик автора: {str(e)}")
+    logger.info(f"Получение метрик автора Scopus ID: {author_id}")
+    
+    metrics = scopus_service.get_author_metrics(author_id)
+    
+    if not metrics:
         return jsonify({
-            'error': f'Ошибка сервера: {str(e)}',
-            'status': 'error'
-        }), 500
+            'message': 'Автор не найден',
+            'status': 'not_found'
+        }), 404
+    
+    return jsonify({
+        'message': 'Метрики автора получены',
+        'metrics': metrics,
+        'status': 'success'
+    })
 
 @scientific_api_bp.route('/orcid/search-by-email', methods=['POST'])
 @token_required
 def orcid_search_by_email():
     """Поиск исследователей в ORCID по email"""
-    try:
-        data = request.get_json()
-        if not data or 'email' not in data:
-            return jsonify({
-                'error': 'Email не указан',
-                'status': 'error'
-            }), 400
-        
-        email = data['email']
-        logger.info(f"Поиск в ORCID по email: {email}")
-        
-        # Поиск теперь включает автоматический дополнительный поиск по именам
-        researchers = orcid_service.search_by_email(email)
-        
+    data = request.get_json()
+    if not data or 'email' not in data:
+        return _err('Email не указан', 400)
+    
+    email = data['email']
+    logger.info(f"Поиск в ORCID по email: {email}")
+    
+    # Поиск теперь включает автоматический дополнительный поиск по именам
+    researchers = _find_orcid_researchers(email)
+    
+    if _count_only_requested():
         return jsonify({
-            'message': 'Поиск выполнен успешно (включая поиск по именам)',
-            'researchers': researchers,
             'total_results': len(researchers),
-            'email': email,
             'status': 'success'
         })
-        
-    except Exception as e:
-        logger.error(f"Ошибка при поиске в ORCID: {str(e)}")
-        return jsonify({
-            'error': f'Ошибка сервера: {str(e)}',
-            'status': 'error'
-        }), 500
+    
+    return jsonify({
+        'message': 'Поиск выполнен успешно (включая поиск по именам)',
+        'researchers': researchers,
+        'total_results': len(researchers),
+        'email': email,
+        'status': 'success'
+    })
 
 @scientific_api_bp.route('/orcid/search-by-name', methods=['POST'])
 @token_required
 def orcid_search_by_name():
     """Поиск исследователей в ORCID по имени"""
-    try:
-        data = request.get_json()
-        if not data or 'given_name' not in data or 'family_name' not in data:
-            return jsonify({
-                'error': 'Имя и фамилия должны быть указаны',
-                'status': 'error'
-            }), 400
-        
-        given_name = data['given_name']
-        family_name = data['family_name']
-        
-        logger.info(f"Поиск в ORCID по имени: {given_name} {family_name}")
-        
-        orcid_ids = orcid_service.search_by_name(given_name, family_name)
-        
-        # Получаем профили для найденных ORCID ID
-        researchers = []
-        for orcid_id in orcid_ids[:5]:  # Ограничиваем количество
-            profile = orcid_service.get_researcher_profile(orcid_id)
-            if profile:
-                researchers.append(profile)
-        
+    data = request.get_json()
+    if not data or 'given_name' not in data or 'family_name' not in data:
+        return _err('Имя и фамилия должны быть указаны', 400)
+    
+    given_name = data['given_name']
+    family_name = data['family_name']
+    
+    logger.info(f"Поиск в ORCID по имени: {given_name} {family_name}")
+    
+    orcid_ids = orcid_service.search_by_name(given_name, family_name)
+    
+    # Получаем профили для найденных ORCID ID параллельно (ограничиваем количество)
+    profiles = _io_pool.map(orcid_service.get_researcher_profile, orcid_ids[:5])
+    researchers = [profile for profile in profiles if profile]
+    
+    if _count_only_requested():
         return jsonify({
-            'message': 'Поиск выполнен успешно',
-            'researchers': researchers,
             'total_results': len(researchers),
-            'query': f"{given_name} {family_name}",
             'status': 'success'
         })
-        
-    except Exception as e:
-        logger.error(f"Ошибка при поиске в ORCID по имени: {str(e)}")
-        return jsonify({
-            'error': f'Ошибка сервера: {str(e)}',
-            'status': 'error'
-        }), 500
+    
+    return jsonify({
+        'message': 'Поиск выполнен успешно',
+        'researchers': researchers,
+        'total_results': len(researchers),
+        'query': f"{given_name} {family_name}",
+        'status': 'success'
+    })
 
 @scientific_api_bp.route('/orcid/profile/<orcid_id>', methods=['GET'])
 @token_required
 def get_orcid_profile(orcid_id: str):
     """Получение профиля исследователя из ORCID"""
-    try:
-        logger.info(f"Получение профиля ORCID: {orcid_id}")
-        
-        profile = orcid_service.get_researcher_profile(orcid_id)
-        
-        if not profile:
-            return jsonify({
-                'message': 'Профиль не найден',
-                'status': 'not_found'
-            }), 404
-        
-        return jsonify({
-            'message': 'Профиль получен успешно',
-            'profile': profile,
-            'status': 'success'
-        })
-        
-    except Exception as e:
-        logger.error(f"Ошибка при получении профиля ORCID: {str(e)}")
+    logger.info(f"Получение профиля ORCID: {orcid_id}")
+    
+    profile = orcid_service.get_researcher_profile(orcid_id)
+    
+    if not profile:
         return jsonify({
-            'error': f'Ошибка сервера: {str(e)}',
-            'status': 'error'
-        }), 500
+            'message': 'Профиль не найден',
+            'status': 'not_found'
+        }), 404
+    
+    return jsonify({
+        'message': 'Профиль получен успешно',
+        'profile': profile,
+        'status': 'success'
+    })
 
 @scientific_api_bp.route('/orcid/works/<orcid_id>', methods=['GET'])
 @token_required
 def get_orcid_works(orcid_id: str):
     """Получение списка работ исследователя из ORCID"""
-    try:
-        limit = request.args.get('limit', 20, type=int)
-        
-        logger.info(f"Получение работ ORCID: {orcid_id}")
-        
-        works = orcid_service.get_researcher_works(orcid_id, limit)
-        
+    limit = request.args.get('limit', 20, type=int)
+    
+    logger.info(f"Получение работ ORCID: {orcid_id}")
+    
+    works = orcid_service.get_researcher_works(orcid_id, limit)
+    
+    if _count_only_requested():
         return jsonify({
-            'message': 'Список работ получен',
-            'works': works,
             'total_works': len(works),
-            'orcid_id': orcid_id,
             'status': 'success'
         })
-        
-    except Exception as e:
-        logger.error(f"Ошибка при получении работ ORCID: {str(e)}")
-        return jsonify({
-            'error': f'Ошибка сервера: {str(e)}',
-            'status': 'error'
-        }), 500
+    
+    return jsonify({
+        'message': 'Список работ получен',
+        'works': works,
+        'total_works': len(works),
+        'orcid_id': orcid_id,
+        'status': 'success'
+    })
 
 @scientific_api_bp.route('/combined-search', methods=['POST'])
 @token_required
 def combined_scientific_search():
     """Комбинированный поиск по Scopus и ORCID"""
-    try:
-        data = request.get_json()
-        if not data or 'email' not in data:
-            return jsonify({
-                'error': 'Email не указан',
-                'status': 'error'
-            }), 400
-        
-        email = data['email']
-        logger.info(f"Комбинированный поиск по email: {email}")
-        
-        result = {
-            'email': email,
-            'scopus_data': {},
-            'orcid_data': {},
-            'combined_analysis': {},
-            'status': 'success'
+    data = request.get_json()
+    if not data or 'email' not in data:
+        return _err('Email не указан', 400)
+    
+    email = data['email']
+    logger.info(f"Комбинированный поиск по email: {email}")
+    
+    result = {
+        'email': email,
+        'scopus_data': {},
+        'orcid_data': {},
+        'combined_analysis': {},
+        'status': 'success'
+    }
+    
+    cache_key = hashlib.sha256(email.strip().lower().encode()).hexdigest()
+    with _combined_cache_lock:
+        cached = _combined_cache.get(cache_key)
+    
+    if cached:
+        result['scopus_data'], result['orcid_data'], result['combined_analysis'] = cached
+        return jsonify(_shape_combined_result(result))
+    
+    # Scopus и ORCID независимы, поэтому опрашиваем их параллельно
+    scopus_future = _io_pool.submit(_do_scopus, email)
+    orcid_future = _io_pool.submit(_do_orcid, email)
+    wait([scopus_future, orcid_future])
+    
+    result['scopus_data'] = scopus_future.result()
+    result['orcid_data'] = orcid_future.result()
+    
+    # Анализ и сравнение данных
+    result['combined_analysis'] = _analyze_combined_data(result['scopus_data'], result['orcid_data'])
+    
+    # Ошибки внешних API не кэшируем, чтобы следующий запрос повторил попытку
+    if 'error' not in result['scopus_data'] and 'error' not in result['orcid_data']:
+        with _combined_cache_lock:
+            _combined_cache[cache_key] = (
+                result['scopus_data'], result['orcid_data'], result['combined_analysis']
+            )
+    
+    return jsonify(_shape_combined_result(result))
+
+def _shape_combined_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Сокращение ответа комбинированного поиска по параметрам count_only и include"""
+    if _count_only_requested():
+        return {
+            'email': result['email'],
+            'total_publications': result['scopus_data'].get('total_publications', 0),
+            'total_works': result['orcid_data'].get('total_works', 0),
+            'status': result['status']
         }
-        
-        # Поиск в Scopus
-        try:
-            scopus_author = scopus_service.search_author_by_email(email)
-            if scopus_author:
-                scopus_publications = scopus_service.get_author_publications(scopus_author['author_id'])
-                result['scopus_data'] = {
-                    'author_info': scopus_author,
-                    'publications': scopus_publications,
-                    'total_publications': len(scopus_publications)
-                }
-            else:
-                result['scopus_data'] = {'message': 'Не найден в Scopus'}
-        except Exception as e:
-            logger.error(f"Ошибка поиска в Scopus: {str(e)}")
-            result['scopus_data'] = {'error': str(e)}
-        
-        # Поиск в ORCID
-        try:
-            orcid_researchers = orcid_service.search_by_email(email)
-            if orcid_researchers:
-                # Получаем детальную информацию о первом найденном исследователе
-                main_researcher = orcid_researchers[0]
-                orcid_works = orcid_service.get_researcher_works(main_researcher['orcid_id'])
-                
-                result['orcid_data'] = {
-                    'researchers': orcid_researchers,
-                    'main_researcher': main_researcher,
-                    'works': orcid_works,
-                    'total_researchers': len(orcid_researchers),
-                    'total_works': len(orcid_works)
-                }
-            else:
-                result['orcid_data'] = {'message': 'Не найден в ORCID'}
-        except Exception as e:
-            logger.error(f"Ошибка поиска в ORCID: {str(e)}")
-            result['orcid_data'] = {'error': str(e)}
-        
-        # Анализ и сравнение данных
-        result['combined_analysis'] = _analyze_combined_data(result['scopus_data'], result['orcid_data'])
-        
-        return jsonify(result)
-        
+    
+    include = request.args.get('include')
+    if not include:
+        return result
+    
+    requested = {section.strip() for section in include.split(',')}
+    shaped = {'email': result['email'], 'status': result['status']}
+    for section, key in COMBINED_SECTIONS.items():
+        if section in requested:
+            shaped[key] = result[key]
+    return shaped
+
+def _do_scopus(email: str) -> Dict[str, Any]:
+    """Поиск автора и его публикаций в Scopus для комбинированного поиска"""
+    try:
+        scopus_author = _find_scopus_author(email)
+        if scopus_author:
+            scopus_publications = scopus_service.get_author_publications(scopus_author['author_id'])
+            return {
+                'author_info': scopus_author,
+                'publications': scopus_publications,
+                'total_publications': len(scopus_publications)
+            }
+        return {'message': 'Не найден в Scopus'}
     except Exception as e:
-        logger.error(f"Ошибка комбинированного поиска: {str(e)}")
-        return jsonify({
-            'error': f'Ошибка сервера: {str(e)}',
-            'status': 'error'
-        }), 500
+        logger.error(f"Ошибка поиска в Scopus: {str(e)}")
+        return {'error': str(e)}
+
+def _do_orcid(email: str) -> Dict[str, Any]:
+    """Поиск исследователя и его работ в ORCID для комбинированного поиска"""
+    try:
+        orcid_researchers = _find_orcid_researchers(email)
+        if orcid_researchers:
+            # Получаем детальную информацию о первом найденном исследователе
+            main_researcher = orcid_researchers[0]
+            orcid_works = orcid_service.get_researcher_works(main_researcher['orcid_id'])
+            
+            return {
+                'researchers': orcid_researchers,
+                'main_researcher': main_researcher,
+                'works': orcid_works,
+                'total_researchers': len(orcid_researchers),
+                'total_works': len(orcid_works)
+            }
+        return {'message': 'Не найден в ORCID'}
+    except Exception as e:
+        logger.error(f"Ошибка поиска в ORCID: {str(e)}")
+        return {'error': str(e)}
 
 def _analyze_combined_data(scopus_data: Dict[str, Any], orcid_data: Dict[str, Any]) -> Dict[str, Any]:
     """Анализ и сравнение данных из Scopus и ORCID"""
@@ -400,111 +493,64 @@ def _analyze_combined_data(scopus_data: Dict[str, Any], orcid_data: Dict[str, An
 @token_required
 def elibrary_search_by_email():
     """Поиск публикаций в elibrary.ru по email"""
-    try:
-        data = request.get_json()
-        if not data or 'email' not in data:
-            return jsonify({
-                'error': 'Email не указан',
-                'status': 'error'
-            }), 400
-        
-        email = data['email']
-        search_options = data.get('search_options', {})
-        
-        logger.info(f"Поиск в elibrary.ru по email: {email}")
-        
-        # Выполняем поиск по email
-        search_results = elibrary_service.search_by_email(email, search_options)
-        
-        if 'error' in search_results:
-            return jsonify({
-                'error': search_results['error'],
-                'status': 'error'
-            }), 400
-        
-        # Форматируем результаты для визуализации
-        formatted_results = elibrary_service.format_results_for_visualization(search_results)
-        
-        return jsonify({
-            'message': 'Поиск в elibrary.ru выполнен успешно',
-            'search_results': search_results,
-            'formatted_results': formatted_results,
-            'status': 'success'
-        })
-        
-    except Exception as e:
-        logger.error(f"Ошибка при поиске в elibrary.ru: {str(e)}")
-        return jsonify({
-            'error': f'Ошибка сервера: {str(e)}',
-            'status': 'error'
-        }), 500
+    data = request.get_json()
+    if not data or 'email' not in data:
+        return _err('Email не указан', 400)
+    
+    email = data['email']
+    search_options = data.get('search_options', {})
+    
+    logger.info(f"Поиск в elibrary.ru по email: {email}")
+    
+    # Выполняем поиск по email
+    search_results = elibrary_service.search_by_email(email, search_options)
+    
+    if 'error' in search_results:
+        return _err(search_results['error'], 400)
+    
+    # Форматируем результаты для визуализации
+    formatted_results = elibrary_service.format_results_for_visualization(search_results)
+    
+    return jsonify({
+        'message': 'Поиск в elibrary.ru выполнен успешно',
+        'search_results': search_results,
+        'formatted_results': formatted_results,
+        'status': 'success'
+    })
 
 @scientific_api_bp.route('/elibrary/publication-details', methods=['POST'])
 @token_required
 def get_elibrary_publication_details():
     """Получение детальной информации о публикации из elibrary.ru"""
-    try:
-        data = request.get_json()
-        if not data or 'publication_url' not in data:
-            return jsonify({
-                'error': 'URL публикации не указан',
-                'status': 'error'
-            }), 400
-        
-        publication_url = data['publication_url']
-        
-        logger.info(f"Получение деталей публикации elibrary: {publication_url}")
-        
-        details = elibrary_service.get_publication_details(publication_url)
-        
-        if not details:
-            return jsonify({
-                'message': 'Не удалось получить детали публикации',
-                'status': 'not_found'
-            }), 404
-        
-        return jsonify({
-            'message': 'Детали публикации получены',
-            'details': details,
-            'status': 'success'
-        })
-        
-    except Exception as e:
-        logger.error(f"Ошибка при получении деталей публикации: {str(e)}")
+    data = request.get_json()
+    if not data or 'publication_url' not in data:
+        return _err('URL публикации не указан', 400)
+    
+    publication_url = data['publication_url']
+    
+    logger.info(f"Получение деталей публикации elibrary: {publication_url}")
+    
+    details = elibrary_service.get_publication_details(publication_url)
+    
+    if not details:
         return jsonify({
-            'error': f'Ошибка сервера: {str(e)}',
-            'status': 'error'
-        }), 500
+            'message': 'Не удалось получить детали публикации',
+            'status': 'not_found'
+        }), 404
+    
+    return jsonify({
+        'message': 'Детали публикации получены',
+        'details': details,
+        'status': 'success'
+    })
 
 @scientific_api_bp.route('/api-status', methods=['GET'])
 @token_required
 def get_api_status():
     """Проверка статуса API ключей"""
-    try:
-        status = {
-            'scopus': {
-                'available': bool(scopus_service.api_key),
-                'base_url': scopus_service.base_url
-            },
-            'orcid': {
-                'available': bool(orcid_service.client_id),
-                'base_url': orcid_service.base_url
-            },
-            'elibrary': {
-                'available': True,
-                'base_url': elibrary_service.base_url
-            }
-        }
-        
-        return jsonify({
-            'message': 'Статус API получен',
-            'api_status': status,
-            'status': 'success'
-        })
-        
-    except Exception as e:
-        logger.error(f"Ошибка при получении статуса API: {str(e)}")
-        return jsonify({
-            'error': f'Ошибка сервера: {str(e)}',
-            'status': 'error'
-        }), 500
+    matched = matched_etag(_API_STATUS_ETAG)
+    if matched:
+        return Response(status=304, headers={'ETag': f'"{matched}"'})
+    
+    return Response(_API_STATUS_BODY, mimetype='application/json',
+                    headers={'ETag': f'"{_API_STATUS_ETAG}"'})
@@ -1,15 +1,122 @@
 import sqlite3
 import hashlib
+import hmac
 import secrets
 import jwt
+import json
 import time
 import logging
+import queue
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
 from typing import Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
+from urllib.request import pathname2url
 import os
 
+try:
+    from argon2 import PasswordHasher
+    from argon2.exceptions import VerificationError, InvalidHashError
+except ImportError:
+    PasswordHasher = None
+
+try:
+    from cachetools import TTLCache, TLRUCache
+except ImportError:
+    TTLCache = TLRUCache = None
+
 logger = logging.getLogger(__name__)
 
+# Параметры устаревшего PBKDF2-хэширования (используются для проверки старых записей)
+PBKDF2_ITERATIONS = 100000
+
+# Количество соединений только для чтения (WAL позволяет читать параллельно с записью)
+AUTH_READ_POOL_SIZE = min((os.cpu_count() or 1) * 2, 8)
+
+# Кэш успешных аутентификаций по API ключу
+API_KEY_CACHE_SIZE = 4096
+API_KEY_CACHE_TTL_SECONDS = 15
+
+# Кэш проверенных JWT: запись живет до exp токена, но не дольше TTL,
+# чтобы деактивация сессии или пользователя в БД вступала в силу
+JWT_CACHE_SIZE = 4096
+JWT_CACHE_MAX_TTL_SECONDS = 60
+# Обновление last_activity сессии не чаще одного раза за окно
+SESSION_ACTIVITY_WINDOW_SECONDS = 5
+# Период подгрузки новых отозванных jti (отзыв мог произойти в другом экземпляре/процессе)
+REVOKED_JTI_REFRESH_SECONDS = 5
+
+# Фоновый writer копит до WRITE_BATCH_SIZE записей, но ждет не дольше WRITE_BATCH_DELAY_SECONDS
+WRITE_BATCH_SIZE = 256
+WRITE_BATCH_DELAY_SECONDS = 0.2
+
+# SQL-запросы горячих путей аутентификации. Одинаковый текст запроса позволяет
+# sqlite3 переиспользовать подготовленные выражения из кэша соединения
+SQL_SELECT_LOGIN_USER = '''
+    SELECT id, username, email, password_hash, user_type, is_active, is_verified
+    FROM auth_users 
+    WHERE (username = ? OR email = ?) AND is_active = 1
+'''
+
+SQL_INSERT_SESSION = '''
+    INSERT INTO auth_sessions 
+    (user_id, session_token, refresh_token, ip_address, user_agent, expires_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
+SQL_UPDATE_LOGIN_STATS = '''
+    UPDATE auth_users 
+    SET last_login = CURRENT_TIMESTAMP, login_count = login_count + 1
+    WHERE id = ?
+'''
+
+SQL_SELECT_API_KEY = '''
+    SELECT ak.id, ak.user_id, ak.name, ak.permissions, ak.expires_at,
+           u.username, u.email, u.user_type, u.is_active
+    FROM auth_api_keys ak
+    JOIN auth_users u ON ak.user_id = u.id
+    WHERE ak.key_hash = ? AND ak.is_active = 1 AND u.is_active = 1
+    AND (ak.expires_at IS NULL OR ak.expires_at > CURRENT_TIMESTAMP)
+'''
+
+SQL_SELECT_SESSION = '''
+    SELECT s.id, u.username, u.email, u.user_type, u.is_active
+    FROM auth_sessions s
+    JOIN auth_users u ON s.user_id = u.id
+    WHERE s.session_token = ? AND s.is_active = 1 
+    AND s.expires_at > CURRENT_TIMESTAMP AND u.is_active = 1
+'''
+
+SQL_INSERT_API_KEY_WITHIN_LIMIT = '''
+    INSERT INTO auth_api_keys 
+    (user_id, key_hash, key_prefix, name, permissions, expires_at)
+    SELECT ?, ?, ?, ?, ?, ?
+    WHERE (SELECT COUNT(*) FROM auth_api_keys WHERE user_id = ? AND is_active = 1) < ?
+'''
+
+SQL_UPDATE_API_KEY_USAGE = '''
+    UPDATE auth_api_keys 
+    SET last_used = CURRENT_TIMESTAMP, usage_count = usage_count + 1
+    WHERE id = ?
+'''
+
+SQL_UPDATE_SESSION_ACTIVITY = '''
+    UPDATE auth_sessions 
+    SET last_activity = CURRENT_TIMESTAMP
+    WHERE session_token = ?
+'''
+
+SQL_SELECT_REVOKED_JTI = '''
+    SELECT id, jti FROM auth_revoked_jti WHERE id > ? ORDER BY id
+'''
+
+SQL_INSERT_AUTH_LOG = '''
+    INSERT INTO auth_logs 
+    (user_id, action, ip_address, user_agent, success, error_message, metadata)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+'''
+
 class AuthService:
     """Сервис аутентификации и авторизации"""
     
@@ -28,9 +135,25 @@ class AuthService:
         self.token_settings = {
             'access_token_expire_hours': 24,
             'refresh_token_expire_days': 30,
-            'api_key_expire_days': 365
+            'api_key_expire_days': 365,
+            # Параметры Argon2id (рекомендации OWASP), можно перенастроить без изменения кода
+            'argon2_time_cost': 3,
+            'argon2_memory_cost': 46 * 1024,
+            'argon2_parallelism': 2
         }
         
+        if PasswordHasher:
+            self.password_hasher = PasswordHasher(
+                time_cost=self.token_settings['argon2_time_cost'],
+                memory_cost=self.token_settings['argon2_memory_cost'],
+                parallelism=self.token_settings['argon2_parallelism'],
+                hash_len=32,
+                salt_len=16
+            )
+        else:
+            self.password_hasher = None
+            logger.warning("argon2-cffi не установлен, пароли хэшируются через PBKDF2")
+        
         # Типы пользователей и их права
         self.user_types = {
             'free': {
@@ -50,12 +173,161 @@ class AuthService:
             }
         }
         
+        # Кэш принципалов по хэшу API ключа: повторные запросы не обращаются к SQLite
+        self._api_key_cache = TTLCache(maxsize=API_KEY_CACHE_SIZE, ttl=API_KEY_CACHE_TTL_SECONDS) if TTLCache else None
+        self._jwt_cache = TLRUCache(maxsize=JWT_CACHE_SIZE, ttu=self._jwt_cache_ttu, timer=time.time) if TLRUCache else None
+        self._session_activity = {}
+        self._cache_lock = threading.RLock()
+        
+        # Отозванные jti: таблица auth_revoked_jti, зеркалируемая в памяти
+        self._revoked_jti = set()
+        self._revoked_jti_last_id = 0
+        self._revoked_jti_checked_at = 0.0
+        
+        # SHA-256 горячих ключей не пересчитываем; кэш у каждого экземпляра свой
+        self._hash_api_key = lru_cache(maxsize=API_KEY_CACHE_SIZE)(self._hash_api_key)
+        
+        # Одно постоянное соединение для записи (SQLite все равно сериализует запись)
+        self._write_lock = threading.RLock()
+        self._write_conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=256)
+        for pragma in ('journal_mode=WAL', 'synchronous=NORMAL', 'temp_store=MEMORY',
+                       'mmap_size=268435456', 'cache_size=-20000'):
+            self._write_conn.execute(f'PRAGMA {pragma}')
+        
+        # Отложенные записи (статистика использования, логи) пишет один фоновый поток
+        self._write_queue = queue.Queue()
+        self._writer_thread = threading.Thread(target=self._write_worker, daemon=True)
+        self._writer_thread.start()
+        
         self.init_auth_tables()
+        
+        # Пул соединений для чтения открываем после создания таблиц
+        self._read_pool = queue.Queue(maxsize=AUTH_READ_POOL_SIZE)
+        for _ in range(AUTH_READ_POOL_SIZE):
+            self._read_pool.put(self._open_read_connection())
+        
+        self._refresh_revoked_jti(force=True)
+    
+    def _open_read_connection(self) -> sqlite3.Connection:
+        """Открытие соединения только для чтения"""
+        uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None,
+                               cached_statements=256)
+        for pragma in ('query_only=1', 'temp_store=MEMORY', 'mmap_size=268435456', 'cache_size=-20000'):
+            conn.execute(f'PRAGMA {pragma}')
+        return conn
+    
+    @contextmanager
+    def _get_read_conn(self):
+        """Соединение для чтения из пула"""
+        conn = self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            self._read_pool.put(conn)
+    
+    @contextmanager
+    def _get_write_conn(self):
+        """Соединение для записи: транзакция фиксируется при выходе, откатывается при ошибке"""
+        with self._write_lock:
+            with self._write_conn:
+                yield self._write_conn
+    
+    def close(self):
+        """Закрытие соединений с базой данных"""
+        self.flush()
+        while True:
+            try:
+                conn = self._read_pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+        with self._write_lock:
+            self._write_conn.close()
+    
+    def _write_worker(self):
+        """Фоновая запись накопленных изменений пачками в одной транзакции"""
+        while True:
+            batch = [self._write_queue.get()]
+            deadline = time.monotonic() + WRITE_BATCH_DELAY_SECONDS
+            while len(batch) < WRITE_BATCH_SIZE:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._write_queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            
+            try:
+                with self._get_write_conn() as conn:
+                    # Подряд идущие одинаковые запросы выполняем одним executemany
+                    i = 0
+                    while i < len(batch):
+                        sql = batch[i][0]
+                        j = i
+                        while j < len(batch) and batch[j][0] is sql:
+                            j += 1
+                        conn.executemany(sql, [params for _, params in batch[i:j]])
+                        i = j
+            except Exception as e:
+                logger.error(f"Ошибка фоновой записи данных аутентификации: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._write_queue.task_done()
+    
+    def _enqueue_write(self, sql: str, params: tuple):
+        """Постановка записи в очередь фонового writer'а"""
+        self._write_queue.put_nowait((sql, params))
+    
+    def flush(self):
+        """Ожидание записи всех отложенных изменений"""
+        self._write_queue.join()
+    
+    @staticmethod
+    def _jwt_cache_ttu(key, value, now):
+        """Время истечения записи кэша JWT"""
+        return min(value['exp'], now + JWT_CACHE_MAX_TTL_SECONDS)
+    
+    def _touch_session(self, session_token: str):
+        """Отложенное обновление last_activity, не чаще раза в окно на сессию"""
+        now = time.monotonic()
+        with self._cache_lock:
+            if now - self._session_activity.get(session_token, 0.0) < SESSION_ACTIVITY_WINDOW_SECONDS:
+                return
+            self._session_activity[session_token] = now
+        self._enqueue_write(SQL_UPDATE_SESSION_ACTIVITY, (session_token,))
+    
+    def _refresh_revoked_jti(self, force: bool = False, reload: bool = False):
+        """Подгрузка jti, отозванных с момента последней проверки (reload - перечитать все)"""
+        now = time.monotonic()
+        with self._cache_lock:
+            if not force and not reload and now - self._revoked_jti_checked_at < REVOKED_JTI_REFRESH_SECONDS:
+                return
+            self._revoked_jti_checked_at = now
+            last_id = 0 if reload else self._revoked_jti_last_id
+        
+        with self._get_read_conn() as conn:
+            rows = conn.execute(SQL_SELECT_REVOKED_JTI, (last_id,)).fetchall()
+        
+        with self._cache_lock:
+            if reload:
+                # Новый набор подменяет старый целиком, без окна с пустым списком
+                self._revoked_jti = {jti for _, jti in rows}
+                self._revoked_jti_last_id = rows[-1][0] if rows else 0
+            elif rows:
+                self._revoked_jti.update(jti for _, jti in rows)
+                self._revoked_jti_last_id = max(self._revoked_jti_last_id, rows[-1][0])
+    
+    def _is_jti_revoked(self, jti: str) -> bool:
+        """Проверка jti по списку отозванных"""
+        self._refresh_revoked_jti()
+        return jti in self._revoked_jti
     
     def init_auth_tables(self):
         """Инициализация таблиц аутентификации"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_write_conn() as conn:
                 cursor = conn.cursor()
                 
                 # Таблица пользователей
@@ -110,6 +382,16 @@ class AuthService:
                     )
                 ''')
                 
+                # Отозванные токены (jti), хранятся до истечения токена
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS auth_revoked_jti (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        jti TEXT UNIQUE NOT NULL,
+                        expires_at TIMESTAMP NOT NULL,
+                        revoked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
                 # Таблица логов аутентификации
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS auth_logs (
@@ -125,16 +407,38 @@ class AuthService:
                     )
                 ''')
                 
-                # Индексы для оптимизации
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_auth_users_email ON auth_users(email)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_auth_users_username ON auth_users(username)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_auth_api_keys_hash ON auth_api_keys(key_hash)')
+                # Индексы для оптимизации. username, email, key_hash и session_token уже
+                # проиндексированы UNIQUE-ограничениями, отдельные индексы по ним не нужны
+                for index_name in ('idx_auth_users_email', 'idx_auth_users_username',
+                                   'idx_auth_api_keys_hash', 'idx_auth_sessions_token'):
+                    cursor.execute(f'DROP INDEX IF EXISTS {index_name}')
+                
+                # Частичные покрывающие индексы для проверки API ключей и сессий
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_auth_api_keys_active 
+                    ON auth_api_keys(key_hash, user_id, name, permissions, expires_at, is_active) WHERE is_active = 1
+                ''')
+                cursor.execute('''
+                    CREATE INDEX IF NOT EXISTS idx_auth_sessions_token_active 
+                    ON auth_sessions(session_token, user_id, expires_at, is_active) WHERE is_active = 1
+                ''')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_auth_api_keys_user ON auth_api_keys(user_id)')
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_auth_sessions_token ON auth_sessions(session_token)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_auth_sessions_user ON auth_sessions(user_id)')
+                # Статистика нужна планировщику, чтобы он выбирал покрывающие индексы вместо UNIQUE
+                cursor.execute('ANALYZE auth_api_keys')
+                cursor.execute('ANALYZE auth_sessions')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_auth_logs_user ON auth_logs(user_id)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_auth_logs_timestamp ON auth_logs(timestamp)')
                 
+                # Разрешения ключей хранятся JSON-списком; переводим старые записи через запятую
+                cursor.execute("SELECT id, permissions FROM auth_api_keys WHERE permissions IS NULL OR permissions NOT LIKE '[%'")
+                legacy_keys = cursor.fetchall()
+                if legacy_keys:
+                    cursor.executemany('UPDATE auth_api_keys SET permissions = ? WHERE id = ?', [
+                        (json.dumps(permissions.split(',') if permissions else []), key_id)
+                        for key_id, permissions in legacy_keys
+                    ])
+                
                 conn.commit()
                 
                 # Создаем администратора по умолчанию если его нет
@@ -149,7 +453,7 @@ class AuthService:
     def _create_default_admin(self):
         """Создание администратора по умолчанию"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_write_conn() as conn:
                 cursor = conn.cursor()
                 
                 # Проверяем, есть ли уже администратор
@@ -170,7 +474,8 @@ class AuthService:
                 conn.commit()  # Коммитим создание пользователя
                 
                 # Теперь создаем API ключ для администратора
-                api_key = self.generate_api_key(admin_id, 'Default Admin Key', ['admin', 'search', 'analytics'])
+                api_key = self.generate_api_key(admin_id, 'Default Admin Key', ['admin', 'search', 'analytics'],
+                                                user_type='enterprise')
                 
                 logger.info(f"Создан администратор по умолчанию. API ключ: {api_key}")
                 
@@ -178,20 +483,41 @@ class AuthService:
             logger.error(f"Ошибка создания администратора: {str(e)}")
     
     def _hash_password(self, password: str) -> str:
-        """Хэширование пароля"""
+        """Хэширование пароля (Argon2id, при отсутствии argon2-cffi - PBKDF2)"""
+        if self.password_hasher:
+            return self.password_hasher.hash(password)
+        
         salt = secrets.token_hex(16)
-        password_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
+        password_hash = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), PBKDF2_ITERATIONS)
         return f"{salt}:{password_hash.hex()}"
     
     def _verify_password(self, password: str, password_hash: str) -> bool:
         """Проверка пароля"""
+        if password_hash.startswith('$argon2'):
+            if not self.password_hasher:
+                return False
+            try:
+                return self.password_hasher.verify(password_hash, password)
+            except (VerificationError, InvalidHashError):
+                return False
+        
+        # Старые записи в формате salt:hex (PBKDF2)
         try:
             salt, stored_hash = password_hash.split(':')
-            password_hash_check = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), 100000)
-            return stored_hash == password_hash_check.hex()
+            password_hash_check = hashlib.pbkdf2_hmac('sha256', password.encode(), salt.encode(), PBKDF2_ITERATIONS)
+            # Сравнение за постоянное время, чтобы не раскрывать позицию первого несовпадения
+            return hmac.compare_digest(bytes.fromhex(stored_hash), password_hash_check)
         except:
             return False
     
+    def _password_needs_rehash(self, password_hash: str) -> bool:
+        """Нужно ли перехэшировать пароль (PBKDF2-запись или устаревшие параметры Argon2)"""
+        if not self.password_hasher:
+            return False
+        if not password_hash.startswith('$argon2id$'):
+            return True
+        return self.password_hasher.check_needs_rehash(password_hash)
+    
     def _hash_api_key(self, api_key: str) -> str:
         """Хэширование API ключа"""
         return hashlib.sha256(api_key.encode()).hexdigest()
@@ -205,7 +531,7 @@ class AuthService:
             
             password_hash = self._hash_password(password)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_write_conn() as conn:
                 cursor = conn.cursor()
                 
                 # Проверяем уникальность
@@ -223,7 +549,7 @@ class AuthService:
                 user_id = cursor.lastrowid
                 
                 # Создаем API ключ по умолчанию
-                api_key = self.generate_api_key(user_id, 'Default API Key', ['search'])
+                api_key = self.generate_api_key(user_id, 'Default API Key', ['search'], user_type=user_type)
                 
                 conn.commit()
                 
@@ -246,61 +572,60 @@ class AuthService:
                          ip_address: str = None, user_agent: str = None) -> Tuple[bool, Dict[str, Any]]:
         """Аутентификация пользователя по логину и паролю"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Ищем пользователя
-                cursor.execute('''
-                    SELECT id, username, email, password_hash, user_type, is_active, is_verified
-                    FROM auth_users 
-                    WHERE (username = ? OR email = ?) AND is_active = 1
-                ''', (username, username))
-                
-                user = cursor.fetchone()
-                if not user:
-                    self._log_auth_event(None, 'login_failed', ip_address, user_agent, False, 'User not found')
-                    return False, {'error': 'Неверные учетные данные'}
-                
-                user_id, username, email, password_hash, user_type, is_active, is_verified = user
-                
-                # Проверяем пароль
-                if not self._verify_password(password, password_hash):
-                    self._log_auth_event(user_id, 'login_failed', ip_address, user_agent, False, 'Invalid password')
-                    return False, {'error': 'Неверные учетные данные'}
-                
-                # Создаем сессию
-                access_token = self._generate_jwt_token(user_id, 'access')
-                refresh_token = self._generate_jwt_token(user_id, 'refresh')
+            # Ищем пользователя
+            with self._get_read_conn() as conn:
+                user = conn.execute(SQL_SELECT_LOGIN_USER, (username, username)).fetchone()
+            
+            if not user:
+                self._log_auth_event(None, 'login_failed', ip_address, user_agent, False, 'User not found')
+                return False, {'error': 'Неверные учетные данные'}
+            
+            user_id, username, email, password_hash, user_type, is_active, is_verified = user
+            
+            # Проверяем пароль (Argon2 намеренно медленный, поэтому вне блокировки записи)
+            if not self._verify_password(password, password_hash):
+                self._log_auth_event(user_id, 'login_failed', ip_address, user_agent, False, 'Invalid password')
+                return False, {'error': 'Неверные учетные данные'}
+            
+            # Прозрачно переводим старые PBKDF2-хэши на Argon2id при успешном входе
+            new_password_hash = None
+            if self._password_needs_rehash(password_hash):
+                new_password_hash = self._hash_password(password)
+            
+            # Создаем сессию
+            # Данные пользователя и общий jti пары токенов кладем в payload,
+            # чтобы проверка токена не обращалась к БД
+            jti = secrets.token_urlsafe(12)
+            claims = {'username': username, 'email': email, 'user_type': user_type}
+            issued_at = datetime.utcnow()
+            access_token = self._generate_jwt_token(user_id, 'access', jti, claims, issued_at)
+            refresh_token = self._generate_jwt_token(user_id, 'refresh', jti, claims, issued_at)
+            expires_at = datetime.now() + timedelta(hours=self.token_settings['access_token_expire_hours'])
+            
+            with self._get_write_conn() as conn:
+                if new_password_hash:
+                    conn.execute('UPDATE auth_users SET password_hash = ? WHERE id = ?',
+                                 (new_password_hash, user_id))
                 
                 # Сохраняем сессию
-                expires_at = datetime.now() + timedelta(hours=self.token_settings['access_token_expire_hours'])
-                cursor.execute('''
-                    INSERT INTO auth_sessions 
-                    (user_id, session_token, refresh_token, ip_address, user_agent, expires_at)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (user_id, access_token, refresh_token, ip_address, user_agent, expires_at))
+                conn.execute(SQL_INSERT_SESSION,
+                             (user_id, access_token, refresh_token, ip_address, user_agent, expires_at))
                 
                 # Обновляем статистику пользователя
-                cursor.execute('''
-                    UPDATE auth_users 
-                    SET last_login = CURRENT_TIMESTAMP, login_count = login_count + 1
-                    WHERE id = ?
-                ''', (user_id,))
-                
-                conn.commit()
-                
-                # Логируем успешный вход
-                self._log_auth_event(user_id, 'login_success', ip_address, user_agent, True)
-                
-                return True, {
-                    'user_id': user_id,
-                    'username': username,
-                    'email': email,
-                    'user_type': user_type,
-                    'access_token': access_token,
-                    'refresh_token': refresh_token,
-                    'expires_in': self.token_settings['access_token_expire_hours'] * 3600
-                }
+                conn.execute(SQL_UPDATE_LOGIN_STATS, (user_id,))
+            
+            # Логируем успешный вход
+            self._log_auth_event(user_id, 'login_success', ip_address, user_agent, True)
+            
+            return True, {
+                'user_id': user_id,
+                'username': username,
+                'email': email,
+                'user_type': user_type,
+                'access_token': access_token,
+                'refresh_token': refresh_token,
+                'expires_in': self.token_settings['access_token_expire_hours'] * 3600
+            }
                 
         except Exception as e:
             logger.error(f"Ошибка аутентификации: {str(e)}")
@@ -312,18 +637,24 @@ class AuthService:
         try:
             key_hash = self._hash_api_key(api_key)
             
-            with sqlite3.connect(self.db_path) as conn:
+            # Горячие ключи обслуживаем из кэша, статистику пишем в фоне
+            if self._api_key_cache is not None:
+                with self._cache_lock:
+                    cached = self._api_key_cache.get(key_hash)
+                if cached:
+                    key_id, principal = cached
+                    self._enqueue_write(SQL_UPDATE_API_KEY_USAGE, (key_id,))
+                    self._enqueue_write(SQL_INSERT_AUTH_LOG, (
+                        principal['user_id'], 'api_key_used', ip_address, None, True,
+                        f"Key: {principal['api_key_name']}", None
+                    ))
+                    return True, dict(principal)
+            
+            with self._get_read_conn() as conn:
                 cursor = conn.cursor()
                 
                 # Ищем API ключ
-                cursor.execute('''
-                    SELECT ak.id, ak.user_id, ak.name, ak.permissions, ak.expires_at,
-                           u.username, u.email, u.user_type, u.is_active
-                    FROM auth_api_keys ak
-                    JOIN auth_users u ON ak.user_id = u.id
-                    WHERE ak.key_hash = ? AND ak.is_active = 1 AND u.is_active = 1
-                    AND (ak.expires_at IS NULL OR ak.expires_at > CURRENT_TIMESTAMP)
-                ''', (key_hash,))
+                cursor.execute(SQL_SELECT_API_KEY, (key_hash,))
                 
                 result = cursor.fetchone()
                 if not result:
@@ -331,28 +662,28 @@ class AuthService:
                     return False, {'error': 'Неверный API ключ'}
                 
                 key_id, user_id, key_name, permissions, expires_at, username, email, user_type, is_active = result
-                
-                # Обновляем статистику использования ключа
-                cursor.execute('''
-                    UPDATE auth_api_keys 
-                    SET last_used = CURRENT_TIMESTAMP, usage_count = usage_count + 1
-                    WHERE id = ?
-                ''', (key_id,))
-                
-                conn.commit()
-                
-                # Логируем использование API ключа
-                self._log_auth_event(user_id, 'api_key_used', ip_address, None, True, f'Key: {key_name}')
-                
-                return True, {
-                    'user_id': user_id,
-                    'username': username,
-                    'email': email,
-                    'user_type': user_type,
-                    'api_key_name': key_name,
-                    'permissions': permissions.split(',') if permissions else [],
-                    'auth_method': 'api_key'
-                }
+            
+            # Обновляем статистику использования ключа
+            self._enqueue_write(SQL_UPDATE_API_KEY_USAGE, (key_id,))
+            
+            # Логируем использование API ключа
+            self._log_auth_event(user_id, 'api_key_used', ip_address, None, True, f'Key: {key_name}')
+            
+            principal = {
+                'user_id': user_id,
+                'username': username,
+                'email': email,
+                'user_type': user_type,
+                'api_key_name': key_name,
+                'permissions': json.loads(permissions) if permissions else [],
+                'auth_method': 'api_key'
+            }
+            
+            if self._api_key_cache is not None:
+                with self._cache_lock:
+                    self._api_key_cache[key_hash] = (key_id, principal)
+            
+            return True, dict(principal)
                 
         except Exception as e:
             logger.error(f"Ошибка аутентификации API ключа: {str(e)}")
@@ -362,6 +693,21 @@ class AuthService:
     def verify_jwt_token(self, token: str, token_type: str = 'access') -> Tuple[bool, Dict[str, Any]]:
         """Проверка JWT токена"""
         try:
+            # Повторная проверка того же токена обходится без jwt.decode
+            cache_key = hashlib.sha256(token.encode()).hexdigest()
+            if self._jwt_cache is not None:
+                with self._cache_lock:
+                    cached = self._jwt_cache.get(cache_key)
+                if cached:
+                    if cached['type'] != token_type:
+                        return False, {'error': 'Неверный тип токена'}
+                    if cached['jti'] and self._is_jti_revoked(cached['jti']):
+                        with self._cache_lock:
+                            self._jwt_cache.pop(cache_key, None)
+                        return False, {'error': 'Сессия недействительна'}
+                    self._touch_session(token)
+                    return True, dict(cached['principal'])
+            
             payload = jwt.decode(token, self.jwt_secret, algorithms=['HS256'])
             
             if payload.get('type') != token_type:
@@ -371,41 +717,49 @@ class AuthService:
             if not user_id:
                 return False, {'error': 'Неверный токен'}
             
-            # Проверяем активность сессии
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    SELECT s.id, u.username, u.email, u.user_type, u.is_active
-                    FROM auth_sessions s
-                    JOIN auth_users u ON s.user_id = u.id
-                    WHERE s.session_token = ? AND s.is_active = 1 
-                    AND s.expires_at > CURRENT_TIMESTAMP AND u.is_active = 1
-                ''', (token,))
-                
-                result = cursor.fetchone()
-                if not result:
+            jti = payload.get('jti')
+            if jti and 'user_type' in payload:
+                # Токен содержит данные пользователя: достаточно проверить, что он не отозван
+                if self._is_jti_revoked(jti):
                     return False, {'error': 'Сессия недействительна'}
                 
-                session_id, username, email, user_type, is_active = result
-                
-                # Обновляем время последней активности
-                cursor.execute('''
-                    UPDATE auth_sessions 
-                    SET last_activity = CURRENT_TIMESTAMP
-                    WHERE id = ?
-                ''', (session_id,))
-                
-                conn.commit()
-                
-                return True, {
-                    'user_id': user_id,
-                    'username': username,
-                    'email': email,
-                    'user_type': user_type,
-                    'session_id': session_id,
-                    'auth_method': 'jwt_token'
-                }
+                username, email, user_type = payload.get('username'), payload.get('email'), payload['user_type']
+                session_id = jti
+            else:
+                # Токены, выпущенные до появления jti, проверяем по таблице сессий
+                with self._get_read_conn() as conn:
+                    cursor = conn.cursor()
+                    
+                    cursor.execute(SQL_SELECT_SESSION, (token,))
+                    
+                    result = cursor.fetchone()
+                    if not result:
+                        return False, {'error': 'Сессия недействительна'}
+                    
+                    session_id, username, email, user_type, is_active = result
+            
+            # Обновляем время последней активности
+            self._touch_session(token)
+            
+            principal = {
+                'user_id': user_id,
+                'username': username,
+                'email': email,
+                'user_type': user_type,
+                'session_id': session_id,
+                'auth_method': 'jwt_token'
+            }
+            
+            if self._jwt_cache is not None:
+                with self._cache_lock:
+                    self._jwt_cache[cache_key] = {
+                        'type': payload['type'],
+                        'exp': payload['exp'],
+                        'jti': jti,
+                        'principal': principal
+                    }
+            
+            return True, dict(principal)
                 
         except jwt.ExpiredSignatureError:
             return False, {'error': 'Токен истек'}
@@ -415,55 +769,98 @@ class AuthService:
             logger.error(f"Ошибка проверки JWT токена: {str(e)}")
             return False, {'error': 'Ошибка проверки токена'}
     
-    def generate_api_key(self, user_id: int, name: str, permissions: list = None) -> str:
-        """Генерация нового API ключа"""
+    def revoke_token(self, token: str, ip_address: str = None, user_agent: str = None) -> Tuple[bool, Dict[str, Any]]:
+        """Отзыв JWT токена (выход): jti попадает в список отозванных, сессия деактивируется"""
+        try:
+            payload = jwt.decode(token, self.jwt_secret, algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return True, {'message': 'Токен уже истек'}
+        except jwt.InvalidTokenError:
+            return False, {'error': 'Неверный токен'}
+        
+        try:
+            jti = payload.get('jti')
+            # jti общий для access и refresh токенов пары, поэтому запись об отзыве должна
+            # жить до истечения refresh токена, даже если отзывается access токен
+            revoked_until = payload['exp']
+            if payload.get('type') == 'access' and 'iat' in payload:
+                refresh_lifetime = timedelta(days=self.token_settings['refresh_token_expire_days'])
+                revoked_until = max(revoked_until, payload['iat'] + int(refresh_lifetime.total_seconds()))
+            with self._get_write_conn() as conn:
+                if jti:
+                    conn.execute(
+                        'INSERT INTO auth_revoked_jti (jti, expires_at) VALUES (?, ?) '
+                        'ON CONFLICT(jti) DO UPDATE SET expires_at = MAX(expires_at, excluded.expires_at)',
+                        (jti, datetime.utcfromtimestamp(revoked_until).strftime('%Y-%m-%d %H:%M:%S'))
+                    )
+                conn.execute('UPDATE auth_sessions SET is_active = 0 WHERE session_token = ?', (token,))
+            
+            with self._cache_lock:
+                if jti:
+                    self._revoked_jti.add(jti)
+                if self._jwt_cache is not None:
+                    self._jwt_cache.pop(hashlib.sha256(token.encode()).hexdigest(), None)
+            
+            self._log_auth_event(payload.get('user_id'), 'logout', ip_address, user_agent, True)
+            return True, {'message': 'Токен отозван'}
+            
+        except Exception as e:
+            logger.error(f"Ошибка отзыва токена: {str(e)}")
+            return False, {'error': 'Ошибка отзыва токена'}
+    
+    def generate_api_key(self, user_id: int, name: str, permissions: list = None,
+                         user_type: str = None) -> str:
+        """
+        Генерация нового API ключа
+        
+        user_type передают только вызовы, которые сами только что записали его в БД (регистрация,
+        создание администратора). Claims токена для проверки лимита не годятся: без user_type
+        тариф читается из auth_users внутри транзакции записи
+        """
         try:
             # Генерируем ключ
             api_key = f"es_{secrets.token_urlsafe(32)}"
             key_hash = self._hash_api_key(api_key)
             key_prefix = api_key[:12]  # Первые 12 символов для идентификации
             
-            permissions_str = ','.join(permissions) if permissions else ''
+            permissions_str = json.dumps(list(permissions) if permissions else [])
             expires_at = datetime.now() + timedelta(days=self.token_settings['api_key_expire_days'])
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_write_conn() as conn:
                 cursor = conn.cursor()
                 
-                # Проверяем лимит ключей для пользователя
-                cursor.execute('SELECT user_type FROM auth_users WHERE id = ?', (user_id,))
-                user_result = cursor.fetchone()
-                if not user_result:
-                    raise Exception(f'Пользователь с ID {user_id} не найден')
-                user_type = user_result[0]
-                
-                cursor.execute('SELECT COUNT(*) FROM auth_api_keys WHERE user_id = ? AND is_active = 1', (user_id,))
-                current_keys = cursor.fetchone()[0]
+                if user_type is None:
+                    cursor.execute('SELECT user_type FROM auth_users WHERE id = ?', (user_id,))
+                    user_result = cursor.fetchone()
+                    if not user_result:
+                        raise Exception(f'Пользователь с ID {user_id} не найден')
+                    user_type = user_result[0]
                 
                 max_keys = self.user_types.get(user_type, {}).get('max_api_keys', 1)
-                if current_keys >= max_keys:
-                    raise Exception(f'Превышен лимит API ключей ({max_keys})')
                 
-                # Создаем ключ
-                cursor.execute('''
-                    INSERT INTO auth_api_keys 
-                    (user_id, key_hash, key_prefix, name, permissions, expires_at)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (user_id, key_hash, key_prefix, name, permissions_str, expires_at))
+                # Проверка лимита и вставка одним запросом: строка не вставляется, если лимит исчерпан
+                cursor.execute(SQL_INSERT_API_KEY_WITHIN_LIMIT, (
+                    user_id, key_hash, key_prefix, name, permissions_str, expires_at,
+                    user_id, max_keys
+                ))
+                if cursor.rowcount == 0:
+                    raise Exception(f'Превышен лимит API ключей ({max_keys})')
                 
                 conn.commit()
                 
-                # Логируем создание ключа
-                self._log_auth_event(user_id, 'api_key_created', None, None, True, f'Key: {name}')
-                
-                return api_key
+            # Логируем создание ключа
+            self._log_auth_event(user_id, 'api_key_created', None, None, True, f'Key: {name}')
+            
+            return api_key
                 
         except Exception as e:
             logger.error(f"Ошибка генерации API ключа: {str(e)}")
             raise
     
-    def _generate_jwt_token(self, user_id: int, token_type: str) -> str:
-        """Генерация JWT токена"""
-        now = datetime.utcnow()
+    def _generate_jwt_token(self, user_id: int, token_type: str, jti: str = None,
+                            claims: Dict[str, Any] = None, issued_at: datetime = None) -> str:
+        """Генерация JWT токена (пара токенов выпускается с одним issued_at)"""
+        now = issued_at or datetime.utcnow()
         
         if token_type == 'access':
             exp = now + timedelta(hours=self.token_settings['access_token_expire_hours'])
@@ -475,9 +872,12 @@ class AuthService:
         payload = {
             'user_id': user_id,
             'type': token_type,
+            'jti': jti or secrets.token_urlsafe(12),
             'iat': now,
             'exp': exp
         }
+        if claims:
+            payload.update(claims)
         
         return jwt.encode(payload, self.jwt_secret, algorithm='HS256')
     
@@ -486,21 +886,11 @@ class AuthService:
                        error_message: str = None, metadata: dict = None):
         """Логирование событий аутентификации"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                metadata_str = None
-                if metadata:
-                    import json
-                    metadata_str = json.dumps(metadata)
-                
-                cursor.execute('''
-                    INSERT INTO auth_logs 
-                    (user_id, action, ip_address, user_agent, success, error_message, metadata)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (user_id, action, ip_address, user_agent, success, error_message, metadata_str))
-                
-                conn.commit()
+            metadata_str = json.dumps(metadata) if metadata else None
+            
+            # Лог пишется фоновым writer'ом пачками, без отдельного commit на событие
+            self._enqueue_write(SQL_INSERT_AUTH_LOG,
+                                (user_id, action, ip_address, user_agent, success, error_message, metadata_str))
                 
         except Exception as e:
             logger.error(f"Ошибка логирования события аутентификации: {str(e)}")
@@ -508,7 +898,7 @@ class AuthService:
     def get_user_info(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Получение информации о пользователе"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_read_conn() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -563,7 +953,7 @@ class AuthService:
     def get_auth_stats(self) -> Dict[str, Any]:
         """Получение статистики аутентификации"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_read_conn() as conn:
                 cursor = conn.cursor()
                 
                 # Общая статистика пользователей
@@ -635,7 +1025,7 @@ class AuthService:
     def cleanup_expired_sessions(self) -> int:
         """Очистка истекших сессий"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self._get_write_conn() as conn:
                 cursor = conn.cursor()
                 
                 # Деактивируем истекшие сессии
@@ -655,8 +1045,18 @@ class AuthService:
                 
                 deleted_count = cursor.rowcount
                 
+                # Отозванные jti после истечения токена больше не нужны
+                cursor.execute('DELETE FROM auth_revoked_jti WHERE expires_at <= CURRENT_TIMESTAMP')
+                
                 conn.commit()
                 
+                # Истекшие токены удаляем из кэша, счетчики активности - для всех сессий
+                with self._cache_lock:
+                    if self._jwt_cache is not None:
+                        self._jwt_cache.expire()
+                    self._session_activity.clear()
+                self._refresh_revoked_jti(reload=True)
+                
                 logger.info(f"Деактивировано {expired_count} истекших сессий, удалено {deleted_count} старых сессий")
                 
                 return expired_count + deleted_count
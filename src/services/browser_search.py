@@ -1,67 +1,466 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.common.keys import Keys
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
-from webdriver_manager.chrome import ChromeDriverManager
+from playwright.sync_api import sync_playwright
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError, Error as PlaywrightError
+from concurrent.futures import Future
+from functools import lru_cache
+import atexit
+import itertools
+import os
+import queue
+import tempfile
+import threading
 import time
 import random
+import sys
 import logging
 from typing import List, Dict, Optional
-from urllib.parse import quote_plus
+from urllib.parse import quote_plus, urlsplit, parse_qs
+import requests
+import lxml.html
+from lxml import etree
+
+from .cache_dirs import user_cache_dir, ensure_private_dir
+
+try:
+    from cachetools import TTLCache
+except ImportError:
+    TTLCache = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 logger = logging.getLogger(__name__)
 
-class BrowserSearchService:
-    """Сервис для поиска через браузер с использованием Selenium"""
+# Сколько запросов search_multiple_queries выполняет одновременно в отдельных вкладках
+MAX_PARALLEL_TABS = 4
+
+# Пул заранее запущенных браузеров
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '2'))
+MAX_USES_PER_INSTANCE = 50  # После стольких выдач браузер перезапускается
+BROWSER_ACQUIRE_TIMEOUT_SECONDS = 60
+
+# Постоянные профили браузеров пула: cookies (в том числе согласие Google) переживают перезапуски.
+# Каталог принадлежит пользователю процесса (0700), а не общий каталог в /tmp
+BROWSER_PROFILE_DIR = os.getenv('BROWSER_PROFILE_DIR', user_cache_dir('browser-profiles'))
+
+# Lock-файлы занятых этим процессом профилей держатся открытыми до его завершения
+_profile_locks = []
+
+# Кэш результатов поиска: шаблонные запросы по одному email повторяются между вызовами
+SEARCH_CACHE_SIZE = 500
+SEARCH_CACHE_TTL_SECONDS = 300
+
+# Селекторы выдачи Google: варианты разметки объединены, чтобы обходить DOM один раз
+_RESULT_SEL = "div.g, .yuRUbf, .tF2Cxc"
+_TITLE_SEL = "h3, .LC20lb, .DKV0Md"
+_LINK_SEL = "a"
+_SNIPPET_SEL = ".VwiC3b, .IsZvec, .s3v9rd, .BNeawe.s3v9rd"
+_RESULTS_READY_SEL = "div.g, div[data-ved]"
+_CONSENT_BUTTON_SEL = "button:has-text('Accept'), button:has-text('Принять')"
+_GOOGLE_CONSENT_COOKIES = frozenset({"SOCS", "CONSENT"})
+
+# Извлечение результатов выдачи целиком в браузере: один вызов вместо запросов по каждому элементу
+_EXTRACT_RESULTS_JS = """
+({limit, sel}) => Array.from(document.querySelectorAll(sel.result)).slice(0, limit).map(el => ({
+    title: el.querySelector(sel.title)?.innerText || "",
+    link: el.querySelector(sel.link)?.href || "",
+    snippet: el.querySelector(sel.snippet)?.innerText || ""
+}))
+"""
+_EXTRACT_SELECTORS = {'result': _RESULT_SEL, 'title': _TITLE_SEL, 'link': _LINK_SEL, 'snippet': _SNIPPET_SEL}
+
+def _has_class(name: str) -> str:
+    """XPath-условие наличия CSS-класса у элемента"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# Те же селекторы в виде заранее скомпилированных XPath для разбора HTML без браузера;
+# объединение '|' возвращает узлы в порядке документа, как и CSS-список
+_RESULT_XPATH = etree.XPath(f"//div[{_has_class('g')}] | //*[{_has_class('yuRUbf')}] | //*[{_has_class('tF2Cxc')}]")
+_TITLE_XPATH = etree.XPath(f".//h3 | .//*[{_has_class('LC20lb')}] | .//*[{_has_class('DKV0Md')}]")
+_LINK_XPATH = etree.XPath(".//a[@href]")
+_SNIPPET_XPATH = etree.XPath(
+    f".//*[{_has_class('VwiC3b')}] | .//*[{_has_class('IsZvec')}] | .//*[{_has_class('s3v9rd')}]"
+)
+
+# Ресурсы, которые не нужны для разбора выдачи и только замедляют загрузку страницы
+_BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "stylesheet", "media"})
+_BLOCKED_URL_PARTS = ("googletagmanager", "doubleclick", "google-analytics")
+
+_HIDE_WEBDRIVER_JS = "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+
+# Быстрый путь: выдача Google обычным HTTP-запросом, браузер - только если он не сработал
+HTTP_SEARCH_TIMEOUT_SECONDS = 10
+HTTP_BLOCK_BACKOFF_SECONDS = 600  # Пауза HTTP-пути после 429 или капчи
+# Столько ответов 200 подряд без разбираемых результатов (JS-only страница) - и HTTP-путь
+# тоже ставится на паузу, чтобы каждый запрос не платил лишний round trip перед браузером
+HTTP_EMPTY_PARSE_LIMIT = 3
+_HTTP_USER_AGENTS = (
+    USER_AGENT,
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+)
+
+_http_session = requests.Session()
+_http_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=MAX_PARALLEL_TABS))
+_http_blocked_until = 0.0
+_http_empty_parses = 0
+
+
+def _http_search_available() -> bool:
+    """HTTP-путь не на паузе после блокировки или серии пустых ответов"""
+    return time.monotonic() >= _http_blocked_until
+
+
+@lru_cache(maxsize=1)
+def _chromium_executable() -> Optional[str]:
+    """
+    Путь к исполняемому файлу Chromium из CHROMIUM_EXECUTABLE_PATH
     
-    def __init__(self, headless: bool = True):
-        """
-        Инициализация веб-драйвера Chrome
+    Позволяет использовать уже установленный браузер вместо скачанного Playwright;
+    None - браузер из поставки Playwright.
+    """
+    path = os.getenv('CHROMIUM_EXECUTABLE_PATH')
+    if not path:
+        return None
+    if not os.path.isfile(path):
+        logger.warning(f"CHROMIUM_EXECUTABLE_PATH не найден: {path}, используем браузер Playwright")
+        return None
+    return path
+
+def _normalize_results(raw_results: List[Dict[str, str]], max_results: int) -> List[Dict[str, str]]:
+    """Приводит сырые результаты к общему формату: без пустых заголовков, ссылок и повторов"""
+    results = []
+    seen_links = set()
+    
+    for item in raw_results:
+        title = (item.get('title') or '').strip()
+        link = item.get('link') or ''
+        if not title or not link or link in seen_links:
+            continue
         
-        Args:
-            headless: Запуск в скрытом режиме (без GUI)
-        """
-        self.driver = None
+        seen_links.add(link)
+        results.append({
+            'title': title,
+            'link': link,
+            'snippet': (item.get('snippet') or '').strip() or "No description",
+            'source': 'browser_search'
+        })
+        
+        if len(results) >= max_results:
+            break
+    
+    return results
+
+def _unwrap_google_link(href: str) -> str:
+    """Достает целевой адрес из редиректа Google вида /url?q=..."""
+    if href.startswith('/url?'):
+        href = parse_qs(urlsplit(href).query).get('q', [''])[0]
+    return href if href.startswith('http') else ''
+
+def _node_text(nodes) -> str:
+    """Текст первого узла из результата XPath с нормализованными пробелами"""
+    if not nodes:
+        return ""
+    return " ".join(part.strip() for part in nodes[0].itertext() if part.strip())
+
+def _block_heavy_resources(route):
+    """Обработчик маршрутов: обрывает загрузку картинок, шрифтов, стилей и трекеров"""
+    request = route.request
+    if request.resource_type in _BLOCKED_RESOURCE_TYPES or any(part in request.url for part in _BLOCKED_URL_PARTS):
+        route.abort()
+    else:
+        route.continue_()
+
+
+class _BrowserWorker:
+    """
+    Поток-владелец одного запущенного браузера
+    
+    Объекты sync API Playwright можно использовать только из потока, в котором
+    они созданы, поэтому вся работа с браузером выполняется в потоке воркера.
+    """
+    
+    def __init__(self, headless: bool, profile_dir: str):
         self.headless = headless
-        self.search_delay_range = (2, 5)  # Случайная задержка между поисками
-        self._init_driver()
+        self.profile_dir = profile_dir
+        self.uses = 0
+        self.google_initialized = False
+        self._playwright = None
+        self.context = None
+        self.page = None
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="browser-worker", daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        """Цикл обработки заданий в потоке браузера"""
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                self.close_browser()
+                self._stop_playwright()
+                return
+            
+            fn, args, future = job
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+    
+    def submit(self, fn, *args) -> Future:
+        """Ставит задание в очередь потока браузера"""
+        future = Future()
+        self._jobs.put((fn, args, future))
+        return future
+    
+    def call(self, fn, *args):
+        """Выполняет задание в потоке браузера и ждет результат"""
+        return self.submit(fn, *args).result()
     
-    def _init_driver(self):
-        """Инициализация веб-драйвера с настройками"""
+    def launch(self):
+        """Запуск браузера и создание контекста с настройками (в потоке воркера)"""
+        if self.context:
+            return
+        
         try:
-            chrome_options = Options()
-            
-            if self.headless:
-                chrome_options.add_argument("--headless")
-            
-            # Настройки для обхода блокировок
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-            chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            chrome_options.add_experimental_option('useAutomationExtension', False)
-            
-            # Установка User-Agent для имитации реального браузера
-            chrome_options.add_argument("--user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+            # Драйвер Playwright запускается один раз и переживает перезапуски браузера
+            if self._playwright is None:
+                self._playwright = sync_playwright().start()
+            
+            # Браузер с постоянным профилем: один контекст на весь срок жизни браузера,
+            # User-Agent реального браузера, размер окна и настройки для обхода блокировок
+            self.context = self._playwright.chromium.launch_persistent_context(
+                self.profile_dir,
+                executable_path=_chromium_executable(),
+                headless=self.headless,
+                args=[
+                    "--no-sandbox",
+                    "--disable-dev-shm-usage",
+                    "--disable-blink-features=AutomationControlled"
+                ],
+                ignore_default_args=["--enable-automation"],
+                user_agent=USER_AGENT,
+                viewport={'width': 1920, 'height': 1080}
+            )
+            self.context.route("**/*", _block_heavy_resources)
             
-            # Установка размера окна
-            chrome_options.add_argument("--window-size=1920,1080")
+            # Скрытие признаков автоматизации: скрипт регистрируется один раз и выполняется
+            # до скриптов страницы в каждом новом документе всех вкладок контекста
+            self.context.add_init_script(_HIDE_WEBDRIVER_JS)
             
-            service = Service(ChromeDriverManager().install())
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
+            # Вкладки, открытые вместе с профилем, заменяем новой с уже подключенным скриптом
+            initial_pages = list(self.context.pages)
+            self.page = self.context.new_page()
+            for page in initial_pages:
+                page.close()
             
-            # Выполнение JavaScript для скрытия признаков автоматизации
-            self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+            self.uses = 0
+            logger.info("Браузер Chromium успешно инициализирован")
             
-            logger.info("Веб-драйвер Chrome успешно инициализирован")
+        except Exception as e:
+            logger.error(f"Ошибка инициализации браузера: {str(e)}")
+            self.close_browser()
+            raise
+    
+    def prime_google(self):
+        """
+        Однократный заход на главную Google с принятием cookies (в потоке воркера)
+        
+        Согласие сохраняется в профиле, поэтому заход нужен только для нового профиля,
+        а все запросы идут сразу на /search.
+        """
+        if self.google_initialized or not self.page:
+            return
+        
+        try:
+            if any(cookie['name'] in _GOOGLE_CONSENT_COOKIES
+                   for cookie in self.context.cookies("https://www.google.com")):
+                self.google_initialized = True
+                return
             
+            self.page.goto("https://www.google.com", wait_until='domcontentloaded')
+            try:
+                self.page.click(_CONSENT_BUTTON_SEL, timeout=3000)
+            except PlaywrightTimeoutError:
+                pass  # Соглашение не появилось
+            self.google_initialized = True
         except Exception as e:
-            logger.error(f"Ошибка инициализации веб-драйвера: {str(e)}")
+            logger.warning(f"Не удалось открыть главную страницу Google: {str(e)}")
+    
+    def close_browser(self):
+        """Закрывает браузер и освобождает ресурсы (в потоке воркера)"""
+        try:
+            if self.context:
+                self.context.close()
+                logger.info("Браузер успешно закрыт")
+        except Exception as e:
+            logger.error(f"Ошибка при закрытии браузера: {str(e)}")
+        finally:
+            self.page = None
+            self.context = None
+            self.google_initialized = False
+    
+    def _stop_playwright(self):
+        """Останавливает драйвер Playwright (в потоке воркера)"""
+        if self._playwright:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+            self._playwright = None
+    
+    def stop(self, timeout: float = 10):
+        """Закрывает браузер и завершает поток воркера"""
+        self._jobs.put(None)
+        self._thread.join(timeout)
+
+
+def _claim_profile_dir(name: str) -> str:
+    """
+    Каталог профиля браузера, закрепленный за этим процессом
+    
+    Профиль занимается через flock на lock-файле: другой процесс приложения берет следующий
+    свободный вариант имени, а не делит с первым блокировку профиля Chromium. Без fcntl профиль
+    отдельный для каждого pid, а если базовому каталогу доверять нельзя - временный каталог.
+    """
+    if not ensure_private_dir(BROWSER_PROFILE_DIR):
+        return tempfile.mkdtemp(prefix=f"bss-{name}-")
+    if fcntl is None:
+        return os.path.join(BROWSER_PROFILE_DIR, f"{name}-{os.getpid()}")
+    
+    for attempt in itertools.count():
+        candidate = name if attempt == 0 else f"{name}-{attempt}"
+        lock_file = open(os.path.join(BROWSER_PROFILE_DIR, f"{candidate}.lock"), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            continue
+        _profile_locks.append(lock_file)
+        return os.path.join(BROWSER_PROFILE_DIR, candidate)
+
+
+class BrowserPool:
+    """Пул заранее запущенных браузеров, общий для всех экземпляров BrowserSearchService"""
+    
+    def __init__(self, headless: bool = True, size: int = BROWSER_POOL_SIZE,
+                 max_uses: int = MAX_USES_PER_INSTANCE):
+        self.max_uses = max_uses
+        self._workers = []
+        self._idle = queue.Queue()
+        
+        mode = 'headless' if headless else 'headed'
+        for index in range(max(size, 1)):
+            # У каждого браузера свой профиль: Chromium блокирует каталог профиля на время работы
+            worker = _BrowserWorker(headless, _claim_profile_dir(f"{mode}-{index}"))
+            # Прогрев: браузер запускается и принимает cookies Google в фоне
+            worker.submit(worker.launch)
+            worker.submit(worker.prime_google)
+            self._workers.append(worker)
+            self._idle.put(worker)
+    
+    def acquire(self, timeout: float = BROWSER_ACQUIRE_TIMEOUT_SECONDS) -> _BrowserWorker:
+        """Берет браузер из пула, ожидая освобождения не дольше timeout секунд"""
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError("Нет свободного браузера в пуле")
+        
+        try:
+            # Если прогрев или прошлый перезапуск не удался, пробуем запустить браузер еще раз
+            worker.call(worker.launch)
+            worker.call(worker.prime_google)
+        except Exception:
+            self._idle.put(worker)
             raise
+        
+        worker.uses += 1
+        return worker
+    
+    def release(self, worker: _BrowserWorker):
+        """Возвращает браузер в пул, перезапуская его после MAX_USES_PER_INSTANCE выдач"""
+        if worker.uses >= self.max_uses:
+            logger.info("Браузер отработал лимит использований, перезапускаем")
+            worker.submit(worker.close_browser)
+            worker.submit(worker.launch)
+            worker.submit(worker.prime_google)
+        self._idle.put(worker)
+    
+    def close(self):
+        """Закрывает все браузеры пула"""
+        for worker in self._workers:
+            worker.stop()
+        self._workers = []
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_browser_pool(headless: bool = True) -> BrowserPool:
+    """Возвращает общий пул браузеров для заданного режима, создавая его при первом обращении"""
+    with _pools_lock:
+        pool = _pools.get(headless)
+        if pool is None:
+            pool = _pools[headless] = BrowserPool(headless)
+        return pool
+
+@atexit.register
+def _close_browser_pools():
+    """Закрытие браузеров при завершении процесса"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+_search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL_SECONDS) if TTLCache else None
+_search_cache_lock = threading.Lock()
+
+def _get_cached_results(query: str, max_results: int) -> Optional[List[Dict[str, str]]]:
+    """Возвращает копию закэшированных результатов поиска или None"""
+    if _search_cache is None:
+        return None
+    with _search_cache_lock:
+        cached = _search_cache.get((query, max_results))
+    return [dict(result) for result in cached] if cached is not None else None
+
+def _cache_results(query: str, max_results: int, results: List[Dict[str, str]]):
+    """Сохраняет непустые результаты поиска; в кэше лежат копии, недоступные вызывающему коду"""
+    if _search_cache is None or not results:
+        return
+    with _search_cache_lock:
+        _search_cache[(query, max_results)] = tuple(dict(result) for result in results)
+
+
+class BrowserSearchService:
+    """Сервис для поиска через браузер с использованием Playwright (CDP)"""
+    
+    def __init__(self, headless: bool = True):
+        """
+        Инициализация сервиса поверх общего пула браузеров Chromium
+        
+        Args:
+            headless: Запуск в скрытом режиме (без GUI)
+        """
+        self._worker = None
+        self.headless = headless
+        self.search_delay_range = (2, 5)  # Случайная задержка между поисками
+        self._pool = get_browser_pool(headless)
+    
+    def _call(self, fn, *args):
+        """
+        Выполняет fn(browser, *args) в потоке занятого браузера
+        
+        Вне блока with браузер берется из пула только на время вызова.
+        """
+        if self._worker:
+            return self._worker.call(fn, self._worker, *args)
+        
+        with self:
+            return self._worker.call(fn, self._worker, *args)
     
     def search_google(self, query: str, max_results: int = 15) -> List[Dict[str, str]]:
         """
@@ -74,182 +473,126 @@ class BrowserSearchService:
         Returns:
             Список результатов поиска
         """
-        if not self.driver:
-            logger.error("Веб-драйвер не инициализирован")
+        cached = _get_cached_results(query, max_results)
+        if cached is not None:
+            logger.info(f"Результаты поиска взяты из кэша: {query}")
+            return cached
+        
+        results = self._search_google_http(query, max_results)
+        if not results:
+            results = self._call(self._search_google, query, max_results)
+        _cache_results(query, max_results, results)
+        return results
+    
+    def _search_google(self, browser: _BrowserWorker, query: str, max_results: int) -> List[Dict[str, str]]:
+        """Поиск в Google на основной вкладке браузера (в потоке браузера)"""
+        if not browser.page:
+            logger.error("Браузер не инициализирован")
             return []
         
         try:
             logger.info(f"Выполняем поиск в Google: {query}")
             
-            # Переходим на Google
-            self.driver.get("https://www.google.com")
-            
-            # Случайная задержка для имитации человеческого поведения
-            time.sleep(random.uniform(1, 3))
-            
-            # Обработка соглашения с cookies (если появляется)
-            try:
-                accept_button = WebDriverWait(self.driver, 3).until(
-                    EC.element_to_be_clickable((By.XPATH, "//button[contains(text(), 'Accept') or contains(text(), 'Принять')]"))
-                )
-                accept_button.click()
-                time.sleep(1)
-            except TimeoutException:
-                pass  # Соглашение не появилось
-            
-            # Находим поле поиска
-            search_selectors = [
-                "input[name='q']",
-                "input[title='Search']", 
-                "textarea[name='q']"
-            ]
-            
-            search_box = None
-            for selector in search_selectors:
-                try:
-                    search_box = WebDriverWait(self.driver, 5).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                    )
-                    break
-                except TimeoutException:
-                    continue
-            
-            if not search_box:
-                logger.error("Не удалось найти поле поиска на странице Google")
-                return []
+            self._submit_query(browser.page, query, max_results)
             
-            # Очищаем поле и вводим запрос
-            search_box.clear()
+            # Ждем появления результатов в DOM: полная загрузка страницы для разбора не нужна
+            self._wait_for_results(browser.page)
             
-            # Имитируем человеческий ввод с задержками
-            for char in query:
-                search_box.send_keys(char)
-                time.sleep(random.uniform(0.05, 0.15))
+            return self._extract_search_results(max_results, browser.page)
             
-            # Нажимаем Enter
-            search_box.send_keys(Keys.RETURN)
-            
-            # Ждем загрузки результатов
-            WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, "div.g, div[data-ved]"))
-            )
-            
-            # Случайная задержка после загрузки
-            time.sleep(random.uniform(2, 4))
-            
-            return self._extract_search_results(max_results)
-            
-        except TimeoutException:
+        except PlaywrightTimeoutError:
             logger.error(f"Тайм-аут при поиске запроса: {query}")
             return []
-        except WebDriverException as e:
-            logger.error(f"Ошибка WebDriver при поиске: {str(e)}")
+        except PlaywrightError as e:
+            logger.error(f"Ошибка браузера при поиске: {str(e)}")
             return []
         except Exception as e:
             logger.error(f"Неожиданная ошибка при поиске: {str(e)}")
             return []
     
-    def _extract_search_results(self, max_results: int) -> List[Dict[str, str]]:
-        """Извлекает результаты поиска со страницы"""
-        results = []
-        
+    def _submit_query(self, page, query: str, max_results: int):
+        """Открывает страницу выдачи Google во вкладке, не дожидаясь результатов"""
+        # Сразу переходим на страницу результатов, минуя главную и поле ввода;
+        # навигация возвращается после ответа сервера, готовность выдачи ждет _wait_for_results
+        page.goto(f"https://www.google.com/search?q={quote_plus(query)}&num={max_results}", wait_until='commit')
+    
+    def _wait_for_results(self, page):
+        """Ожидание появления результатов поиска на странице"""
+        page.wait_for_selector(_RESULTS_READY_SEL, state='attached', timeout=10000)
+    
+    def _extract_search_results(self, max_results: int, page) -> List[Dict[str, str]]:
+        """Извлекает результаты поиска со страницы одним вызовом JavaScript"""
         try:
-            # Различные селекторы для результатов поиска
-            result_selectors = [
-                "div.g",
-                "div[data-ved] h3 ..",
-                ".yuRUbf",
-                ".tF2Cxc"
-            ]
-            
-            search_results = []
-            for selector in result_selectors:
-                try:
-                    search_results = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    if search_results:
-                        break
-                except:
-                    continue
+            # Объединенный селектор находит и вложенные блоки одного результата,
+            # поэтому берем элементов с запасом и пропускаем повторные ссылки
+            raw_results = page.evaluate(_EXTRACT_RESULTS_JS, {'limit': max_results * 3, 'sel': _EXTRACT_SELECTORS})
             
-            if not search_results:
+            if not raw_results:
                 logger.warning("Не удалось найти результаты поиска на странице")
                 return []
             
-            logger.info(f"Найдено {len(search_results)} потенциальных результатов")
-            
-            for result_element in search_results[:max_results * 2]:  # Берем больше, чем нужно, на случай ошибок
-                try:
-                    result_data = self._extract_single_result(result_element)
-                    if result_data and result_data['title'] and result_data['link']:
-                        results.append(result_data)
-                        
-                        if len(results) >= max_results:
-                            break
-                            
-                except Exception as e:
-                    logger.debug(f"Ошибка извлечения результата: {str(e)}")
-                    continue
+            logger.info(f"Найдено {len(raw_results)} потенциальных результатов")
             
+            results = _normalize_results(raw_results, max_results)
             logger.info(f"Успешно извлечено {len(results)} результатов поиска")
             return results
             
         except Exception as e:
             logger.error(f"Ошибка при извлечении результатов: {str(e)}")
-            return results
+            return []
     
-    def _extract_single_result(self, result_element) -> Optional[Dict[str, str]]:
-        """Извлекает данные из одного результата поиска"""
+    def _search_google_http(self, query: str, max_results: int) -> List[Dict[str, str]]:
+        """
+        Поиск в Google обычным HTTP-запросом без браузера
+        
+        Пустой список означает, что нужен браузерный поиск: Google ответил 429,
+        показал капчу или отдал страницу без результатов в HTML.
+        """
+        global _http_blocked_until, _http_empty_parses
+        
+        if not _http_search_available():
+            return []
+        
         try:
-            # Попытка найти заголовок
-            title = ""
-            title_selectors = ["h3", ".LC20lb", ".DKV0Md"]
-            for selector in title_selectors:
-                try:
-                    title_element = result_element.find_element(By.CSS_SELECTOR, selector)
-                    title = title_element.text.strip()
-                    if title:
-                        break
-                except NoSuchElementException:
-                    continue
-            
-            # Попытка найти ссылку
-            link = ""
-            link_selectors = ["a", "h3 a", ".yuRUbf a"]
-            for selector in link_selectors:
-                try:
-                    link_element = result_element.find_element(By.CSS_SELECTOR, selector)
-                    link = link_element.get_attribute("href")
-                    if link and link.startswith("http"):
-                        break
-                except NoSuchElementException:
-                    continue
-            
-            # Попытка найти описание
-            snippet = ""
-            snippet_selectors = [".VwiC3b", ".IsZvec", ".s3v9rd", ".BNeawe.s3v9rd"]
-            for selector in snippet_selectors:
-                try:
-                    snippet_element = result_element.find_element(By.CSS_SELECTOR, selector)
-                    snippet = snippet_element.text.strip()
-                    if snippet:
-                        break
-                except NoSuchElementException:
-                    continue
-            
-            # Проверяем, что у нас есть минимально необходимые данные
-            if not title and not link:
-                return None
-            
-            return {
-                'title': title or "No title",
-                'link': link or "",
-                'snippet': snippet or "No description",
-                'source': 'browser_search'
-            }
-            
-        except Exception as e:
-            logger.debug(f"Ошибка извлечения отдельного результата: {str(e)}")
-            return None
+            response = _http_session.get(
+                "https://www.google.com/search",
+                params={'q': query, 'num': max_results},
+                headers={'User-Agent': random.choice(_HTTP_USER_AGENTS)},
+                timeout=HTTP_SEARCH_TIMEOUT_SECONDS
+            )
+        except requests.RequestException as e:
+            logger.warning(f"HTTP-поиск недоступен: {str(e)}")
+            return []
+        
+        if response.status_code == 429 or '/sorry/' in response.url:
+            logger.warning("Google ограничил HTTP-поиск, временно используем только браузер")
+            _http_blocked_until = time.monotonic() + HTTP_BLOCK_BACKOFF_SECONDS
+            return []
+        
+        if response.status_code != 200 or not response.content:
+            return []
+        
+        root = lxml.html.fromstring(response.content)
+        raw_results = []
+        for element in _RESULT_XPATH(root)[:max_results * 3]:
+            links = _LINK_XPATH(element)
+            raw_results.append({
+                'title': _node_text(_TITLE_XPATH(element)),
+                'link': _unwrap_google_link(links[0].get('href')) if links else "",
+                'snippet': _node_text(_SNIPPET_XPATH(element))
+            })
+        
+        results = _normalize_results(raw_results, max_results)
+        if results:
+            _http_empty_parses = 0
+            logger.info(f"HTTP-поиск вернул {len(results)} результатов: {query}")
+        else:
+            _http_empty_parses += 1
+            if _http_empty_parses >= HTTP_EMPTY_PARSE_LIMIT:
+                logger.warning("Google отдает страницы без результатов в HTML, временно используем только браузер")
+                _http_blocked_until = time.monotonic() + HTTP_BLOCK_BACKOFF_SECONDS
+                _http_empty_parses = 0
+        return results
     
     def search_multiple_queries(self, queries: List[str], max_results_per_query: int = 15) -> List[Dict[str, str]]:
         """
@@ -262,55 +605,127 @@ class BrowserSearchService:
         Returns:
             Объединенный список результатов
         """
-        all_results = []
+        results_by_query = {}
+        pending = []
+        last_http_at = None
+        for query in queries:
+            # Сначала кэш, затем HTTP-запрос; в браузер уходят только оставшиеся запросы
+            results = _get_cached_results(query, max_results_per_query)
+            if results is None and _http_search_available():
+                # HTTP-запросы разносятся тем же случайным интервалом, что и браузерные
+                if last_http_at is not None:
+                    remaining = random.uniform(*self.search_delay_range) - (time.monotonic() - last_http_at)
+                    if remaining > 0:
+                        time.sleep(remaining)
+                last_http_at = time.monotonic()
+                results = self._search_google_http(query, max_results_per_query)
+                _cache_results(query, max_results_per_query, results)
+            
+            if results:
+                results_by_query[query] = results
+            else:
+                pending.append(query)
         
-        for i, query in enumerate(queries):
-            try:
-                logger.info(f"Выполняем запрос {i+1}/{len(queries)}: {query}")
-                
-                results = self.search_google(query, max_results_per_query)
-                all_results.extend(results)
-                
-                # Случайная задержка между запросами
-                if i < len(queries) - 1:  # Не ждем после последнего запроса
-                    delay = random.uniform(*self.search_delay_range)
-                    logger.info(f"Ожидание {delay:.1f} секунд перед следующим запросом...")
-                    time.sleep(delay)
-                    
-            except Exception as e:
-                logger.error(f"Ошибка при выполнении запроса '{query}': {str(e)}")
-                continue
-        
-        # Удаляем дубликаты по URL
+        if pending:
+            results_by_query.update(self._call(self._search_multiple_queries, pending, max_results_per_query))
+        
+        # Удаляем дубликаты по URL, сохраняя порядок запросов
         seen_links = set()
         unique_results = []
         
-        for result in all_results:
-            link = result.get('link', '')
-            if link and link not in seen_links:
-                seen_links.add(link)
-                unique_results.append(result)
+        for query in queries:
+            for result in results_by_query.get(query, ()):
+                link = result.get('link', '')
+                if not link:
+                    continue
+                
+                # Интернированная строка хранится в одном экземпляре и в множестве, и в результате
+                link = sys.intern(link)
+                if link not in seen_links:
+                    seen_links.add(link)
+                    result['link'] = link
+                    unique_results.append(result)
         
         logger.info(f"Итого уникальных результатов: {len(unique_results)}")
         return unique_results
     
+    def _search_multiple_queries(self, browser: _BrowserWorker, queries: List[str],
+                                 max_results_per_query: int) -> Dict[str, List[Dict[str, str]]]:
+        """Поиск по нескольким запросам (в потоке браузера); результаты сгруппированы по запросу"""
+        results_by_query = {}
+        
+        # Запросы выполняются пачками в параллельных вкладках одного браузера
+        for start in range(0, len(queries), MAX_PARALLEL_TABS):
+            batch_started = time.monotonic()
+            batch = queries[start:start + MAX_PARALLEL_TABS]
+            results_by_query.update(self._search_batch(browser, batch, max_results_per_query, start, len(queries)))
+            
+            # Случайный интервал между началами пачек: время самих запросов в него засчитывается
+            if start + MAX_PARALLEL_TABS < len(queries):  # Не ждем после последней пачки
+                remaining = random.uniform(*self.search_delay_range) - (time.monotonic() - batch_started)
+                if remaining > 0:
+                    logger.info(f"Ожидание {remaining:.1f} секунд перед следующими запросами...")
+                    time.sleep(remaining)
+        
+        return results_by_query
+    
+    def _search_batch(self, browser: _BrowserWorker, batch: List[str], max_results: int, offset: int,
+                      total: int) -> Dict[str, List[Dict[str, str]]]:
+        """
+        Поиск по нескольким запросам одновременно: каждый запрос в своей вкладке
+        
+        Сначала во всех вкладках отправляются запросы, затем собираются результаты,
+        поэтому загрузка страниц выдачи идет параллельно.
+        """
+        tabs = []
+        results_by_query = {}
+        
+        try:
+            for i, query in enumerate(batch):
+                logger.info(f"Выполняем запрос {offset + i + 1}/{total}: {query}")
+                page = browser.context.new_page()
+                try:
+                    self._submit_query(page, query, max_results)
+                    tabs.append((page, query))
+                except Exception as e:
+                    logger.error(f"Ошибка при выполнении запроса '{query}': {str(e)}")
+                    page.close()
+            
+            for page, query in tabs:
+                try:
+                    self._wait_for_results(page)
+                    results = self._extract_search_results(max_results, page)
+                    _cache_results(query, max_results, results)
+                    results_by_query[query] = results
+                except PlaywrightTimeoutError:
+                    logger.error(f"Тайм-аут при поиске запроса: {query}")
+                except Exception as e:
+                    logger.error(f"Ошибка при выполнении запроса '{query}': {str(e)}")
+            
+            return results_by_query
+            
+        finally:
+            for page, _ in tabs:
+                try:
+                    page.close()
+                except Exception:
+                    pass
+    
     def close(self):
-        """Закрывает браузер и освобождает ресурсы"""
-        if self.driver:
-            try:
-                self.driver.quit()
-                logger.info("Веб-драйвер успешно закрыт")
-            except Exception as e:
-                logger.error(f"Ошибка при закрытии веб-драйвера: {str(e)}")
-            finally:
-                self.driver = None
+        """Возвращает занятый браузер в пул"""
+        if self._worker:
+            self._pool.release(self._worker)
+            self._worker = None
     
     def __del__(self):
-        """Деструктор для автоматического закрытия драйвера"""
-        self.close()
+        """Деструктор для автоматического возврата браузера в пул"""
+        if getattr(self, '_worker', None):
+            self.close()
     
     def __enter__(self):
-        """Поддержка context manager"""
+        """Поддержка context manager: берет браузер из пула"""
+        if not self._worker:
+            self._worker = self._pool.acquire()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
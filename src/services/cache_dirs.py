@@ -0,0 +1,32 @@
+"""
+Каталоги приложения на диске: HTTP-кэш, cookies и профили браузеров
+"""
+
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def user_cache_dir(*parts: str) -> str:
+    """Каталог приложения в кэше пользователя ($XDG_CACHE_HOME или ~/.cache), а не в общем /tmp"""
+    base = os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'email-intelligence', *parts)
+
+
+def ensure_private_dir(path: str) -> bool:
+    """Создание каталога с правами 0700; False, если каталог чужой и доверять ему нельзя"""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        st = os.stat(path)
+    except OSError as e:
+        logger.warning(f"Каталог недоступен ({path}): {e}")
+        return False
+    
+    if hasattr(os, 'getuid'):
+        if st.st_uid != os.getuid():
+            logger.warning(f"Каталог принадлежит другому пользователю, использовать его нельзя: {path}")
+            return False
+        if st.st_mode & 0o077:
+            os.chmod(path, 0o700)
+    return True
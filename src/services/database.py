@@ -3,12 +3,225 @@ import json
 import time
 import hashlib
 import logging
+import queue
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
 from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
+from urllib.request import pathname2url
 import os
 
+# orjson заметно быстрее стандартного json при сериализации результатов для кэша
+try:
+    import orjson
+    _loads = orjson.loads
+    
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    orjson = None
+    _loads = json.loads
+    
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+try:
+    from cachetools import TTLCache
+except ImportError:
+    TTLCache = None
+
+# Результаты в кэше сжимаются zstd: JSON ужимается в несколько раз, строки занимают меньше страниц
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
 logger = logging.getLogger(__name__)
 
+# Размер пула соединений только для чтения (WAL допускает параллельных читателей)
+READ_POOL_SIZE = min((os.cpu_count() or 1) * 2, 16)
+
+# Период фоновой очистки устаревших записей кэша
+CACHE_CLEANUP_INTERVAL_SECONDS = 60
+CACHE_CLEANUP_BATCH_SIZE = 500
+
+# Как часто фоновая задача обслуживания обновляет статистику планировщика
+OPTIMIZE_INTERVAL_SECONDS = 3 * 60 * 60
+
+# Сколько строк аналитики забирать из SQLite за один вызов fetchmany
+ANALYTICS_FETCH_SIZE = 1000
+
+# Срок хранения логов запросов и период их очистки фоновой задачей
+LOG_RETENTION_DAYS = 30
+LOG_CLEANUP_INTERVAL_SECONDS = 60 * 60
+
+# Счетчики обращений к кэшу копятся в памяти и сбрасываются одной транзакцией
+HIT_FLUSH_INTERVAL_SECONDS = 5
+HIT_FLUSH_BATCH_SIZE = 500
+
+# L1-кэш разобранных результатов в памяти процесса перед SQLite. TTL короткий, чтобы
+# записи, обновленные другими воркерами, не оставались устаревшими надолго
+L1_CACHE_SIZE = 10000
+L1_CACHE_TTL_SECONDS = 300
+
+# L1 общий для всех экземпляров DatabaseService над одним файлом БД: очистка или удаление
+# через один экземпляр (например, в cache_management) сразу видны остальным
+_l1_caches = {}
+_l1_caches_lock = threading.Lock()
+
+def _shared_l1(db_path: str):
+    """L1-кэш и его блокировка для файла БД (создаются при первом обращении)"""
+    key = os.path.realpath(db_path)
+    with _l1_caches_lock:
+        if key not in _l1_caches:
+            cache = TTLCache(maxsize=L1_CACHE_SIZE, ttl=L1_CACHE_TTL_SECONDS) if TTLCache else None
+            _l1_caches[key] = (cache, threading.Lock())
+        return _l1_caches[key]
+
+# Ключ email: 16 байт BLAKE2b вместо 64 символов hex SHA-256; недавние email держим с готовым ключом
+EMAIL_HASH_DIGEST_SIZE = 16
+EMAIL_HASH_CACHE_SIZE = 4096
+
+# Версия схемы (PRAGMA user_version), начиная с которой email_hash хранится в формате BLAKE2b
+EMAIL_HASH_SCHEMA_VERSION = 1
+
+# Уровень сжатия результатов и сигнатура кадра zstd (отличает сжатые записи от старого JSON)
+ZSTD_LEVEL = 3
+ZSTD_FRAME_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Записи search_logs ставятся в очередь и вставляются пакетами фоновым потоком
+LOG_FLUSH_INTERVAL_SECONDS = 0.1
+LOG_FLUSH_BATCH_SIZE = 500
+
+# SQL-запросы горячих путей. Одинаковый текст запроса позволяет sqlite3
+# переиспользовать подготовленные выражения из кэша соединения
+SQL_SELECT_CACHED_RESULT = '''
+    SELECT search_results, hit_count, created_at, expires_at 
+    FROM search_cache 
+    WHERE email_hash = ? AND expires_at > CAST(strftime('%s', 'now') AS INTEGER)
+'''
+
+SQL_ADD_CACHE_HITS = '''
+    UPDATE search_cache 
+    SET hit_count = hit_count + ?, updated_at = CURRENT_TIMESTAMP
+    WHERE email_hash = ?
+'''
+
+SQL_UPSERT_CACHE_ENTRY = '''
+    INSERT INTO search_cache 
+    (email_hash, email, search_results, expires_at, search_method)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(email_hash) DO UPDATE SET
+        email = excluded.email,
+        search_results = excluded.search_results,
+        expires_at = excluded.expires_at,
+        search_method = excluded.search_method,
+        created_at = CURRENT_TIMESTAMP,
+        updated_at = CURRENT_TIMESTAMP
+'''
+
+SQL_REFRESH_DAILY_UNIQUE_EMAILS = '''
+    UPDATE search_stats 
+    SET unique_emails = (
+        SELECT COUNT(DISTINCT email_hash) FROM search_logs WHERE log_date = ?
+    )
+    WHERE date = ? AND total_searches > 0
+'''
+
+SQL_DELETE_EXPIRED_BATCH = '''
+    DELETE FROM search_cache 
+    WHERE email_hash IN (
+        SELECT email_hash FROM search_cache 
+        WHERE expires_at < CAST(strftime('%s', 'now') AS INTEGER)
+        LIMIT ?
+    )
+'''
+
+SQL_CACHE_STATS_BY_METHOD = '''
+    SELECT 
+        search_method,
+        COUNT(*) as total_cached,
+        COUNT(CASE WHEN expires_at > CAST(strftime('%s', 'now') AS INTEGER) THEN 1 END) as active_cached,
+        SUM(hit_count) as total_hits
+    FROM search_cache
+    GROUP BY search_method
+'''
+
+SQL_DELETE_OLD_LOGS_BATCH = '''
+    DELETE FROM search_logs 
+    WHERE id IN (
+        SELECT id FROM search_logs 
+        WHERE created_at < datetime('now', ?)
+        LIMIT ?
+    )
+'''
+
+SQL_INSERT_SEARCH_LOG = '''
+    INSERT INTO search_logs 
+    (email_hash, email, ip_address, user_agent, search_method, 
+     results_count, processing_time, cache_hit, status, error_message, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Аналитика за период одним запросом: выборка лога за период материализуется один раз
+# (CTE используется трижды), по ней считаются итоги, разбивка по дням и по методам
+SQL_ANALYTICS = '''
+    WITH recent AS (
+        SELECT log_date, search_method, email_hash, ip_address, cache_hit, processing_time
+        FROM search_logs
+        WHERE created_at >= datetime('now', ?)
+    )
+    SELECT 'total', NULL, COUNT(*), COUNT(DISTINCT email_hash), AVG(processing_time),
+           SUM(CASE WHEN cache_hit = 1 THEN 1 ELSE 0 END), COUNT(DISTINCT ip_address)
+    FROM recent
+    UNION ALL
+    SELECT 'day', log_date, COUNT(*), COUNT(DISTINCT email_hash), NULL, NULL, NULL
+    FROM recent
+    GROUP BY log_date
+    UNION ALL
+    SELECT 'method', search_method, COUNT(*), NULL, NULL, NULL, NULL
+    FROM recent
+    GROUP BY search_method
+'''
+
+# Настройки соединения: действуют только в пределах соединения, поэтому задаются каждому
+CONNECTION_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',   # В режиме WAL fsync только при checkpoint
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-64000',    # 64 МБ страничного кэша
+    'PRAGMA mmap_size=30000000000',
+    'PRAGMA busy_timeout=5000',
+)
+
+_zstd_local = threading.local()
+
+def _zstd_codec():
+    """Компрессор и декомпрессор zstd текущего потока (объекты zstandard не потокобезопасны)"""
+    codec = getattr(_zstd_local, 'codec', None)
+    if codec is None:
+        codec = (zstandard.ZstdCompressor(level=ZSTD_LEVEL), zstandard.ZstdDecompressor())
+        _zstd_local.codec = codec
+    return codec
+
+def pack_search_results(search_data: Dict[str, Any]):
+    """Сериализация результатов для search_cache: сжатый BLOB, а без zstandard - JSON-текст"""
+    data = _dumps(search_data)
+    if zstandard is None:
+        return data.decode('utf-8')
+    return _zstd_codec()[0].compress(data)
+
+def unpack_search_results(stored) -> bytes:
+    """JSON результатов из search_cache в виде байтов (поддерживаются и несжатые записи)"""
+    if isinstance(stored, str):
+        return stored.encode('utf-8')
+    if stored[:4] == ZSTD_FRAME_MAGIC:
+        if zstandard is None:
+            raise RuntimeError('Для чтения сжатого кэша требуется пакет zstandard')
+        return _zstd_codec()[1].decompress(stored)
+    return bytes(stored)
+
 class DatabaseService:
     """Сервис для работы с базой данных и кэшированием результатов"""
     
@@ -21,34 +234,114 @@ class DatabaseService:
         else:
             self.db_path = db_path
         
+        # Одно постоянное соединение для записи: SQLite все равно допускает одного писателя
+        self._write_lock = threading.RLock()
+        self._write_conn = self._connect()
+        
         self.init_database()
+        
+        # Пул соединений для чтения, чтобы не открывать файл БД на каждый запрос
+        self.read_pool = queue.Queue(maxsize=READ_POOL_SIZE)
+        for _ in range(READ_POOL_SIZE):
+            self.read_pool.put(self._open_read_connection())
+        
+        self._cleanup_stop = threading.Event()
+        self._cleanup_thread = None
+        
+        # L1: email_hash -> [результат, hit_count, created_at, expires_at]
+        self._l1, self._l1_lock = _shared_l1(self.db_path)
+        
+        # Попадания в кэш не пишутся в БД сразу, а сбрасываются пакетами фоновым потоком
+        self._hit_buf = Counter()
+        self._hit_lock = threading.Lock()
+        self._hit_flush_stop = threading.Event()
+        self._hit_flush_wakeup = threading.Event()
+        self._hit_flush_thread = threading.Thread(target=self._hit_flush_task, daemon=True)
+        self._hit_flush_thread.start()
+        
+        # Логи запросов пишет один фоновый поток, запрос лишь кладет строку в очередь
+        self._log_queue = queue.Queue()
+        self._log_writer_thread = threading.Thread(target=self._log_writer_task, daemon=True)
+        self._log_writer_thread.start()
+    
+    @staticmethod
+    def _configure(conn: sqlite3.Connection) -> sqlite3.Connection:
+        """Применение PRAGMA-настроек к новому соединению"""
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Открытие настроенного соединения для записи (транзакции управляются явно)"""
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False,
+                               cached_statements=256)
+        return self._configure(conn)
+    
+    @contextmanager
+    def _write_transaction(self):
+        """Транзакция на соединении записи: фиксируется при выходе, откатывается при ошибке"""
+        with self._write_lock:
+            conn = self._write_conn
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
     
     def init_database(self):
         """Инициализация базы данных и создание таблиц"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            # WAL сохраняется в файле БД и позволяет читать параллельно с записью
+            self._write_conn.execute('PRAGMA journal_mode=WAL')
+            
+            with self._write_transaction() as conn:
                 cursor = conn.cursor()
                 
-                # Таблица для кэширования результатов поиска
+                # Старая таблица кэша с rowid переносится в новую структуру
+                legacy_cache = cursor.execute('''
+                    SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'search_cache'
+                ''').fetchone()
+                if legacy_cache and 'WITHOUT ROWID' not in legacy_cache[0].upper():
+                    cursor.execute('ALTER TABLE search_cache RENAME TO search_cache_legacy')
+                
+                # Таблица для кэширования результатов поиска: ключ email_hash, одно B-дерево без rowid
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS search_cache (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        email_hash TEXT UNIQUE NOT NULL,
+                        email_hash BLOB PRIMARY KEY,
                         email TEXT NOT NULL,
-                        search_results TEXT NOT NULL,
+                        search_results BLOB NOT NULL,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        expires_at TIMESTAMP NOT NULL,
+                        expires_at INTEGER NOT NULL,
                         hit_count INTEGER DEFAULT 0,
                         search_method TEXT DEFAULT 'unknown'
-                    )
+                    ) WITHOUT ROWID
+                ''')
+                
+                if legacy_cache and 'WITHOUT ROWID' not in legacy_cache[0].upper():
+                    cursor.execute('''
+                        INSERT INTO search_cache 
+                        (email_hash, email, search_results, created_at, updated_at, expires_at, hit_count, search_method)
+                        SELECT email_hash, email, search_results, created_at, updated_at, expires_at, hit_count, search_method
+                        FROM search_cache_legacy
+                    ''')
+                    cursor.execute('DROP TABLE search_cache_legacy')
+                    logger.info("Таблица search_cache перенесена в формат WITHOUT ROWID")
+                
+                # Срок жизни хранится как UNIX-время: старые текстовые метки переводим в секунды
+                cursor.execute('''
+                    UPDATE search_cache 
+                    SET expires_at = CAST(strftime('%s', expires_at) AS INTEGER)
+                    WHERE typeof(expires_at) = 'text'
                 ''')
                 
                 # Таблица для логирования запросов
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS search_logs (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        email_hash TEXT NOT NULL,
+                        email_hash BLOB NOT NULL,
                         email TEXT NOT NULL,
                         ip_address TEXT,
                         user_agent TEXT,
@@ -58,10 +351,19 @@ class DatabaseService:
                         cache_hit BOOLEAN DEFAULT FALSE,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         status TEXT DEFAULT 'success',
-                        error_message TEXT
+                        error_message TEXT,
+                        log_date TEXT GENERATED ALWAYS AS (DATE(created_at)) VIRTUAL
                     )
                 ''')
                 
+                # Дата лога как индексируемый столбец: DATE(created_at) в условиях индекс не использует
+                log_columns = {row[1] for row in cursor.execute('PRAGMA table_xinfo(search_logs)')}
+                if 'log_date' not in log_columns:
+                    cursor.execute('''
+                        ALTER TABLE search_logs 
+                        ADD COLUMN log_date TEXT GENERATED ALWAYS AS (DATE(created_at)) VIRTUAL
+                    ''')
+                
                 # Таблица для статистики
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS search_stats (
@@ -71,17 +373,62 @@ class DatabaseService:
                         cache_hits INTEGER DEFAULT 0,
                         unique_emails INTEGER DEFAULT 0,
                         avg_processing_time REAL DEFAULT 0.0,
+                        sum_processing_time REAL DEFAULT 0.0,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         UNIQUE(date)
                     )
                 ''')
                 
+                stats_columns = {row[1] for row in cursor.execute('PRAGMA table_info(search_stats)')}
+                if 'sum_processing_time' not in stats_columns:
+                    cursor.execute('ALTER TABLE search_stats ADD COLUMN sum_processing_time REAL DEFAULT 0.0')
+                
+                # Дневные счетчики ведет триггер на вставку лога, без пересчета всего дня
+                stats_trigger = cursor.execute('''
+                    SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_search_stats'
+                ''').fetchone()
+                if not stats_trigger:
+                    cursor.execute('''
+                        CREATE TRIGGER trg_search_stats AFTER INSERT ON search_logs
+                        BEGIN
+                            INSERT INTO search_stats 
+                            (date, total_searches, cache_hits, sum_processing_time, avg_processing_time)
+                            VALUES (
+                                NEW.log_date, 1, COALESCE(NEW.cache_hit, 0),
+                                COALESCE(NEW.processing_time, 0.0), COALESCE(NEW.processing_time, 0.0)
+                            )
+                            ON CONFLICT(date) DO UPDATE SET
+                                total_searches = total_searches + 1,
+                                cache_hits = cache_hits + excluded.cache_hits,
+                                sum_processing_time = sum_processing_time + excluded.sum_processing_time,
+                                avg_processing_time = (sum_processing_time + excluded.sum_processing_time)
+                                                      / (total_searches + 1);
+                        END
+                    ''')
+                    
+                    # Логи, записанные до появления триггера, переносим в счетчики один раз
+                    cursor.execute('''
+                        INSERT INTO search_stats 
+                        (date, total_searches, cache_hits, unique_emails, sum_processing_time, avg_processing_time)
+                        SELECT log_date, COUNT(*), SUM(COALESCE(cache_hit, 0)), COUNT(DISTINCT email_hash),
+                               SUM(COALESCE(processing_time, 0.0)), AVG(COALESCE(processing_time, 0.0))
+                        FROM search_logs
+                        WHERE log_date IS NOT NULL
+                        GROUP BY log_date
+                        ON CONFLICT(date) DO UPDATE SET
+                            total_searches = excluded.total_searches,
+                            cache_hits = excluded.cache_hits,
+                            unique_emails = excluded.unique_emails,
+                            sum_processing_time = excluded.sum_processing_time,
+                            avg_processing_time = excluded.avg_processing_time
+                    ''')
+                
                 # Таблица для rate limiting
                 cursor.execute('''
                     CREATE TABLE IF NOT EXISTS rate_limits (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         ip_address TEXT NOT NULL,
-                        email_hash TEXT,
+                        email_hash BLOB,
                         request_count INTEGER DEFAULT 1,
                         window_start TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         last_request TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -91,96 +438,197 @@ class DatabaseService:
                 ''')
                 
                 # Индексы для оптимизации
-                cursor.execute('CREATE INDEX IF NOT EXISTS idx_email_hash ON search_cache(email_hash)')
+                # email_hash теперь первичный ключ, отдельный индекс по нему не нужен
+                cursor.execute('DROP INDEX IF EXISTS idx_email_hash')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_expires_at ON search_cache(expires_at)')
+                # Индекс истории: порядок совпадает с ORDER BY, а expires_at проверяется прямо в индексе
+                cursor.execute('DROP INDEX IF EXISTS idx_cache_updated')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_cache_live ON search_cache(updated_at DESC, email DESC, expires_at)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_search_logs_created ON search_logs(created_at)')
+                # Число уникальных email за день считается только по индексу
+                cursor.execute('DROP INDEX IF EXISTS idx_search_logs_date')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_search_logs_date_email ON search_logs(log_date, email_hash)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_rate_limits_ip ON rate_limits(ip_address)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_stats_date ON search_stats(date)')
                 
-                conn.commit()
-                logger.info(f"База данных инициализирована: {self.db_path}")
+                # Старые hex-хэши SHA-256 пересчитываем в компактный ключ по сохраненному email
+                if cursor.execute('PRAGMA user_version').fetchone()[0] < EMAIL_HASH_SCHEMA_VERSION:
+                    conn.create_function('email_key', 1, self._hash_email, deterministic=True)
+                    cursor.execute('''
+                        UPDATE search_cache SET email_hash = email_key(email) 
+                        WHERE typeof(email_hash) = 'text'
+                    ''')
+                    cursor.execute('''
+                        UPDATE search_logs SET email_hash = email_key(email) 
+                        WHERE typeof(email_hash) = 'text'
+                    ''')
+                    # В rate_limits email не хранится, пересчитать ключи нельзя
+                    cursor.execute("DELETE FROM rate_limits WHERE typeof(email_hash) = 'text'")
+                    cursor.execute(f'PRAGMA user_version = {EMAIL_HASH_SCHEMA_VERSION}')
+                
+                # Статистика для планировщика, чтобы он выбирал индексы кэша
+                cursor.execute('ANALYZE search_cache')
                 
+            logger.info(f"База данных инициализирована: {self.db_path}")
+            
         except Exception as e:
             logger.error(f"Ошибка инициализации базы данных: {str(e)}")
             raise
     
-    def _hash_email(self, email: str) -> str:
-        """Создание хэша email для безопасного хранения"""
-        return hashlib.sha256(email.encode()).hexdigest()
+    def _open_read_connection(self) -> sqlite3.Connection:
+        """Открытие соединения только для чтения для пула"""
+        uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None,
+                               cached_statements=256)
+        self._configure(conn)
+        conn.execute('PRAGMA query_only=1')
+        # Читателей в пуле много, поэтому страничный кэш каждого меньше; данные общие через mmap
+        conn.execute('PRAGMA cache_size=-20000')
+        return conn
+    
+    @contextmanager
+    def borrow_read(self):
+        """Получение соединения из пула чтения с возвратом после использования"""
+        conn = self.read_pool.get()
+        try:
+            yield conn
+        finally:
+            self.read_pool.put(conn)
+    
+    @staticmethod
+    @lru_cache(maxsize=EMAIL_HASH_CACHE_SIZE)
+    def _hash_email(email: str) -> bytes:
+        """Создание хэша email для безопасного хранения (повторные email берутся из кэша)"""
+        return hashlib.blake2b(email.encode(), digest_size=EMAIL_HASH_DIGEST_SIZE).digest()
     
     def get_cached_result(self, email: str) -> Optional[Dict[str, Any]]:
         """Получение кэшированного результата поиска"""
         try:
             email_hash = self._hash_email(email)
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Проверяем наличие актуального кэша
-                cursor.execute('''
-                    SELECT search_results, hit_count, created_at 
-                    FROM search_cache 
-                    WHERE email_hash = ? AND expires_at > CURRENT_TIMESTAMP
-                ''', (email_hash,))
-                
-                result = cursor.fetchone()
+            # Сначала L1: попадание обходится без запроса к SQLite и разбора JSON
+            entry = self._l1_get(email_hash)
+            
+            if entry is None:
+                # Проверяем наличие актуального кэша без блокировки записи (WAL допускает параллельное чтение)
+                with self.borrow_read() as conn:
+                    result = conn.execute(SQL_SELECT_CACHED_RESULT, (email_hash,)).fetchone()
                 
-                if result:
-                    # Увеличиваем счетчик обращений
-                    cursor.execute('''
-                        UPDATE search_cache 
-                        SET hit_count = hit_count + 1, updated_at = CURRENT_TIMESTAMP
-                        WHERE email_hash = ?
-                    ''', (email_hash,))
-                    
-                    conn.commit()
-                    
-                    # Парсим JSON результат
-                    search_data = json.loads(result[0])
-                    search_data['cache_info'] = {
-                        'cached': True,
-                        'hit_count': result[1] + 1,
-                        'cached_at': result[2]
-                    }
-                    
-                    logger.info(f"Найден кэшированный результат для email: {email}")
-                    return search_data
-                
-                return None
+                if not result:
+                    return None
                 
+                # Парсим JSON результат
+                entry = [_loads(unpack_search_results(result[0])), result[1], result[2], result[3]]
+            
+            # Увеличиваем счетчик обращений в буфере, в БД он попадет при следующем сбросе
+            with self._hit_lock:
+                self._hit_buf[email_hash] += 1
+                pending_hits = self._hit_buf[email_hash]
+                if len(self._hit_buf) >= HIT_FLUSH_BATCH_SIZE:
+                    self._hit_flush_wakeup.set()
+            
+            if self._l1 is not None:
+                with self._l1_lock:
+                    if self._l1.get(email_hash) is entry:
+                        entry[1] += 1
+                    else:
+                        entry[1] += pending_hits
+                        self._l1[email_hash] = entry
+                    hit_count = entry[1]
+            else:
+                hit_count = entry[1] + pending_hits
+            
+            # Отдаем копию: закэшированный в L1 словарь вызывающему коду недоступен
+            search_data = dict(entry[0])
+            search_data['cache_info'] = {
+                'cached': True,
+                'hit_count': hit_count,
+                'cached_at': entry[2]
+            }
+            
+            logger.info(f"Найден кэшированный результат для email: {email}")
+            return search_data
+            
         except Exception as e:
             logger.error(f"Ошибка получения кэша для email {email}: {str(e)}")
             return None
     
+    def _l1_get(self, email_hash: bytes) -> Optional[list]:
+        """Запись L1-кэша, если она есть и срок жизни результата еще не истек"""
+        if self._l1 is None:
+            return None
+        with self._l1_lock:
+            entry = self._l1.get(email_hash)
+            if entry is not None and entry[3] <= time.time():
+                del self._l1[email_hash]
+                return None
+            return entry
+    
+    def _l1_invalidate(self, email_hash: bytes = None):
+        """Удаление записи L1-кэша (без email_hash - очистка целиком)"""
+        if self._l1 is None:
+            return
+        with self._l1_lock:
+            if email_hash is None:
+                self._l1.clear()
+            else:
+                self._l1.pop(email_hash, None)
+    
+    def flush_hit_counts(self) -> int:
+        """Запись накопленных счетчиков обращений к кэшу одной транзакцией"""
+        with self._hit_lock:
+            if not self._hit_buf:
+                return 0
+            pending, self._hit_buf = self._hit_buf, Counter()
+        
+        try:
+            with self._write_transaction() as conn:
+                conn.executemany(SQL_ADD_CACHE_HITS, [(hits, email_hash) for email_hash, hits in pending.items()])
+        except Exception:
+            # Возвращаем счетчики в буфер, чтобы не потерять их до следующей попытки
+            with self._hit_lock:
+                self._hit_buf.update(pending)
+            raise
+        
+        return len(pending)
+    
+    def _hit_flush_task(self):
+        """Фоновый сброс счетчиков обращений: по таймеру или при заполнении буфера"""
+        while not self._hit_flush_stop.is_set():
+            self._hit_flush_wakeup.wait(HIT_FLUSH_INTERVAL_SECONDS)
+            self._hit_flush_wakeup.clear()
+            if self._hit_flush_stop.is_set():
+                break
+            try:
+                self.flush_hit_counts()
+            except Exception as e:
+                logger.error(f"Ошибка сброса счетчиков обращений к кэшу: {str(e)}")
+    
     def cache_search_result(self, email: str, search_data: Dict[str, Any], 
                           cache_duration_hours: int = 24) -> bool:
         """Кэширование результата поиска"""
         try:
             email_hash = self._hash_email(email)
-            expires_at = datetime.now() + timedelta(hours=cache_duration_hours)
+            expires_at = int(time.time()) + cache_duration_hours * 3600
             
             # Удаляем cache_info если есть, чтобы не сохранять в кэш
             search_data_copy = search_data.copy()
             search_data_copy.pop('cache_info', None)
             
-            search_results_json = json.dumps(search_data_copy, ensure_ascii=False)
+            search_results_blob = pack_search_results(search_data_copy)
             search_method = search_data.get('search_metadata', {}).get('search_method', 'unknown')
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._write_transaction() as conn:
                 cursor = conn.cursor()
                 
-                # Используем INSERT OR REPLACE для обновления существующих записей
-                cursor.execute('''
-                    INSERT OR REPLACE INTO search_cache 
-                    (email_hash, email, search_results, expires_at, search_method, hit_count)
-                    VALUES (?, ?, ?, ?, ?, COALESCE(
-                        (SELECT hit_count FROM search_cache WHERE email_hash = ?), 0
-                    ))
-                ''', (email_hash, email, search_results_json, expires_at, search_method, email_hash))
-                
-                conn.commit()
-                logger.info(f"Результат кэширован для email: {email}")
-                return True
+                # UPSERT обновляет существующую запись на месте и сохраняет hit_count
+                cursor.execute(SQL_UPSERT_CACHE_ENTRY, (email_hash, email, search_results_blob, expires_at, search_method))
+            
+            # Следующее чтение возьмет новый результат из SQLite и положит его в L1
+            self._l1_invalidate(email_hash)
+            
+            logger.info(f"Результат кэширован для email: {email}")
+            return True
                 
         except Exception as e:
             logger.error(f"Ошибка кэширования для email {email}: {str(e)}")
@@ -194,60 +642,64 @@ class DatabaseService:
         """Логирование запроса поиска"""
         try:
             email_hash = self._hash_email(email)
+            # Время фиксируется в момент запроса, а не при фактической вставке пакета
+            created_at = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime())
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    INSERT INTO search_logs 
-                    (email_hash, email, ip_address, user_agent, search_method, 
-                     results_count, processing_time, cache_hit, status, error_message)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (email_hash, email, ip_address, user_agent, search_method,
-                      results_count, processing_time, cache_hit, status, error_message))
-                
-                conn.commit()
-                return True
+            self._log_queue.put((email_hash, email, ip_address, user_agent, search_method,
+                                 results_count, processing_time, cache_hit, status, error_message,
+                                 created_at))
+            return True
                 
         except Exception as e:
             logger.error(f"Ошибка логирования запроса: {str(e)}")
             return False
     
+    def _write_search_logs(self, rows):
+        """Вставка пакета логов запросов одной транзакцией"""
+        with self._write_transaction() as conn:
+            conn.executemany(SQL_INSERT_SEARCH_LOG, rows)
+    
+    def _log_writer_task(self):
+        """Фоновая запись логов: строки, пришедшие за интервал, попадают в одну транзакцию"""
+        stopping = False
+        while not stopping:
+            row = self._log_queue.get()
+            if row is None:
+                break
+            time.sleep(LOG_FLUSH_INTERVAL_SECONDS)
+            
+            batch = [row]
+            while len(batch) < LOG_FLUSH_BATCH_SIZE:
+                try:
+                    row = self._log_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if row is None:
+                    stopping = True
+                    break
+                batch.append(row)
+            
+            try:
+                self._write_search_logs(batch)
+            except Exception as e:
+                logger.error(f"Ошибка записи пакета логов ({len(batch)} шт.): {str(e)}")
+    
     def update_daily_stats(self, date: str = None) -> bool:
         """Обновление ежедневной статистики"""
         try:
             if date is None:
                 date = datetime.now().strftime('%Y-%m-%d')
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Получаем статистику за день
-                cursor.execute('''
-                    SELECT 
-                        COUNT(*) as total_searches,
-                        SUM(CASE WHEN cache_hit = 1 THEN 1 ELSE 0 END) as cache_hits,
-                        COUNT(DISTINCT email_hash) as unique_emails,
-                        AVG(processing_time) as avg_processing_time
-                    FROM search_logs 
-                    WHERE DATE(created_at) = ?
-                ''', (date,))
-                
-                stats = cursor.fetchone()
-                
-                if stats and stats[0] > 0:
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO search_stats 
-                        (date, total_searches, cache_hits, unique_emails, avg_processing_time)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (date, stats[0], stats[1], stats[2], stats[3] or 0.0))
-                    
-                    conn.commit()
-                    logger.info(f"Статистика обновлена для даты: {date}")
-                    return True
-                
-                return False
-                
+            # Счетчики дня ведет триггер trg_search_stats, пересчитываем только уникальные email
+            with self._write_transaction() as conn:
+                updated = conn.execute(SQL_REFRESH_DAILY_UNIQUE_EMAILS, (date, date)).rowcount
+            
+            if updated:
+                logger.info(f"Статистика обновлена для даты: {date}")
+                return True
+            
+            return False
+            
         except Exception as e:
             logger.error(f"Ошибка обновления статистики: {str(e)}")
             return False
@@ -255,64 +707,122 @@ class DatabaseService:
     def cleanup_expired_cache(self) -> int:
         """Очистка устаревшего кэша"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Удаляем устаревшие записи
-                cursor.execute('''
-                    DELETE FROM search_cache 
-                    WHERE expires_at < CURRENT_TIMESTAMP
-                ''')
-                
-                deleted_count = cursor.rowcount
-                conn.commit()
-                
-                if deleted_count > 0:
-                    logger.info(f"Удалено {deleted_count} устаревших записей из кэша")
-                
-                return deleted_count
+            deleted_count = 0
+            
+            # Удаляем устаревшие записи порциями по индексу expires_at; между порциями
+            # блокировка записи освобождается и запросы успевают записать свое
+            while True:
+                with self._write_transaction() as conn:
+                    batch_count = conn.execute(SQL_DELETE_EXPIRED_BATCH, (CACHE_CLEANUP_BATCH_SIZE,)).rowcount
+                
+                deleted_count += batch_count
+                if batch_count < CACHE_CLEANUP_BATCH_SIZE:
+                    break
+            
+            if deleted_count > 0:
+                logger.info(f"Удалено {deleted_count} устаревших записей из кэша")
+            
+            return deleted_count
                 
         except Exception as e:
             logger.error(f"Ошибка очистки кэша: {str(e)}")
             return 0
     
+    def cleanup_old_logs(self, days: int = LOG_RETENTION_DAYS) -> int:
+        """Удаление логов запросов старше заданного срока"""
+        try:
+            period = f'-{int(days)} days'
+            deleted_count = 0
+            
+            # Та же схема, что и для кэша: порции по индексу created_at с освобождением блокировки
+            while True:
+                with self._write_transaction() as conn:
+                    batch_count = conn.execute(SQL_DELETE_OLD_LOGS_BATCH,
+                                               (period, CACHE_CLEANUP_BATCH_SIZE)).rowcount
+                
+                deleted_count += batch_count
+                if batch_count < CACHE_CLEANUP_BATCH_SIZE:
+                    break
+            
+            if deleted_count > 0:
+                logger.info(f"Удалено {deleted_count} логов запросов старше {days} дней")
+            
+            return deleted_count
+                
+        except Exception as e:
+            logger.error(f"Ошибка очистки логов запросов: {str(e)}")
+            return 0
+    
+    def clear_cache(self) -> int:
+        """Полная очистка кэша результатов поиска"""
+        with self._write_transaction() as conn:
+            deleted_count = conn.execute('DELETE FROM search_cache').rowcount
+        self._l1_invalidate()
+        
+        logger.info(f"Кэш полностью очищен, удалено {deleted_count} записей")
+        return deleted_count
+    
+    def start_cache_cleanup(self, interval: int = CACHE_CLEANUP_INTERVAL_SECONDS):
+        """Запуск фоновой периодической очистки устаревшего кэша"""
+        if self._cleanup_thread and self._cleanup_thread.is_alive():
+            return
+        
+        def cleanup_task():
+            last_optimize = time.monotonic()
+            last_log_cleanup = 0.0
+            # Удаление устаревших строк держит рабочий набор search_cache маленьким
+            while not self._cleanup_stop.wait(interval):
+                try:
+                    self.cleanup_expired_cache()
+                except Exception as e:
+                    logger.error(f"Ошибка в задаче очистки кэша: {str(e)}")
+                
+                # Старые логи удаляются реже, чтобы аналитика сканировала ограниченный объем
+                if time.monotonic() - last_log_cleanup >= LOG_CLEANUP_INTERVAL_SECONDS:
+                    last_log_cleanup = time.monotonic()
+                    self.cleanup_old_logs()
+                
+                if time.monotonic() - last_optimize >= OPTIMIZE_INTERVAL_SECONDS:
+                    last_optimize = time.monotonic()
+                    self.optimize()
+        
+        self._cleanup_thread = threading.Thread(target=cleanup_task, daemon=True)
+        self._cleanup_thread.start()
+        logger.info("Фоновая очистка кэша запущена")
+    
+    def optimize(self) -> bool:
+        """Обновление статистики планировщика через PRAGMA optimize"""
+        try:
+            # Статистика пишется в sqlite_stat1, поэтому только через соединение записи
+            with self._write_lock:
+                self._write_conn.execute('PRAGMA optimize')
+            return True
+        except Exception as e:
+            logger.error(f"Ошибка PRAGMA optimize: {str(e)}")
+            return False
+    
     def get_cache_stats(self) -> Dict[str, Any]:
         """Получение статистики кэша"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Общая статистика кэша
-                cursor.execute('''
-                    SELECT 
-                        COUNT(*) as total_cached,
-                        COUNT(CASE WHEN expires_at > CURRENT_TIMESTAMP THEN 1 END) as active_cached,
-                        SUM(hit_count) as total_hits,
-                        AVG(hit_count) as avg_hits_per_entry
-                    FROM search_cache
-                ''')
-                
-                cache_stats = cursor.fetchone()
-                
-                # Статистика по методам поиска
-                cursor.execute('''
-                    SELECT search_method, COUNT(*) as count
-                    FROM search_cache
-                    WHERE expires_at > CURRENT_TIMESTAMP
-                    GROUP BY search_method
-                ''')
-                
-                method_stats = dict(cursor.fetchall())
-                
-                return {
-                    'total_cached_entries': cache_stats[0] or 0,
-                    'active_cached_entries': cache_stats[1] or 0,
-                    'total_cache_hits': cache_stats[2] or 0,
-                    'average_hits_per_entry': round(cache_stats[3] or 0, 2),
-                    'cache_by_method': method_stats,
-                    'cache_hit_ratio': self._calculate_cache_hit_ratio()
-                }
-                
+            # Один проход по кэшу: итоги считаются из разбивки по методам поиска
+            with self.borrow_read() as conn:
+                rows = conn.execute(SQL_CACHE_STATS_BY_METHOD).fetchall()
+            
+            total_cached = sum(row[1] for row in rows)
+            active_cached = sum(row[2] for row in rows)
+            total_hits = sum(row[3] or 0 for row in rows)
+            method_stats = {row[0]: row[2] for row in rows if row[2]}
+            
+            # Соединение уже возвращено в пул: расчет коэффициента берет свое
+            return {
+                'total_cached_entries': total_cached,
+                'active_cached_entries': active_cached,
+                'total_cache_hits': total_hits,
+                'average_hits_per_entry': round(total_hits / total_cached, 2) if total_cached else 0,
+                'cache_by_method': method_stats,
+                'cache_hit_ratio': self._calculate_cache_hit_ratio()
+            }
+            
         except Exception as e:
             logger.error(f"Ошибка получения статистики кэша: {str(e)}")
             return {}
@@ -320,7 +830,7 @@ class DatabaseService:
     def _calculate_cache_hit_ratio(self) -> float:
         """Расчет коэффициента попаданий в кэш"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.borrow_read() as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute('''
@@ -345,64 +855,47 @@ class DatabaseService:
     def get_search_analytics(self, days: int = 7) -> Dict[str, Any]:
         """Получение аналитики поисковых запросов"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            # Период передается параметром: текст запросов один для любого days и кэшируется
+            period = f'-{int(days)} days'
+            
+            general_stats = (0, 0, None, 0, 0)
+            daily_stats = []
+            method_counts = []
+            
+            with self.borrow_read() as conn:
                 cursor = conn.cursor()
-                
-                # Общая статистика за период
-                cursor.execute('''
-                    SELECT 
-                        COUNT(*) as total_searches,
-                        COUNT(DISTINCT email_hash) as unique_emails,
-                        AVG(processing_time) as avg_processing_time,
-                        SUM(CASE WHEN cache_hit = 1 THEN 1 ELSE 0 END) as cache_hits,
-                        COUNT(DISTINCT ip_address) as unique_ips
-                    FROM search_logs
-                    WHERE created_at >= datetime('now', '-{} days')
-                '''.format(days))
-                
-                general_stats = cursor.fetchone()
-                
-                # Статистика по дням
-                cursor.execute('''
-                    SELECT 
-                        DATE(created_at) as date,
-                        COUNT(*) as searches,
-                        COUNT(DISTINCT email_hash) as unique_emails
-                    FROM search_logs
-                    WHERE created_at >= datetime('now', '-{} days')
-                    GROUP BY DATE(created_at)
-                    ORDER BY date DESC
-                '''.format(days))
-                
-                daily_stats = [
-                    {'date': row[0], 'searches': row[1], 'unique_emails': row[2]}
-                    for row in cursor.fetchall()
-                ]
-                
-                # Топ поисковых методов
-                cursor.execute('''
-                    SELECT search_method, COUNT(*) as count
-                    FROM search_logs
-                    WHERE created_at >= datetime('now', '-{} days')
-                    GROUP BY search_method
-                    ORDER BY count DESC
-                '''.format(days))
-                
-                method_stats = dict(cursor.fetchall())
-                
-                return {
-                    'period_days': days,
-                    'total_searches': general_stats[0] or 0,
-                    'unique_emails': general_stats[1] or 0,
-                    'average_processing_time': round(general_stats[2] or 0, 3),
-                    'cache_hits': general_stats[3] or 0,
-                    'unique_ips': general_stats[4] or 0,
-                    'cache_hit_ratio': round(
-                        (general_stats[3] / general_stats[0] * 100) if general_stats[0] > 0 else 0, 2
-                    ),
-                    'daily_breakdown': daily_stats,
-                    'search_methods': method_stats
-                }
+                cursor.arraysize = ANALYTICS_FETCH_SIZE
+                cursor.execute(SQL_ANALYTICS, (period,))
+                
+                # Разбираем общий результат по типу строки
+                while True:
+                    rows = cursor.fetchmany()
+                    if not rows:
+                        break
+                    for kind, key, count, unique_emails, avg_time, cache_hits, unique_ips in rows:
+                        if kind == 'day':
+                            daily_stats.append({'date': key, 'searches': count, 'unique_emails': unique_emails})
+                        elif kind == 'method':
+                            method_counts.append((key, count))
+                        else:
+                            general_stats = (count, unique_emails, avg_time, cache_hits, unique_ips)
+            
+            daily_stats.sort(key=lambda day: day['date'], reverse=True)
+            method_counts.sort(key=lambda item: item[1], reverse=True)
+            
+            return {
+                'period_days': days,
+                'total_searches': general_stats[0] or 0,
+                'unique_emails': general_stats[1] or 0,
+                'average_processing_time': round(general_stats[2] or 0, 3),
+                'cache_hits': general_stats[3] or 0,
+                'unique_ips': general_stats[4] or 0,
+                'cache_hit_ratio': round(
+                    (general_stats[3] / general_stats[0] * 100) if general_stats[0] > 0 else 0, 2
+                ),
+                'daily_breakdown': daily_stats,
+                'search_methods': dict(method_counts)
+            }
                 
         except Exception as e:
             logger.error(f"Ошибка получения аналитики: {str(e)}")
@@ -414,7 +907,7 @@ class DatabaseService:
             email_hash = self._hash_email(email)
             deleted_counts = {}
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._write_transaction() as conn:
                 cursor = conn.cursor()
                 
                 # Удаляем из кэша
@@ -428,17 +921,17 @@ class DatabaseService:
                 # Удаляем из rate limits
                 cursor.execute('DELETE FROM rate_limits WHERE email_hash = ?', (email_hash,))
                 deleted_counts['rate_limits'] = cursor.rowcount
-                
-                conn.commit()
-                
-                total_deleted = sum(deleted_counts.values())
-                logger.info(f"Удалены данные для email {email}: {deleted_counts}")
-                
-                return {
-                    'email': email,
-                    'total_deleted': total_deleted,
-                    'details': deleted_counts
-                }
+            
+            self._l1_invalidate(email_hash)
+            
+            total_deleted = sum(deleted_counts.values())
+            logger.info(f"Удалены данные для email {email}: {deleted_counts}")
+            
+            return {
+                'email': email,
+                'total_deleted': total_deleted,
+                'details': deleted_counts
+            }
                 
         except Exception as e:
             logger.error(f"Ошибка удаления данных для email {email}: {str(e)}")
@@ -449,7 +942,7 @@ class DatabaseService:
         try:
             deleted_counts = {}
             
-            with sqlite3.connect(self.db_path) as conn:
+            with self._write_transaction() as conn:
                 cursor = conn.cursor()
                 
                 # Удаляем все из кэша
@@ -467,16 +960,16 @@ class DatabaseService:
                 # Удаляем статистику
                 cursor.execute('DELETE FROM search_stats')
                 deleted_counts['stats'] = cursor.rowcount
-                
-                conn.commit()
-                
-                total_deleted = sum(deleted_counts.values())
-                logger.info(f"Удалены все данные email: {deleted_counts}")
-                
-                return {
-                    'total_deleted': total_deleted,
-                    'details': deleted_counts
-                }
+            
+            self._l1_invalidate()
+            
+            total_deleted = sum(deleted_counts.values())
+            logger.info(f"Удалены все данные email: {deleted_counts}")
+            
+            return {
+                'total_deleted': total_deleted,
+                'details': deleted_counts
+            }
                 
         except Exception as e:
             logger.error(f"Ошибка полной очистки данных email: {str(e)}")
@@ -485,7 +978,7 @@ class DatabaseService:
     def get_email_data_stats(self) -> Dict[str, Any]:
         """Получение статистики хранимых данных email"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.borrow_read() as conn:
                 cursor = conn.cursor()
                 
                 # Статистика по таблицам
@@ -537,7 +1030,37 @@ class DatabaseService:
             return {'error': str(e)}
     
     def close(self):
-        """Закрытие соединения с базой данных"""
-        # SQLite автоматически закрывает соединения при использовании context manager
-        pass
+        """Закрытие соединений с базой данных"""
+        self._cleanup_stop.set()
+        self._hit_flush_stop.set()
+        self._hit_flush_wakeup.set()
+        self._hit_flush_thread.join()
+        self._log_queue.put(None)
+        self._log_writer_thread.join()
+        remaining = []
+        while True:
+            try:
+                row = self._log_queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not None:
+                remaining.append(row)
+        if remaining:
+            try:
+                self._write_search_logs(remaining)
+            except Exception as e:
+                logger.error(f"Ошибка записи пакета логов ({len(remaining)} шт.): {str(e)}")
+        try:
+            self.flush_hit_counts()
+        except Exception as e:
+            logger.error(f"Ошибка сброса счетчиков обращений к кэшу: {str(e)}")
+        self.optimize()
+        while True:
+            try:
+                conn = self.read_pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+        with self._write_lock:
+            self._write_conn.close()
 
@@ -3,54 +3,449 @@
 """
 
 import requests
+from urllib3.util.retry import Retry
+from http.cookiejar import LWPCookieJar
+import os
 import time
 import re
 import json
-from bs4 import BeautifulSoup
+import threading
+import asyncio
+import copy
+import heapq
+from collections import Counter
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import lxml.html
+from lxml import etree
 from typing import Dict, List, Optional, Any
 from urllib.parse import quote, unquote
 import logging
 
+from .cache_dirs import user_cache_dir, ensure_private_dir
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    from cachetools import TTLCache
+except ImportError:
+    TTLCache = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
 logger = logging.getLogger(__name__)
 
+# Варианты запроса выполняются параллельно, но не чаще одного POST в секунду
+SEARCH_WORKERS = 4
+SEARCH_MIN_INTERVAL_SECONDS = 1.0
+REQUEST_TIMEOUT_SECONDS = 30
+# Пул keep-alive соединений покрывает параллельные варианты поиска и запросы деталей
+HTTP_POOL_SIZE = 32
+
+# Повторный поиск по тому же варианту и детали публикации, общей для нескольких email,
+# отдаются из памяти без HTTP-запроса и разбора страницы
+SEARCH_CACHE_SIZE = 1024
+DETAILS_CACHE_SIZE = 1024
+RESPONSE_CACHE_TTL_SECONDS = 3600
+
+# HTTP-кэш ответов и cookies сессии хранятся на диске и переживают перезапуск процесса:
+# новый воркер не запрашивает главную страницу, если сохраненная сессия еще жива.
+# Каталог принадлежит пользователю процесса (0700), а не общий каталог в /tmp
+ELIBRARY_CACHE_DIR = os.getenv('ELIBRARY_CACHE_DIR', user_cache_dir('elibrary'))
+HTTP_CACHE_EXPIRE_SECONDS = 3600
+# Сохраненная сессия считается живой, пока есть cookie сессии ASP и с последнего сохранения
+# cookies прошло меньше Session.Timeout (20 минут по умолчанию; сохранение - после каждого поиска)
+ELIBRARY_SESSION_TTL_SECONDS = 20 * 60
+_SESSION_COOKIE_PREFIX = 'ASPSESSIONID'
+
+# Лимиты асинхронного клиента: общий пул соединений и одновременные запросы к elibrary.ru
+ASYNC_CONNECTION_LIMIT = 20
+ASYNC_CONNECTION_LIMIT_PER_HOST = 4
+ASYNC_CONCURRENT_REQUESTS = 2
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9',
+    'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8',
+    # br запрашиваем, только если HTTP-клиенты смогут его распаковать (нужен пакет brotli)
+    'Accept-Encoding': 'gzip, deflate, br' if brotli else 'gzip, deflate',
+    'Cache-Control': 'no-cache',
+    'Pragma': 'no-cache',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+    'Upgrade-Insecure-Requests': '1',
+    'Connection': 'keep-alive',
+}
+
+_ASCII_UPPER = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+_ASCII_LOWER = 'abcdefghijklmnopqrstuvwxyz'
+
+def _class_contains(word: str) -> str:
+    """XPath-условие: в атрибуте class встречается подстрока word без учета регистра"""
+    return f"contains(translate(@class, '{_ASCII_UPPER}', '{_ASCII_LOWER}'), '{word}')"
+
+# Разбор страниц elibrary.ru идет по дереву lxml заранее скомпилированными XPath:
+# DOM остается в C, а объединение '|' возвращает узлы в порядке документа
+# Строки таблицы результатов elibrary.ru (table#restab); парсер lxml не добавляет tbody сам,
+# поэтому учитываем оба варианта разметки
+_RESULT_ROWS_XPATH = etree.XPath("//table[@id='restab']/tr | //table[@id='restab']/tbody/tr")
+_RESULT_BLOCK_CLASS = " or ".join(_class_contains(word) for word in ('row', 'result', 'item'))
+_RESULT_BLOCKS_XPATH = etree.XPath(f"//tr[{_RESULT_BLOCK_CLASS}] | //div[{_RESULT_BLOCK_CLASS}]")
+_TABLES_XPATH = etree.XPath("//table")
+_TITLE_LINKS_XPATH = etree.XPath(".//a[@href] | .//b[@href] | .//strong[@href]")
+_FIRST_BOLD_XPATH = etree.XPath("(.//b | .//strong)[1]")
+_ITEM_LINKS_XPATH = etree.XPath("//a[contains(@href, 'item_id=')]")
+_TEXT_NODES_XPATH = etree.XPath(".//text()")
+
+# Регулярные выражения компилируются один раз при импорте, а не на каждый блок страницы
+_ITEM_ID_RE = re.compile(r'item_id=(\d+)', re.I)
+_WHITESPACE_RE = re.compile(r'\s+')
+_FALLBACK_ITEM_ID_RE = re.compile(r'item_id=\d+')
+# Авторы, источник и год блока извлекаются за один проход по тексту. Альтернативы
+# стоят внутри опережающей проверки, поэтому совпадения не поглощают текст и одно
+# поле (например, источник) не скрывает другое (год внутри названия журнала).
+# Год ограничен цифрами, а не \b: text_content() склеивает соседние узлы без пробелов
+_PUBLICATION_FIELDS_RE = re.compile(
+    r'(?='
+    r'Авторы?:\s*(?P<authors>[^\.]+)'
+    r'|(?P<fio>[А-ЯЁ][а-яё]+\s+[А-ЯЁ]\.[А-ЯЁ]\.)'
+    r'|Журнал:\s*(?P<journal>[^\.]+)'
+    r'|Источник:\s*(?P<source>[^\.]+)'
+    r'|В книге:\s*(?P<book>[^\.]+)'
+    r'|(?<!\d)(?P<year>(?:19|20)\d{2})(?!\d)'
+    r')'
+)
+_SPLIT_AUTHORS_RE = re.compile(r'[,;]')
+
+# Маркеры типа публикации в порядке приоритета; если ни один не найден — статья
+_TYPE_MARKERS = (
+    ('диссертация', 'dissertation'),
+    ('конференция', 'conference'),
+    ('книга', 'book'),
+)
+_YEAR_RE = re.compile(r'(\d{4})')
+_DOI_RE = re.compile(r'DOI:\s*([\d\.\/\w-]+)')
+_KEYWORDS_RE = re.compile(r'ключевые слова[:\s]*([^\.]+)', re.I)
+_NUMBER_RE = re.compile(r'(\d+)')
+
+# Подписи полей ищутся как подстроки в нижнем регистре: маркер -> имя поля
+_ABSTRACT_MARKERS = {'аннотация': 'abstract', 'abstract': 'abstract'}
+_DETAILS_MARKERS = {'doi:': 'doi', 'ключевые слова': 'keywords', 'цитирован': 'citations'}
+
+_parser_local = threading.local()
+_CHARSET_RE = re.compile(r'charset=["\']?([\w.:-]+)', re.I)
+
+def _html_parser(encoding: Optional[str] = None):
+    """
+    HTML-парсер lxml текущего потока (экземпляры парсера нельзя делить между потоками)
+    
+    Комментарии и инструкции обработки отбрасываются при разборе и не попадают в дерево,
+    а индекс id не строится: поиск по @id в XPath обходится без него.
+    Без encoding кодировку байтов определяет сам lxml по meta страницы
+    """
+    parsers = getattr(_parser_local, 'parsers', None)
+    if parsers is None:
+        parsers = _parser_local.parsers = {}
+    parser = parsers.get(encoding)
+    if parser is None:
+        try:
+            parser = lxml.html.HTMLParser(
+                encoding=encoding, remove_comments=True, remove_pis=True, collect_ids=False
+            )
+        except LookupError:
+            logger.debug(f"Неизвестная кодировка ответа: {encoding}")
+            return _html_parser()
+        parsers[encoding] = parser
+    return parser
+
+def _header_charset(headers) -> Optional[str]:
+    """Кодировка из заголовка Content-Type, если сервер ее указал"""
+    match = _CHARSET_RE.search(headers.get('Content-Type', ''))
+    return match.group(1).lower() if match else None
+
+def _stripped_text(element) -> str:
+    """Текст элемента из склеенных без разделителя очищенных фрагментов (как get_text(strip=True))"""
+    return "".join(part.strip() for part in element.itertext())
+
+def _find_text_parents(element, markers: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Для каждого поля — элемент, содержащий первый текстовый узел с одним из его маркеров
+    
+    Все маркеры проверяются за один проход по текстовым узлам простым поиском подстроки
+    """
+    found = {}
+    fields_count = len(set(markers.values()))
+    for text in _TEXT_NODES_XPATH(element):
+        text_lower = text.lower()
+        for marker, field in markers.items():
+            if field not in found and marker in text_lower:
+                # Хвостовой текст принадлежит родителю элемента, после которого он идет
+                owner = text.getparent()
+                found[field] = owner.getparent() if text.is_tail else owner
+        if len(found) == fields_count:
+            break
+    return found
+
+_search_cache = TTLCache(maxsize=SEARCH_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS) if TTLCache else None
+_details_cache = TTLCache(maxsize=DETAILS_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_SECONDS) if TTLCache else None
+_response_cache_lock = threading.Lock()
+
+# Метка времени ответа меняется раз в секунду: форматируем ее один раз на секунду.
+# Кортеж заменяется целиком, поэтому потоки видят согласованную пару
+_timestamp_cache = (0, "")
+
+def _current_timestamp() -> str:
+    """Текущее локальное время в формате 'YYYY-MM-DD HH:MM:SS'"""
+    global _timestamp_cache
+    now = int(time.time())
+    second, formatted = _timestamp_cache
+    if now != second:
+        formatted = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now))
+        _timestamp_cache = (now, formatted)
+    return formatted
+
+def _search_cache_key(query: str, search_options: Optional[Dict]) -> tuple:
+    """Ключ кэша поиска: запрос и опции в каноническом виде"""
+    return query, json.dumps(search_options or {}, sort_keys=True, ensure_ascii=False, default=str)
+
+def _get_cached(cache, key) -> Optional[Dict[str, Any]]:
+    """Возвращает копию закэшированного ответа или None"""
+    if cache is None:
+        return None
+    with _response_cache_lock:
+        cached = cache.get(key)
+    return copy.deepcopy(cached) if cached is not None else None
+
+def _store_cached(cache, key, value: Optional[Dict[str, Any]]):
+    """Сохраняет успешный ответ; в кэше лежит копия, недоступная вызывающему коду"""
+    if cache is None or not value or value.get("error"):
+        return
+    value = copy.deepcopy(value)
+    with _response_cache_lock:
+        cache[key] = value
+
+def _store_search_results(key, results: Optional[Dict[str, Any]]):
+    """Сохраняет результаты поиска, только если найдены публикации"""
+    # Пустой разбор часто означает страницу капчи или блокировки, кэшировать ее нельзя
+    if results and results.get("publications"):
+        _store_cached(_search_cache, key, results)
+
+def _details_extracted(details: Optional[Dict[str, Any]]) -> bool:
+    """Удалось ли извлечь со страницы публикации хоть одно поле"""
+    # Страница капчи или блокировки разбирается в значения по умолчанию
+    return bool(details and (details.get("doi") or details.get("keywords") or details.get("citation_count")))
+
+# Шаблоны демо-публикаций собираются один раз при импорте. В заголовке подставляется
+# {local_part}, None в списке авторов заменяется персонализированным автором, а к url
+# добавляется суффикс, зависящий от email
+_DEMO_PUBLICATIONS = (
+    {
+        "title": "Исследование методов машинного обучения в обработке данных ({local_part})",
+        "authors": (None, "Иванов П.С.", "Петров В.К."),
+        "source": "Журнал вычислительной математики и математической физики",
+        "year": "2023",
+        "abstract": "В данной работе рассматриваются современные методы машинного обучения...",
+        "url": "https://elibrary.ru/item.asp?id=123456",
+        "type": "article",
+        "relevance_score": 8.5
+    },
+    {
+        "title": "Анализ алгоритмов глубокого обучения для задач классификации",
+        "authors": (None, "Сидоров К.М."),
+        "source": "Известия высших учебных заведений. Приборостроение",
+        "year": "2022",
+        "abstract": "Статья посвящена сравнительному анализу различных архитектур нейронных сетей...",
+        "url": "https://elibrary.ru/item.asp?id=234567",
+        "type": "article",
+        "relevance_score": 7.8
+    },
+    {
+        "title": "Применение технологий искусственного интеллекта в медицине",
+        "authors": ("Козлов Д.В.", None, "Морозов С.П."),
+        "source": "Медицинская техника",
+        "year": "2023",
+        "abstract": "Обзор современных подходов к использованию ИИ в диагностике...",
+        "url": "https://elibrary.ru/item.asp?id=345678",
+        "type": "article",
+        "relevance_score": 7.2
+    },
+    {
+        "title": "Разработка системы автоматического анализа текстов на русском языке",
+        "authors": (None,),
+        "source": "Программирование",
+        "year": "2021",
+        "abstract": "Представлена система обработки естественного языка...",
+        "url": "https://elibrary.ru/item.asp?id=456789",
+        "type": "article",
+        "relevance_score": 6.9
+    },
+    {
+        "title": "Методы оптимизации в задачах больших данных",
+        "authors": ("Федоров М.А.", None, "Белов Н.К.", "Зайцев Р.Л."),
+        "source": "Прикладная математика и механика",
+        "year": "2022",
+        "abstract": "Исследуются эффективные алгоритмы обработки больших объемов данных...",
+        "url": "https://elibrary.ru/item.asp?id=567890",
+        "type": "article",
+        "relevance_score": 6.5
+    },
+    {
+        "title": "Конференция по информационным технологиям и искусственному интеллекту",
+        "authors": (None, "Орлов В.В."),
+        "source": "Материалы международной конференции ИТиИИ-2023",
+        "year": "2023",
+        "abstract": "Доклад представляет новые подходы к решению задач ИИ...",
+        "url": "https://elibrary.ru/item.asp?id=678901",
+        "type": "conference",
+        "relevance_score": 5.8
+    },
+)
+_DEMO_LIST_RU_PUBLICATION = {
+    "title": "Исследование российских научных баз данных",
+    "authors": (None, "Соколов П.И."),
+    "source": "Научно-техническая информация",
+    "year": "2023",
+    "abstract": "Анализ современного состояния российских научных ресурсов...",
+    "url": "https://elibrary.ru/item.asp?id=789012",
+    "type": "article",
+    "relevance_score": 6.2
+}
+
 class ElibraryService:
     """Сервис для поиска публикаций на elibrary.ru"""
     
     def __init__(self, demo_mode=False):
         self.base_url = "https://elibrary.ru"
         self.demo_mode = demo_mode
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.9',
-            'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'Cache-Control': 'no-cache',
-            'Pragma': 'no-cache',
-            'Sec-Fetch-Dest': 'document',
-            'Sec-Fetch-Mode': 'navigate',
-            'Sec-Fetch-Site': 'none',
-            'Sec-Fetch-User': '?1',
-            'Upgrade-Insecure-Requests': '1',
-        })
-        # Добавляем таймауты и retry логику
-        adapter = requests.adapters.HTTPAdapter(max_retries=3)
+        self.session = self._create_session()
+        # Общая сессия с keep-alive: повторные запросы не открывают новое TLS-соединение.
+        # Повторяем запрос с нарастающей паузой при сетевых сбоях и ответах 502/503/504
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=['GET', 'POST']
+        )
+        adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
         self.session.mount('http://', adapter)
         self.session.mount('https://', adapter)
         
+        # Время, раньше которого нельзя отправлять следующий запрос к elibrary.ru
+        self._throttle_lock = threading.Lock()
+        self._next_request_at = 0.0
+        
+        self._cookies_save_lock = threading.Lock()
+        
         if not self.demo_mode:
             self._initialize_session()
         else:
             logger.info("Инициализирован демо-режим elibrary сервиса")
     
+    def _create_session(self) -> requests.Session:
+        """HTTP-сессия: в рабочем режиме — с дисковым кэшем ответов и сохраняемыми cookies"""
+        if self.demo_mode:
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            return session
+        
+        if not ensure_private_dir(ELIBRARY_CACHE_DIR):
+            logger.warning("Дисковый кэш и cookies elibrary.ru отключены")
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            return session
+        
+        if requests_cache is not None:
+            session = requests_cache.CachedSession(
+                cache_name=os.path.join(ELIBRARY_CACHE_DIR, 'http_cache'),
+                backend='sqlite',
+                expire_after=HTTP_CACHE_EXPIRE_SECONDS,
+                # POST поиска не кэшируется на диске: ответ-капча или блокировка закрепилась бы
+                # на срок кэша, а успешные результаты уже хранит _search_cache. Пустые страницы
+                # публикаций удаляются из кэша после разбора (_drop_cached_response)
+                allowable_methods=('GET',)
+            )
+        else:
+            session = requests.Session()
+        session.headers.update(DEFAULT_HEADERS)
+        if requests_cache is not None:
+            # С no-cache в запросе кэш не отдал бы ни одного сохраненного ответа
+            del session.headers['Cache-Control'], session.headers['Pragma']
+        
+        # Просроченные cookies отбрасываются при загрузке, сессионные сохраняются вместе с остальными
+        cookies = LWPCookieJar(os.path.join(ELIBRARY_CACHE_DIR, 'cookies.txt'))
+        try:
+            cookies.load(ignore_discard=True)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Сохраненные cookies elibrary.ru не загружены: {e}")
+        session.cookies = cookies
+        return session
+    
     def _initialize_session(self):
         """Инициализация сессии с получением главной страницы"""
+        if self._session_restorable():
+            logger.info("Сессия elibrary.ru восстановлена из сохраненных cookies")
+            return
+        
+        # Главная страница запрашивается мимо HTTP-кэша: нужны свежие Set-Cookie
+        refresh = {'force_refresh': True} if requests_cache is not None and isinstance(
+            self.session, requests_cache.CachedSession) else {}
         try:
-            response = self.session.get(f"{self.base_url}/defaultx.asp")
+            response = self.session.get(f"{self.base_url}/defaultx.asp", **refresh)
             response.raise_for_status()
             logger.info("Сессия elibrary.ru успешно инициализирована")
         except requests.RequestException as e:
             logger.error(f"Ошибка инициализации сессии elibrary.ru: {e}")
+            return
+        
+        self._save_cookies()
+    
+    def _session_restorable(self) -> bool:
+        """Есть ли в сохраненных cookies еще живая сессия ASP"""
+        # Долгоживущие cookies (GUID и т.п.) о сессии ничего не говорят, решает cookie ASPSESSIONID*
+        # и возраст файла: срок сессии на сервере скользящий и в cookie не записан
+        cookies = self.session.cookies
+        if not isinstance(cookies, LWPCookieJar) or not cookies.filename:
+            return False
+        try:
+            saved_at = os.path.getmtime(cookies.filename)
+        except OSError:
+            return False
+        if time.time() - saved_at >= ELIBRARY_SESSION_TTL_SECONDS:
+            return False
+        return any(cookie.name.upper().startswith(_SESSION_COOKIE_PREFIX) for cookie in cookies)
+    
+    def _save_cookies(self):
+        """Сохранение cookies сессии на диск (если сессия с дисковым хранилищем)"""
+        cookies = self.session.cookies
+        if not isinstance(cookies, LWPCookieJar) or not cookies.filename:
+            return
+        try:
+            with self._cookies_save_lock:
+                cookies.save(ignore_discard=True)
+        except (OSError, RuntimeError) as e:
+            logger.warning(f"Не удалось сохранить cookies elibrary.ru: {e}")
+    
+    def _throttle(self):
+        """Ожидание своей очереди, чтобы запросы из разных потоков шли не чаще SEARCH_MIN_INTERVAL_SECONDS"""
+        with self._throttle_lock:
+            now = time.monotonic()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + SEARCH_MIN_INTERVAL_SECONDS
+        if wait > 0:
+            time.sleep(wait)
     
     def search_by_email(self, email: str, search_options: Optional[Dict] = None) -> Dict[str, Any]:
         """
@@ -70,42 +465,54 @@ class ElibraryService:
         if self.demo_mode:
             return self._generate_demo_data(email)
         
+        search_variants = self._search_variants(email)
+        
+        # Запросы независимы и ждут сеть, поэтому выполняем их параллельно;
+        # темп обращений к elibrary.ru ограничивает _throttle
+        variant_results = [None] * len(search_variants)
+        with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+            futures = {
+                executor.submit(self._perform_search, variant, search_options): index
+                for index, variant in enumerate(search_variants)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    variant_results[index] = future.result()
+                except Exception as e:
+                    logger.error(f"Ошибка поиска по варианту {search_variants[index]}: {e}")
+        
+        return self._merge_variant_results(email, variant_results)
+    
+    def _search_variants(self, email: str) -> List[str]:
+        """Варианты поискового запроса для email"""
         # Извлекаем части email для поиска
         local_part, domain = email.split("@", 1)
         
-        # Варианты поиска
-        search_variants = [
+        return [
             email,  # Полный email
             local_part,  # Только локальная часть
             domain,  # Только домен
             email.replace("@", " "),  # Email с пробелом вместо @
         ]
-        
+    
+    def _merge_variant_results(self, email: str, variant_results: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+        """Объединение результатов вариантов поиска без дубликатов"""
         all_results = {
             "email": email,
             "publications": [],
             "search_summary": {
                 "total_found": 0,
-                "search_variants_used": len(search_variants),
+                "search_variants_used": len(variant_results),
                 "successful_searches": 0
             }
         }
         
-        for variant in search_variants:
-            try:
-                logger.info(f"Поиск по варианту: {variant}")
-                results = self._perform_search(variant, search_options)
-                
-                if results and results.get("publications"):
-                    all_results["publications"].extend(results["publications"])
-                    all_results["search_summary"]["successful_searches"] += 1
-                    
-                # Задержка между запросами для соблюдения этики
-                time.sleep(2)
-                
-            except Exception as e:
-                logger.error(f"Ошибка поиска по варианту {variant}: {e}")
-                continue
+        # Собираем в исходном порядке вариантов, чтобы дубликаты разрешались как раньше
+        for results in variant_results:
+            if results and results.get("publications"):
+                all_results["publications"].extend(results["publications"])
+                all_results["search_summary"]["successful_searches"] += 1
         
         # Удаляем дубликаты
         all_results["publications"] = self._remove_duplicates(all_results["publications"])
@@ -124,6 +531,40 @@ class ElibraryService:
         Returns:
             Результаты поиска
         """
+        cache_key = _search_cache_key(query, search_options)
+        cached = _get_cached(_search_cache, cache_key)
+        if cached is not None:
+            logger.info(f"Результаты поиска взяты из кэша: {query}")
+            return cached
+        
+        try:
+            logger.info(f"Поиск по варианту: {query}")
+            self._throttle()
+            # Выполняем POST запрос к поисковой системе
+            response = self.session.post(
+                f"{self.base_url}/query_results.asp",
+                data=self._search_params(query, search_options),
+                timeout=REQUEST_TIMEOUT_SECONDS
+            )
+            response.raise_for_status()
+            # Set-Cookie из ответа поиска и новая отметка активности сессии переживают перезапуск
+            self._save_cookies()
+            
+            # Парсим байты ответа без промежуточного декодирования в str: gzip/deflate уже снят
+            # urllib3, а кодировку из заголовка (или из meta страницы) применяет сам lxml
+            results = self._parse_search_results(response.content, query, _header_charset(response.headers))
+            _store_search_results(cache_key, results)
+            return results
+            
+        except requests.RequestException as e:
+            logger.error(f"Ошибка HTTP запроса: {e}")
+            return {"error": str(e), "publications": []}
+        except Exception as e:
+            logger.error(f"Ошибка парсинга результатов: {e}")
+            return {"error": str(e), "publications": []}
+    
+    def _search_params(self, query: str, search_options: Optional[Dict] = None) -> Dict[str, str]:
+        """Параметры формы поиска elibrary.ru"""
         # Параметры поиска по умолчанию
         default_params = {
             'ftext': query,
@@ -145,50 +586,46 @@ class ElibraryService:
         if search_options:
             default_params.update(search_options)
         
-        try:
-            # Выполняем POST запрос к поисковой системе
-            response = self.session.post(
-                f"{self.base_url}/query_results.asp",
-                data=default_params,
-                timeout=30
-            )
-            response.raise_for_status()
-            
-            # Парсим результаты
-            return self._parse_search_results(response.text, query)
-            
-        except requests.RequestException as e:
-            logger.error(f"Ошибка HTTP запроса: {e}")
-            return {"error": str(e), "publications": []}
-        except Exception as e:
-            logger.error(f"Ошибка парсинга результатов: {e}")
-            return {"error": str(e), "publications": []}
+        return default_params
     
-    def _parse_search_results(self, html_content: str, query: str) -> Dict[str, Any]:
+    def _parse_search_results(self, html_content, query: str, encoding: Optional[str] = None) -> Dict[str, Any]:
         """
         Парсинг HTML результатов поиска
         
         Args:
-            html_content: HTML содержимое страницы результатов
+            html_content: HTML содержимое страницы результатов (str или bytes)
             query: Исходный поисковый запрос
+            encoding: Кодировка байтов из заголовков ответа, если известна
             
         Returns:
             Структурированные результаты
         """
-        soup = BeautifulSoup(html_content, 'html.parser')
         publications = []
+        if not html_content:
+            return {"query": query, "publications": publications, "total_found": 0}
+        
+        # lxml разбирает страницу в C и в разы быстрее BeautifulSoup
+        root = lxml.html.fromstring(
+            html_content, parser=_html_parser(encoding if isinstance(html_content, bytes) else None)
+        )
         
-        # Ищем блоки с результатами поиска
-        # На elibrary.ru результаты обычно в таблицах или div с определенными классами
-        result_blocks = soup.find_all(['tr', 'div'], class_=re.compile(r'(row|result|item)', re.I))
+        # Ищем блоки с результатами поиска: сначала строки известной таблицы результатов,
+        # и только без нее обходим все tr и div, проверяя их классы
+        result_blocks = _RESULT_ROWS_XPATH(root)
+        
+        if not result_blocks:
+            # На elibrary.ru результаты обычно в таблицах или div с определенными классами
+            result_blocks = _RESULT_BLOCKS_XPATH(root)
         
         if not result_blocks:
             # Альтернативный поиск структур
-            result_blocks = soup.find_all('table')
+            result_blocks = _TABLES_XPATH(root)
         
+        # Запрос в нижнем регистре нужен для оценки каждого блока — готовим его один раз на страницу
+        query_lower = query.lower()
         for block in result_blocks:
             try:
-                publication = self._extract_publication_data(block, query)
+                publication = self._extract_publication_data(block, query, query_lower)
                 if publication and publication.get('title'):
                     publications.append(publication)
             except Exception as e:
@@ -197,7 +634,7 @@ class ElibraryService:
         
         # Если стандартный парсинг не сработал, пробуем извлечь любые ссылки на публикации
         if not publications:
-            publications = self._fallback_parse(soup, query)
+            publications = self._fallback_parse(root, query)
         
         return {
             "query": query,
@@ -205,13 +642,14 @@ class ElibraryService:
             "total_found": len(publications)
         }
     
-    def _extract_publication_data(self, block, query: str) -> Optional[Dict[str, Any]]:
+    def _extract_publication_data(self, block, query: str, query_lower: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Извлечение данных о публикации из HTML блока
         
         Args:
             block: HTML элемент с данными публикации
             query: Поисковый запрос для контекста
+            query_lower: Запрос в нижнем регистре, если уже вычислен вызывающим кодом
             
         Returns:
             Словарь с данными публикации или None
@@ -229,81 +667,71 @@ class ElibraryService:
         }
         
         # Извлекаем заголовок
-        title_elem = block.find(['a', 'b', 'strong'], href=re.compile(r'item_id=\d+', re.I))
-        if not title_elem:
-            title_elem = block.find(['b', 'strong'])
-        if title_elem:
-            publication["title"] = title_elem.get_text(strip=True)
-            if title_elem.get('href'):
-                publication["url"] = self.base_url + title_elem['href'] if title_elem['href'].startswith('/') else title_elem['href']
-        
-        # Извлекаем авторов
-        author_patterns = [
-            r'Авторы?:\s*([^\.]+)',
-            r'Автор:\s*([^\.]+)',
-            r'([А-ЯЁ][а-яё]+\s+[А-ЯЁ]\.[А-ЯЁ]\.)',
-        ]
+        title_elem = next(
+            (elem for elem in _TITLE_LINKS_XPATH(block) if _ITEM_ID_RE.search(elem.get('href'))),
+            None
+        )
+        if title_elem is None:
+            bold = _FIRST_BOLD_XPATH(block)
+            title_elem = bold[0] if bold else None
+        if title_elem is not None:
+            publication["title"] = _stripped_text(title_elem)
+            href = title_elem.get('href')
+            if href:
+                publication["url"] = self.base_url + href if href.startswith('/') else href
         
-        text_content = block.get_text()
-        for pattern in author_patterns:
-            authors_match = re.search(pattern, text_content)
-            if authors_match:
-                authors_text = authors_match.group(1)
-                # Разделяем авторов по запятым или точкам с запятой
-                authors = [author.strip() for author in re.split('[,;]', authors_text)]
-                publication["authors"] = [auth for auth in authors if auth and len(auth) > 2]
-                break
+        # Первое вхождение каждого поля за один проход по тексту блока
+        text_content = block.text_content()
+        fields = {}
+        for match in _PUBLICATION_FIELDS_RE.finditer(text_content):
+            if match.lastgroup not in fields:
+                fields[match.lastgroup] = match.group(match.lastgroup)
         
-        # Извлекаем источник/журнал
-        source_patterns = [
-            r'Журнал:\s*([^\.]+)',
-            r'Источник:\s*([^\.]+)',
-            r'В книге:\s*([^\.]+)',
-        ]
+        # Извлекаем авторов: явная подпись важнее найденного в тексте ФИО
+        authors_text = fields.get("authors") or fields.get("fio")
+        if authors_text:
+            # Разделяем авторов по запятым или точкам с запятой
+            authors = [author.strip() for author in _SPLIT_AUTHORS_RE.split(authors_text)]
+            publication["authors"] = [auth for auth in authors if auth and len(auth) > 2]
         
-        for pattern in source_patterns:
-            source_match = re.search(pattern, text_content)
-            if source_match:
-                publication["source"] = source_match.group(1).strip()
-                break
+        # Извлекаем источник/журнал
+        source = fields.get("journal") or fields.get("source") or fields.get("book")
+        if source:
+            publication["source"] = source.strip()
         
         # Извлекаем год
-        year_match = re.search(r'(\d{4})', text_content)
-        if year_match:
-            publication["year"] = year_match.group(1)
+        if "year" in fields:
+            publication["year"] = fields["year"]
         
         # Извлекаем аннотацию (если есть)
-        abstract_elem = block.find(text=re.compile(r'(аннотация|abstract)', re.I))
-        if abstract_elem:
+        parent = _find_text_parents(block, _ABSTRACT_MARKERS).get('abstract')
+        if parent is not None:
             # Ищем текст после ключевого слова
-            parent = abstract_elem.parent
-            if parent:
-                abstract_text = parent.get_text()
-                abstract_start = abstract_text.lower().find('аннотация')
-                if abstract_start > -1:
-                    publication["abstract"] = abstract_text[abstract_start:abstract_start+200] + "..."
-        
-        # Определяем тип публикации
-        if 'диссертация' in text_content.lower():
-            publication["type"] = "dissertation"
-        elif 'конференция' in text_content.lower():
-            publication["type"] = "conference"
-        elif 'книга' in text_content.lower():
-            publication["type"] = "book"
-        else:
-            publication["type"] = "article"
+            abstract_text = parent.text_content()
+            abstract_start = abstract_text.lower().find('аннотация')
+            if abstract_start > -1:
+                publication["abstract"] = abstract_text[abstract_start:abstract_start+200] + "..."
+        
+        # Определяем тип публикации по тексту блока, приведенному к нижнему регистру один раз
+        text_lower = text_content.lower()
+        publication["type"] = next(
+            (pub_type for marker, pub_type in _TYPE_MARKERS if marker in text_lower),
+            "article"
+        )
         
         # Вычисляем релевантность
-        publication["relevance_score"] = self._calculate_relevance(publication, query)
+        publication["relevance_score"] = self._calculate_relevance(
+            publication, query, query_lower if query_lower is not None else query.lower()
+        )
         
         return publication if publication["title"] else None
     
-    def _fallback_parse(self, soup, query: str) -> List[Dict[str, Any]]:
+    def _fallback_parse(self, root, query: str) -> List[Dict[str, Any]]:
         """
         Резервный парсинг для извлечения любых найденных публикаций
         
         Args:
-            soup: BeautifulSoup объект
+            root: Корень дерева страницы (lxml.html)
             query: Поисковый запрос
             
         Returns:
@@ -312,13 +740,18 @@ class ElibraryService:
         publications = []
         
         # Ищем все ссылки, которые могут быть публикациями
-        links = soup.find_all('a', href=re.compile(r'item_id=\d+'))
+        links = [link for link in _ITEM_LINKS_XPATH(root) if _FALLBACK_ITEM_ID_RE.search(link.get('href'))]
+        
+        # Соседние ссылки часто лежат в одном родителе: его текст и год вычисляем один раз
+        parent_years = {}
         
         for link in links:
+            if len(publications) >= 20:
+                break
             try:
                 publication = {
-                    "title": link.get_text(strip=True),
-                    "url": self.base_url + link['href'] if link['href'].startswith('/') else link['href'],
+                    "title": _stripped_text(link),
+                    "url": self.base_url + link.get('href') if link.get('href').startswith('/') else link.get('href'),
                     "authors": [],
                     "source": "",
                     "year": "",
@@ -329,14 +762,14 @@ class ElibraryService:
                 }
                 
                 # Пытаемся извлечь дополнительную информацию из окружающего контекста
-                parent = link.parent
-                if parent:
-                    parent_text = parent.get_text()
-                    
-                    # Извлекаем год из контекста
-                    year_match = re.search(r'(\d{4})', parent_text)
-                    if year_match:
-                        publication["year"] = year_match.group(1)
+                parent = link.getparent()
+                if parent is not None:
+                    year = parent_years.get(parent)
+                    if year is None:
+                        # Извлекаем год из контекста
+                        year_match = _YEAR_RE.search(parent.text_content())
+                        year = parent_years[parent] = year_match.group(1) if year_match else ""
+                    publication["year"] = year
                 
                 if publication["title"] and len(publication["title"]) > 10:
                     publications.append(publication)
@@ -347,29 +780,29 @@ class ElibraryService:
         
         return publications[:20]  # Ограничиваем количество результатов
     
-    def _calculate_relevance(self, publication: Dict[str, Any], query: str) -> float:
+    def _calculate_relevance(self, publication: Dict[str, Any], query: str, query_lower: Optional[str] = None) -> float:
         """
         Вычисление релевантности публикации к поисковому запросу
         
         Args:
             publication: Данные публикации
             query: Поисковый запрос
+            query_lower: Запрос в нижнем регистре, если уже вычислен вызывающим кодом
             
         Returns:
             Оценка релевантности от 0 до 10
         """
         score = 0.0
-        query_lower = query.lower()
+        if query_lower is None:
+            query_lower = query.lower()
         
         # Проверяем наличие запроса в заголовке
         if query_lower in publication.get("title", "").lower():
             score += 3.0
         
         # Проверяем наличие в авторах
-        for author in publication.get("authors", []):
-            if query_lower in author.lower():
-                score += 2.0
-                break
+        if any(query_lower in author.lower() for author in publication.get("authors", ())):
+            score += 2.0
         
         # Проверяем наличие в источнике
         if query_lower in publication.get("source", "").lower():
@@ -379,15 +812,14 @@ class ElibraryService:
         if query_lower in publication.get("abstract", "").lower():
             score += 1.5
         
-        # Бонус за недавние публикации
-        try:
-            year = int(publication.get("year", "0"))
+        # Бонус за недавние публикации; год из разбора страницы — только цифры или пустая строка
+        year = publication.get("year", "")
+        if year.isdigit():
+            year = int(year)
             if year >= 2020:
                 score += 1.0
             elif year >= 2015:
                 score += 0.5
-        except ValueError:
-            pass
         
         return min(score, 10.0)  # Максимальная оценка 10
     
@@ -401,16 +833,26 @@ class ElibraryService:
         Returns:
             Список уникальных публикаций
         """
+        # Дубликат — публикация с уже встреченным item_id или тем же заголовком
+        # с точностью до регистра и пробелов; остается первая по порядку вариантов
+        seen_item_ids = set()
         seen_titles = set()
         unique_publications = []
         
         for pub in publications:
-            title = pub.get("title", "").strip().lower()
-            if title and title not in seen_titles:
-                seen_titles.add(title)
-                unique_publications.append(pub)
+            title = _WHITESPACE_RE.sub(" ", pub.get("title", "")).strip().lower()
+            if not title or title in seen_titles:
+                continue
+            item_id_match = _ITEM_ID_RE.search(pub.get("url", ""))
+            item_id = item_id_match.group(1) if item_id_match else None
+            if item_id is not None:
+                if item_id in seen_item_ids:
+                    continue
+                seen_item_ids.add(item_id)
+            seen_titles.add(title)
+            unique_publications.append(pub)
         
-        # Сортируем по релевантности
+        # Сортируем по релевантности; список почти упорядочен, и Timsort проходит его быстро
         unique_publications.sort(key=lambda x: x.get("relevance_score", 0), reverse=True)
         
         return unique_publications
@@ -425,53 +867,80 @@ class ElibraryService:
         Returns:
             Детальная информация о публикации
         """
+        cached = _get_cached(_details_cache, publication_url)
+        if cached is not None:
+            return cached
+        
         try:
-            response = self.session.get(publication_url, timeout=30)
+            response = self.session.get(publication_url, timeout=REQUEST_TIMEOUT_SECONDS)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            details = {
-                "full_text_available": False,
-                "doi": "",
-                "keywords": [],
-                "citation_count": 0,
-                "full_abstract": "",
-                "references": []
-            }
-            
-            # Ищем DOI
-            doi_elem = soup.find(text=re.compile(r'DOI:', re.I))
-            if doi_elem:
-                doi_text = doi_elem.parent.get_text() if doi_elem.parent else ""
-                doi_match = re.search(r'DOI:\s*([\d\.\/\w-]+)', doi_text)
-                if doi_match:
-                    details["doi"] = doi_match.group(1)
-            
-            # Ищем ключевые слова
-            keywords_elem = soup.find(text=re.compile(r'ключевые слова', re.I))
-            if keywords_elem:
-                keywords_text = keywords_elem.parent.get_text() if keywords_elem.parent else ""
-                # Извлекаем ключевые слова после "Ключевые слова:"
-                keywords_match = re.search(r'ключевые слова[:\s]*([^\.]+)', keywords_text, re.I)
-                if keywords_match:
-                    keywords = [kw.strip() for kw in keywords_match.group(1).split(',')]
-                    details["keywords"] = [kw for kw in keywords if kw]
-            
-            # Ищем количество цитирований
-            citations_elem = soup.find(text=re.compile(r'цитирован', re.I))
-            if citations_elem:
-                citations_text = citations_elem.parent.get_text() if citations_elem.parent else ""
-                citations_match = re.search(r'(\d+)', citations_text)
-                if citations_match:
-                    details["citation_count"] = int(citations_match.group(1))
-            
+            details = self._parse_publication_details(response.content, _header_charset(response.headers))
+            if _details_extracted(details):
+                _store_cached(_details_cache, publication_url, details)
+            else:
+                self._drop_cached_response(response)
             return details
             
         except Exception as e:
             logger.error(f"Ошибка получения деталей публикации: {e}")
             return None
     
+    def _drop_cached_response(self, response: requests.Response):
+        """Удаление ответа из дискового HTTP-кэша, если при разборе он оказался пустым"""
+        if requests_cache is None or not isinstance(self.session, requests_cache.CachedSession):
+            return
+        try:
+            self.session.cache.delete(requests=[response.request])
+        except Exception as e:
+            logger.warning(f"Не удалось удалить ответ из HTTP-кэша elibrary.ru: {e}")
+    
+    def _parse_publication_details(self, html_content, encoding: Optional[str] = None) -> Dict[str, Any]:
+        """Разбор страницы публикации: DOI, ключевые слова и число цитирований"""
+        root = lxml.html.fromstring(
+            html_content, parser=_html_parser(encoding if isinstance(html_content, bytes) else None)
+        )
+        
+        details = {
+            "full_text_available": False,
+            "doi": "",
+            "keywords": [],
+            "citation_count": 0,
+            "full_abstract": "",
+            "references": []
+        }
+        
+        # Подписи DOI, ключевых слов и цитирований находим за один проход по тексту страницы
+        labels = _find_text_parents(root, _DETAILS_MARKERS)
+        
+        # Ищем DOI
+        doi_elem = labels.get('doi')
+        if doi_elem is not None:
+            doi_text = doi_elem.text_content()
+            doi_match = _DOI_RE.search(doi_text)
+            if doi_match:
+                details["doi"] = doi_match.group(1)
+        
+        # Ищем ключевые слова
+        keywords_elem = labels.get('keywords')
+        if keywords_elem is not None:
+            keywords_text = keywords_elem.text_content()
+            # Извлекаем ключевые слова после "Ключевые слова:"
+            keywords_match = _KEYWORDS_RE.search(keywords_text)
+            if keywords_match:
+                keywords = [kw.strip() for kw in keywords_match.group(1).split(',')]
+                details["keywords"] = [kw for kw in keywords if kw]
+        
+        # Ищем количество цитирований
+        citations_elem = labels.get('citations')
+        if citations_elem is not None:
+            citations_text = citations_elem.text_content()
+            citations_match = _NUMBER_RE.search(citations_text)
+            if citations_match:
+                details["citation_count"] = int(citations_match.group(1))
+        
+        return details
+    
     def format_results_for_visualization(self, search_results: Dict[str, Any]) -> Dict[str, Any]:
         """
         Форматирование результатов для визуализации в разделе публикаций
@@ -484,48 +953,34 @@ class ElibraryService:
         """
         publications = search_results.get("publications", [])
         
-        # Статистика по годам
-        years_stats = {}
-        for pub in publications:
-            year = pub.get("year", "Unknown")
-            years_stats[year] = years_stats.get(year, 0) + 1
-        
-        # Статистика по типам
-        types_stats = {}
-        for pub in publications:
-            pub_type = pub.get("type", "unknown")
-            types_stats[pub_type] = types_stats.get(pub_type, 0) + 1
+        # Статистика по годам, типам и авторам: Counter, построенный из итератора, считает
+        # элементы в C, что заметно быстрее поэлементного += в цикле на Python
+        years_stats = Counter(pub.get("year", "Unknown") for pub in publications)
+        types_stats = Counter(pub.get("type", "unknown") for pub in publications)
+        authors_stats = Counter(chain.from_iterable(pub.get("authors", ()) for pub in publications))
         
         # Топ авторов
-        all_authors = []
-        for pub in publications:
-            all_authors.extend(pub.get("authors", []))
-        
-        authors_stats = {}
-        for author in all_authors:
-            authors_stats[author] = authors_stats.get(author, 0) + 1
-        
-        top_authors = sorted(authors_stats.items(), key=lambda x: x[1], reverse=True)[:10]
+        top_authors = authors_stats.most_common(10)
         
-        # Сортируем публикации по релевантности
-        sorted_publications = sorted(publications, key=lambda x: x.get("relevance_score", 0), reverse=True)
+        # Самые релевантные публикации: частичная выборка вместо сортировки всего списка
+        top_publications = heapq.nlargest(50, publications, key=lambda x: x.get("relevance_score", 0))
         
         return {
             "email": search_results.get("email", ""),
             "summary": {
                 "total_publications": len(publications),
                 "years_range": f"{min(years_stats.keys(), default='N/A')} - {max(years_stats.keys(), default='N/A')}",
-                "most_productive_year": max(years_stats.items(), key=lambda x: x[1])[0] if years_stats else "N/A",
-                "primary_type": max(types_stats.items(), key=lambda x: x[1])[0] if types_stats else "N/A"
+                "most_productive_year": years_stats.most_common(1)[0][0] if years_stats else "N/A",
+                "primary_type": types_stats.most_common(1)[0][0] if types_stats else "N/A"
             },
             "statistics": {
-                "by_year": years_stats,
-                "by_type": types_stats,
+                "by_year": dict(years_stats),
+                "by_type": dict(types_stats),
                 "top_authors": dict(top_authors)
             },
-            "publications": sorted_publications[:50],  # Ограничиваем для визуализации
+            "publications": top_publications,  # Ограничиваем для визуализации
             "search_info": search_results.get("search_summary", {}),
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+            "timestamp": _current_timestamp()
         }
     
     def _generate_demo_data(self, email: str) -> Dict[str, Any]:
@@ -543,90 +998,26 @@ class ElibraryService:
         # Получаем локальную часть email для персонализации
         local_part = email.split("@")[0] if "@" in email else email
         
-        # Базовые демо-публикации
+        # Персонализация вычисляется один раз, а не для каждой публикации
+        author = f"{local_part.capitalize()} А.И."
+        url_suffix = hash(email) % 1000
+        
+        templates = _DEMO_PUBLICATIONS
+        # Добавляем вариативность в зависимости от email
+        if "list.ru" in email:
+            templates += (_DEMO_LIST_RU_PUBLICATION,)
+        
         demo_publications = [
             {
-                "title": f"Исследование методов машинного обучения в обработке данных ({local_part})",
-                "authors": [f"{local_part.capitalize()} А.И.", "Иванов П.С.", "Петров В.К."],
-                "source": "Журнал вычислительной математики и математической физики",
-                "year": "2023",
-                "abstract": "В данной работе рассматриваются современные методы машинного обучения...",
-                "url": f"https://elibrary.ru/item.asp?id=123456{hash(email) % 1000}",
-                "type": "article",
-                "relevance_score": 8.5,
-                "search_context": email
-            },
-            {
-                "title": f"Анализ алгоритмов глубокого обучения для задач классификации",
-                "authors": [f"{local_part.capitalize()} А.И.", "Сидоров К.М."],
-                "source": "Известия высших учебных заведений. Приборостроение",
-                "year": "2022",
-                "abstract": "Статья посвящена сравнительному анализу различных архитектур нейронных сетей...",
-                "url": f"https://elibrary.ru/item.asp?id=234567{hash(email) % 1000}",
-                "type": "article",
-                "relevance_score": 7.8,
-                "search_context": email
-            },
-            {
-                "title": f"Применение технологий искусственного интеллекта в медицине",
-                "authors": ["Козлов Д.В.", f"{local_part.capitalize()} А.И.", "Морозов С.П."],
-                "source": "Медицинская техника",
-                "year": "2023",
-                "abstract": "Обзор современных подходов к использованию ИИ в диагностике...",
-                "url": f"https://elibrary.ru/item.asp?id=345678{hash(email) % 1000}",
-                "type": "article",
-                "relevance_score": 7.2,
-                "search_context": email
-            },
-            {
-                "title": f"Разработка системы автоматического анализа текстов на русском языке",
-                "authors": [f"{local_part.capitalize()} А.И."],
-                "source": "Программирование",
-                "year": "2021",
-                "abstract": "Представлена система обработки естественного языка...",
-                "url": f"https://elibrary.ru/item.asp?id=456789{hash(email) % 1000}",
-                "type": "article",
-                "relevance_score": 6.9,
-                "search_context": email
-            },
-            {
-                "title": f"Методы оптимизации в задачах больших данных",
-                "authors": ["Федоров М.А.", f"{local_part.capitalize()} А.И.", "Белов Н.К.", "Зайцев Р.Л."],
-                "source": "Прикладная математика и механика",
-                "year": "2022",
-                "abstract": "Исследуются эффективные алгоритмы обработки больших объемов данных...",
-                "url": f"https://elibrary.ru/item.asp?id=567890{hash(email) % 1000}",
-                "type": "article",
-                "relevance_score": 6.5,
-                "search_context": email
-            },
-            {
-                "title": f"Конференция по информационным технологиям и искусственному интеллекту",
-                "authors": [f"{local_part.capitalize()} А.И.", "Орлов В.В."],
-                "source": "Материалы международной конференции ИТиИИ-2023",
-                "year": "2023",
-                "abstract": "Доклад представляет новые подходы к решению задач ИИ...",
-                "url": f"https://elibrary.ru/item.asp?id=678901{hash(email) % 1000}",
-                "type": "conference",
-                "relevance_score": 5.8,
+                **template,
+                "title": template["title"].format(local_part=local_part),
+                "authors": [author if name is None else name for name in template["authors"]],
+                "url": f"{template['url']}{url_suffix}",
                 "search_context": email
             }
+            for template in templates
         ]
         
-        # Добавляем вариативность в зависимости от email
-        if "list.ru" in email:
-            demo_publications.append({
-                "title": "Исследование российских научных баз данных",
-                "authors": [f"{local_part.capitalize()} А.И.", "Соколов П.И."],
-                "source": "Научно-техническая информация",
-                "year": "2023",
-                "abstract": "Анализ современного состояния российских научных ресурсов...",
-                "url": f"https://elibrary.ru/item.asp?id=789012{hash(email) % 1000}",
-                "type": "article",
-                "relevance_score": 6.2,
-                "search_context": email
-            })
-        
         return {
             "email": email,
             "publications": demo_publications,
@@ -636,3 +1027,173 @@ class ElibraryService:
                 "successful_searches": 3
             }
         }
+
+
+class AsyncElibraryService(ElibraryService):
+    """Асинхронный сервис поиска на aiohttp: один event loop обслуживает поиск по многим email"""
+    
+    def __init__(self, demo_mode=False):
+        if aiohttp is None:
+            raise ImportError("Для AsyncElibraryService требуется пакет aiohttp")
+        self.base_url = "https://elibrary.ru"
+        self.demo_mode = demo_mode
+        # ClientSession и семафор привязаны к event loop, поэтому создаются при первом запросе
+        self.session = None
+        self._semaphore = None
+        self._session_ready = None
+        self._next_request_at = 0.0
+        
+        if self.demo_mode:
+            logger.info("Инициализирован демо-режим асинхронного elibrary сервиса")
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    async def _get_session(self):
+        """Общая ClientSession с ограниченным пулом keep-alive соединений"""
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                headers=DEFAULT_HEADERS,
+                connector=aiohttp.TCPConnector(
+                    limit=ASYNC_CONNECTION_LIMIT,
+                    limit_per_host=ASYNC_CONNECTION_LIMIT_PER_HOST
+                ),
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT_SECONDS)
+            )
+            self._semaphore = asyncio.Semaphore(ASYNC_CONCURRENT_REQUESTS)
+            # Все корутины (в том числе параллельные варианты из gather) ждут одну задачу
+            # инициализации и не отправляют POST до получения cookies главной страницы
+            self._session_ready = asyncio.ensure_future(self._initialize_session())
+        # shield: отмена одного ожидающего не должна отменять инициализацию для остальных
+        await asyncio.shield(self._session_ready)
+        return self.session
+    
+    async def _initialize_session(self):
+        """Инициализация сессии с получением главной страницы"""
+        try:
+            async with self.session.get(f"{self.base_url}/defaultx.asp") as response:
+                response.raise_for_status()
+            logger.info("Сессия elibrary.ru успешно инициализирована")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Ошибка инициализации сессии elibrary.ru: {e}")
+    
+    async def close(self):
+        """Закрытие ClientSession"""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+    
+    async def _throttle(self):
+        """Ожидание своей очереди, чтобы запросы шли не чаще SEARCH_MIN_INTERVAL_SECONDS"""
+        # Между чтением и записью нет await, поэтому блокировка в рамках одного loop не нужна
+        now = time.monotonic()
+        wait = self._next_request_at - now
+        self._next_request_at = max(now, self._next_request_at) + SEARCH_MIN_INTERVAL_SECONDS
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    async def search_by_email(self, email: str, search_options: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        Асинхронный поиск публикаций по email адресу
+        
+        Args:
+            email: Email адрес для поиска
+            search_options: Дополнительные опции поиска
+            
+        Returns:
+            Словарь с результатами поиска
+        """
+        if not email or "@" not in email:
+            return {"error": "Некорректный email адрес", "publications": []}
+        
+        # Если включен демо-режим, возвращаем тестовые данные
+        if self.demo_mode:
+            return self._generate_demo_data(email)
+        
+        search_variants = self._search_variants(email)
+        variant_results = await asyncio.gather(
+            *(self._perform_search(variant, search_options) for variant in search_variants),
+            return_exceptions=True
+        )
+        
+        for variant, results in zip(search_variants, variant_results):
+            if isinstance(results, Exception):
+                logger.error(f"Ошибка поиска по варианту {variant}: {results}")
+        
+        return self._merge_variant_results(
+            email,
+            [None if isinstance(results, Exception) else results for results in variant_results]
+        )
+    
+    async def _perform_search(self, query: str, search_options: Optional[Dict] = None) -> Dict[str, Any]:
+        """
+        Асинхронное выполнение поиска на elibrary.ru
+        
+        Args:
+            query: Поисковый запрос
+            search_options: Опции поиска
+            
+        Returns:
+            Результаты поиска
+        """
+        cache_key = _search_cache_key(query, search_options)
+        cached = _get_cached(_search_cache, cache_key)
+        if cached is not None:
+            logger.info(f"Результаты поиска взяты из кэша: {query}")
+            return cached
+        
+        try:
+            session = await self._get_session()
+            async with self._semaphore:
+                logger.info(f"Поиск по варианту: {query}")
+                await self._throttle()
+                async with session.post(
+                    f"{self.base_url}/query_results.asp",
+                    data=self._search_params(query, search_options)
+                ) as response:
+                    response.raise_for_status()
+                    # aiohttp декодирует по charset из заголовков, а без него определяет кодировку сам
+                    html_content = await response.text()
+            
+            results = self._parse_search_results(html_content, query)
+            _store_search_results(cache_key, results)
+            return results
+            
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.error(f"Ошибка HTTP запроса: {e}")
+            return {"error": str(e), "publications": []}
+        except Exception as e:
+            logger.error(f"Ошибка парсинга результатов: {e}")
+            return {"error": str(e), "publications": []}
+    
+    async def get_publication_details(self, publication_url: str) -> Optional[Dict[str, Any]]:
+        """
+        Асинхронное получение детальной информации о публикации
+        
+        Args:
+            publication_url: URL публикации
+            
+        Returns:
+            Детальная информация о публикации
+        """
+        cached = _get_cached(_details_cache, publication_url)
+        if cached is not None:
+            return cached
+        
+        try:
+            session = await self._get_session()
+            async with self._semaphore:
+                async with session.get(publication_url) as response:
+                    response.raise_for_status()
+                    html_content = await response.text()
+            
+            details = self._parse_publication_details(html_content)
+            if _details_extracted(details):
+                _store_cached(_details_cache, publication_url, details)
+            return details
+            
+        except Exception as e:
+            logger.error(f"Ошибка получения деталей публикации: {e}")
+            return None
@@ -14,16 +14,35 @@ import numpy as np
 from datetime import datetime
 from enum import Enum
 
-# Для Fuzzy Matching
+# Для Fuzzy Matching: RapidFuzz (C++) предпочтительнее, fuzzywuzzy — запасной вариант
 try:
-    from fuzzywuzzy import fuzz, process
-    FUZZYWUZZY_AVAILABLE = True
+    from rapidfuzz import fuzz, process
+    from rapidfuzz.utils import default_process
+    RAPIDFUZZ_AVAILABLE = True
 except ImportError:
-    FUZZYWUZZY_AVAILABLE = False
-    logging.warning("fuzzywuzzy не установлен. Используется встроенный алгоритм similarity.")
+    RAPIDFUZZ_AVAILABLE = False
+
+FUZZYWUZZY_AVAILABLE = False
+if not RAPIDFUZZ_AVAILABLE:
+    try:
+        from fuzzywuzzy import fuzz, process
+        FUZZYWUZZY_AVAILABLE = True
+    except ImportError:
+        logging.warning("rapidfuzz и fuzzywuzzy не установлены. Используется встроенный алгоритм similarity.")
+
+FUZZY_AVAILABLE = RAPIDFUZZ_AVAILABLE or FUZZYWUZZY_AVAILABLE
 
 logger = logging.getLogger(__name__)
 
+# С этого числа точек матрица сходства считается во всех ядрах; на малых n запуск потоков дороже расчета
+CDIST_PARALLEL_MIN_POINTS = 500
+
+_WORD_RE = re.compile(r'\w+')
+
+def _normalize_for_matching(value: str) -> str:
+    """Ключ для fuzzy matching: слова в нижнем регистре без пунктуации, отсортированные по алфавиту"""
+    return " ".join(sorted(_WORD_RE.findall(value.lower())))
+
 class SourceAuthority(Enum):
     """Уровень авторитетности источника"""
     HIGH = "high"  # Официальные сайты, научные публикации
@@ -83,6 +102,11 @@ class DataPoint:
     url: str = ""
     timestamp: datetime = field(default_factory=datetime.now)
     version: int = 1
+    value_norm: str = ""  # Ключ сравнения при кластеризации, вычисляется один раз при создании
+    
+    def __post_init__(self):
+        if not self.value_norm:
+            self.value_norm = self.value
     
     @property
     def confidence(self) -> float:
@@ -142,6 +166,9 @@ class EnhancedParserVerifier:
             'names': {
                 'min_sources': 2,  # Минимум источников для верификации
                 'fuzzy_threshold': 90,
+                # value_norm уже упорядочен по словам; частичное совпадение (WRatio) склеило бы
+                # "Иван" с любым полным именем, где он встречается
+                'scorer': 'ratio',
                 'weight_by_source': {
                     'title': 1.0,
                     'meta': 0.9,
@@ -153,6 +180,7 @@ class EnhancedParserVerifier:
             'emails': {
                 'min_sources': 1,
                 'fuzzy_threshold': 95,  # Высокий порог для email
+                'scorer': 'ratio',
                 'weight_by_source': {
                     'meta': 1.0,
                     'content': 0.8,
@@ -162,6 +190,7 @@ class EnhancedParserVerifier:
             'organizations': {
                 'min_sources': 2,
                 'fuzzy_threshold': 85,
+                'scorer': 'token_set_ratio',  # "MIT" и "Massachusetts Institute of Technology, MIT"
                 'weight_by_source': {
                     'title': 0.9,
                     'meta': 1.0,
@@ -173,6 +202,7 @@ class EnhancedParserVerifier:
             'positions': {
                 'min_sources': 1,
                 'fuzzy_threshold': 80,
+                'scorer': 'ratio',
                 'weight_by_source': {
                     'title': 0.8,
                     'meta': 0.9,
@@ -232,9 +262,11 @@ class EnhancedParserVerifier:
                 if self._is_valid_name(name):
                     confidence = self._calculate_name_confidence(name, result, target_email)
                     source_type = self._determine_source_type(name, result)
+                    normalized = self._normalize_name(name)
                     
                     grouped_data['names'].append(DataPoint(
-                        value=self._normalize_name(name),
+                        value=normalized,
+                        value_norm=_normalize_for_matching(normalized),
                         confidence_components=ConfidenceComponents(
                             source_confidence=confidence,
                             context_confidence=0.5,
@@ -273,9 +305,11 @@ class EnhancedParserVerifier:
                 if self._is_valid_organization(org):
                     confidence = self._calculate_org_confidence(org, result)
                     source_type = self._determine_source_type(org, result)
+                    normalized = self._normalize_organization(org)
                     
                     grouped_data['organizations'].append(DataPoint(
-                        value=self._normalize_organization(org),
+                        value=normalized,
+                        value_norm=_normalize_for_matching(normalized),
                         confidence_components=ConfidenceComponents(
                             source_confidence=confidence,
                             context_confidence=0.5,
@@ -294,9 +328,11 @@ class EnhancedParserVerifier:
                 if self._is_valid_position(position):
                     confidence = self._calculate_position_confidence(position, result)
                     source_type = self._determine_source_type(position, result)
+                    normalized = self._normalize_position(position)
                     
                     grouped_data['positions'].append(DataPoint(
-                        value=self._normalize_position(position),
+                        value=normalized,
+                        value_norm=_normalize_for_matching(normalized),
                         confidence_components=ConfidenceComponents(
                             source_confidence=confidence,
                             context_confidence=0.5,
@@ -319,7 +355,9 @@ class EnhancedParserVerifier:
         rules = self.verification_rules.get(data_type, {})
         
         # Группируем похожие значения с помощью fuzzy matching
-        clustered_data = self._cluster_similar_values(data_points, rules.get('fuzzy_threshold', 85))
+        clustered_data = self._cluster_similar_values(
+            data_points, rules.get('fuzzy_threshold', 85), rules.get('scorer', 'ratio')
+        )
         
         # Находим наиболее достоверный кластер
         best_cluster = self._select_best_cluster(clustered_data, rules)
@@ -352,11 +390,25 @@ class EnhancedParserVerifier:
             verification_method="fuzzy_clustering"
         )
 
-    def _cluster_similar_values(self, data_points: List[DataPoint], threshold: float) -> List[List[DataPoint]]:
+    def _cluster_similar_values(self, data_points: List[DataPoint], threshold: float,
+                                scorer: str = 'ratio') -> List[List[DataPoint]]:
         """Кластеризует похожие значения с помощью fuzzy matching"""
         if not data_points:
             return []
         
+        if RAPIDFUZZ_AVAILABLE:
+            clusters = self._cluster_by_similarity_matrix(data_points, threshold, scorer)
+        else:
+            clusters = self._cluster_pairwise(data_points, threshold, scorer)
+        
+        # Сортируем кластеры по размеру и средней уверенности
+        clusters.sort(key=lambda c: (len(c), np.mean([dp.confidence for dp in c])), reverse=True)
+        
+        return clusters
+
+    def _cluster_pairwise(self, data_points: List[DataPoint], threshold: float,
+                          scorer: str = 'ratio') -> List[List[DataPoint]]:
+        """Жадная кластеризация с попарным сравнением значений (без RapidFuzz)"""
         clusters = []
         used_indices = set()
         
@@ -373,22 +425,47 @@ class EnhancedParserVerifier:
                 if j in used_indices:
                     continue
                 
-                similarity = self._calculate_similarity(dp.value, other_dp.value)
+                similarity = self._calculate_similarity(dp.value_norm, other_dp.value_norm, scorer)
                 if similarity >= threshold:
                     cluster.append(other_dp)
                     used_indices.add(j)
             
             clusters.append(cluster)
         
-        # Сортируем кластеры по размеру и средней уверенности
-        clusters.sort(key=lambda c: (len(c), np.mean([dp.confidence for dp in c])), reverse=True)
+        return clusters
+
+    def _cluster_by_similarity_matrix(self, data_points: List[DataPoint], threshold: float,
+                                      scorer: str = 'ratio') -> List[List[DataPoint]]:
+        """
+        Жадная кластеризация по матрице попарного сходства, посчитанной одним вызовом cdist
+        
+        Порядок обхода тот же, что в скалярном варианте: очередная свободная точка открывает
+        кластер и забирает все еще свободные точки со сходством не ниже порога
+        """
+        values = [dp.value_norm for dp in data_points]
+        similarity = process.cdist(
+            values, values, scorer=getattr(fuzz, scorer, fuzz.ratio),
+            workers=-1 if len(values) >= CDIST_PARALLEL_MIN_POINTS else 1
+        )
+        
+        clusters = []
+        used = np.zeros(len(data_points), dtype=bool)
+        for i in range(len(data_points)):
+            if used[i]:
+                continue
+            mask = similarity[i] >= threshold
+            mask &= ~used
+            mask[i] = True
+            members = np.flatnonzero(mask)
+            used[members] = True
+            clusters.append([data_points[j] for j in members])
         
         return clusters
 
-    def _calculate_similarity(self, value1: str, value2: str) -> float:
-        """Вычисляет сходство между двумя строками"""
-        if FUZZYWUZZY_AVAILABLE:
-            return fuzz.ratio(value1, value2)
+    def _calculate_similarity(self, value1: str, value2: str, scorer: str = 'ratio') -> float:
+        """Вычисляет сходство между двумя строками; scorer — имя функции из модуля fuzz"""
+        if FUZZY_AVAILABLE:
+            return getattr(fuzz, scorer, fuzz.ratio)(value1, value2)
         else:
             # Встроенный алгоритм как fallback
             return SequenceMatcher(None, value1, value2).ratio() * 100
@@ -559,15 +636,21 @@ class EnhancedParserVerifier:
                 }
         
         # Проверяем fuzzy matching
-        if FUZZYWUZZY_AVAILABLE:
+        best_match = None
+        if RAPIDFUZZ_AVAILABLE:
+            # Тот же scorer и препроцессинг, что у fuzzywuzzy по умолчанию; отсечение — внутри C++ цикла
+            best_match = process.extractOne(
+                email_local, patterns, scorer=fuzz.WRatio, processor=default_process, score_cutoff=60
+            )
+        elif FUZZYWUZZY_AVAILABLE:
             best_match = process.extractOne(email_local, patterns)
-            if best_match and best_match[1] > 60:
-                return {
-                    'is_consistent': True,
-                    'pattern': best_match[0],
-                    'similarity': best_match[1],
-                    'method': 'fuzzy_matching'
-                }
+        if best_match and best_match[1] > 60:
+            return {
+                'is_consistent': True,
+                'pattern': best_match[0],
+                'similarity': best_match[1],
+                'method': 'fuzzy_matching'
+            }
         
         return {'is_consistent': False, 'reason': 'no_pattern_match'}
 
@@ -1043,7 +1126,7 @@ class EnhancedParserVerifier:
                         total_bonus += 0.15
                         matches_found += 1
                         break
-                    elif FUZZYWUZZY_AVAILABLE and fuzz.partial_ratio(variant, email_local) > 85:
+                    elif FUZZY_AVAILABLE and fuzz.partial_ratio(variant, email_local) > 85:
                         total_bonus += 0.1
                         matches_found += 1
                         break
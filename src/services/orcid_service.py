@@ -8,6 +8,8 @@ import re
 
 logger = logging.getLogger(__name__)
 
+HTTP_POOL_SIZE = 16
+
 class ORCIDService:
     """Сервис для работы с ORCID API"""
     
@@ -18,14 +20,25 @@ class ORCIDService:
         self.base_url = 'https://pub.orcid.org/v3.0'
         self.search_url = 'https://pub.orcid.org/v3.0/search'
         
+        # Общая сессия с keep-alive: повторные запросы не открывают новое TLS-соединение.
+        # Размер пула соответствует числу потоков, параллельно обращающихся к API
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=HTTP_POOL_SIZE)
+        self.session.mount('https://', adapter)
+        
         if not self.client_id:
             logger.warning("ORCID_CLIENT_ID не найден в переменных окружения")
     
-    def search_by_email(self, email: str) -> List[Dict[str, Any]]:
-        """Поиск исследователей по email адресу и их именам"""
+    def search_by_email(self, email: str, raise_errors: bool = False) -> List[Dict[str, Any]]:
+        """
+        Поиск исследователей по email адресу и их именам
+        
+        С raise_errors=True сбои поиска по email пробрасываются исключением,
+        и пустой список означает только, что ORCID никого не нашел
+        """
         try:
             # Поиск ORCID ID по email
-            orcid_ids = self.search_orcid_by_email(email)
+            orcid_ids = self.search_orcid_by_email(email, raise_errors=raise_errors)
             if not orcid_ids:
                 orcid_ids = []
             
@@ -58,14 +71,20 @@ class ORCIDService:
                     additional_info['found_by'] = 'name_search'  # Отмечаем способ обнаружения
                     researchers.append(additional_info)
             
+            # ID найдены, но ни один профиль не загрузился - это сбой, а не отсутствие данных
+            if raise_errors and orcid_ids and not researchers:
+                raise RuntimeError(f"Не удалось загрузить профили ORCID: {', '.join(orcid_ids[:5])}")
+            
             logger.info(f"Найдено исследователей: {len(researchers)} (по email: {len(orcid_ids)}, по имени: {len(additional_orcid_ids)})")
             return researchers
             
         except Exception as e:
             logger.error(f"Ошибка при поиске в ORCID по email {email}: {str(e)}")
+            if raise_errors:
+                raise
             return []
     
-    def search_orcid_by_email(self, email: str) -> List[str]:
+    def search_orcid_by_email(self, email: str, raise_errors: bool = False) -> List[str]:
         """Поиск ORCID ID по email адресу"""
         try:
             headers = {
@@ -76,7 +95,7 @@ class ORCIDService:
                 'rows': 10
             }
             
-            response = requests.get(self.search_url, headers=headers, params=params, timeout=10)
+            response = self.session.get(self.search_url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -92,6 +111,8 @@ class ORCIDService:
             
         except Exception as e:
             logger.error(f"Ошибка при поиске ORCID ID по email: {str(e)}")
+            if raise_errors:
+                raise
             return []
     
     def search_by_name(self, given_name: str, family_name: str) -> List[str]:
@@ -105,7 +126,7 @@ class ORCIDService:
                 'rows': 10
             }
             
-            response = requests.get(self.search_url, headers=headers, params=params, timeout=10)
+            response = self.session.get(self.search_url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -135,7 +156,7 @@ class ORCIDService:
                 'Accept': 'application/json'
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.session.get(url, headers=headers, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -176,7 +197,7 @@ class ORCIDService:
                 'Accept': 'application/json'
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.session.get(url, headers=headers, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -204,7 +225,7 @@ class ORCIDService:
                 'Accept': 'application/json'
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.session.get(url, headers=headers, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -7,6 +7,8 @@ from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
 
+HTTP_POOL_SIZE = 16
+
 class ScopusService:
     """Сервис для работы с Scopus API"""
     
@@ -15,6 +17,11 @@ class ScopusService:
         self.api_key = os.getenv('SCOPUS_API_KEY')
         self.base_url = 'https://api.elsevier.com/content'
         
+        # Переиспользуем соединения с api.elsevier.com между запросами
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=HTTP_POOL_SIZE)
+        self.session.mount('https://', adapter)
+        
         if not self.api_key:
             logger.warning("SCOPUS_API_KEY не найден в переменных окружения")
     
@@ -41,8 +48,13 @@ class ScopusService:
             logger.error(f"Ошибка при поиске в Scopus по email {email}: {str(e)}")
             return []
     
-    def search_author_by_email(self, email: str) -> Optional[Dict[str, Any]]:
-        """Поиск автора по email адресу"""
+    def search_author_by_email(self, email: str, raise_errors: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Поиск автора по email адресу
+        
+        С raise_errors=True сбои запроса (таймаут, 429 и т.п.) пробрасываются исключением.
+        Отсутствие ключа - состояние конфигурации, а не сбой, поэтому и тогда возвращается None
+        """
         if not self.api_key:
             return None
         
@@ -57,7 +69,7 @@ class ScopusService:
                 'count': 1
             }
             
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self.session.get(url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -80,6 +92,8 @@ class ScopusService:
             
         except Exception as e:
             logger.error(f"Ошибка при поиске автора в Scopus: {str(e)}")
+            if raise_errors:
+                raise
             return None
     
     def get_author_publications(self, author_id: str, limit: int = 20) -> List[Dict[str, Any]]:
@@ -100,7 +114,7 @@ class ScopusService:
                 'view': 'COMPLETE'
             }
             
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self.session.get(url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -148,7 +162,7 @@ class ScopusService:
                 'view': 'STANDARD'
             }
             
-            response = requests.get(url, headers=headers, params=params, timeout=10)
+            response = self.session.get(url, headers=headers, params=params, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -188,7 +202,7 @@ class ScopusService:
                 'Accept': 'application/json'
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.session.get(url, headers=headers, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -235,7 +249,7 @@ class ScopusService:
                 'Accept': 'application/json'
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
+            response = self.session.get(url, headers=headers, timeout=10)
             response.raise_for_status()
             
             data = response.json()
@@ -386,7 +386,7 @@ class SearchEngineService:
         # Пробуем использовать браузерный поиск, если доступен
         if BrowserSearchService:
             try:
-                logger.info("Пробуем браузерный поиск через Selenium")
+                logger.info("Пробуем браузерный поиск через Playwright")
                 
                 with BrowserSearchService(headless=True) as browser_search:
                     browser_results = browser_search.search_google(query, max_results=10)